@@ -1,154 +1,406 @@
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
+import heapq
 import json
 import time
 import sys
 import os
-from queue import Queue
-import threading
+from functools import wraps
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.graph_builder import SourceGraph
+from backend import startup
+from backend import graph_queries
+from backend.graph_queries import GraphStore, QueryError, NodeNotFound
+from backend import instrumentation
+from backend.instrumentation import timer
+from backend import tracing
+from backend import batch
+from backend import jobs
+from backend import domains
+from backend.jobs import JobEmitter
+from backend.result_cache import (
+    ResultCache, EncodedBody, cache_key, choose_encoding, compress_stream, COMPRESS_MIN_BYTES
+)
 
 app = Flask(__name__)
 CORS(app, resources={
     r"/*": {
         "origins": ["https://isaacamar.github.io", "http://localhost:8000"],
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type", "If-None-Match", "Cache-Control", "Last-Event-ID"],
+        "expose_headers": ["ETag", "X-Cache", "X-Job-Id"]
     }
 })
 
-# Store active analysis sessions
-sessions = {}
+# Analysis jobs and their SSE events, shared between workers (see jobs.py)
+job_store = jobs.open_store()
 
-class ProgressEmitter:
-    """Emits progress updates for Server-Sent Events"""
-    def __init__(self):
-        self.queue = Queue()
+# Finished graphs, queryable through the /graphs/<graph_id>/... endpoints.
+# Graph ids are job ids: a worker that didn't build the graph rebuilds it from
+# the job's 'complete' event (see load_graph), so this is only a local cache.
+graph_store = GraphStore(on_evict=lambda graph: release_graph(graph))
 
-    def emit(self, event_type, data):
-        """Add event to queue"""
-        self.queue.put({
-            'event': event_type,
-            'data': data
-        })
+# Finished analyses by canonical URL + crawl parameters (see result_cache.py);
+# results other workers published to the job store are pulled in on a miss
+result_cache = ResultCache(on_evict=lambda entry: release_graph(entry.graph))
+
+def release_graph(graph):
+    """Close a graph's spill file once neither store holds it any more"""
+    if graph is not None and not graph_store.holds(graph) and not result_cache.holds(graph):
+        graph.close()
+
+instrumentation.register_gauge(
+    'sourcetree_active_sessions', 'Analyses currently running, over all workers',
+    lambda: job_store.counts().get(jobs.RUNNING, 0)
+)
+instrumentation.register_gauge('sourcetree_stored_graphs', 'Graphs held for /graphs queries', lambda: len(graph_store))
+instrumentation.register_gauge('sourcetree_cached_results', 'Analyses held in the result cache', lambda: len(result_cache))
+instrumentation.register_gauge(
+    'sourcetree_jobs_queued', 'Analyses waiting for a worker, over all workers',
+    lambda: job_store.counts().get(jobs.QUEUED, 0)
+)
+instrumentation.register_gauge(
+    'sourcetree_domains_known', 'Hosts in the domain registry (per worker)', lambda: len(domains.registry)
+)
+instrumentation.register_gauge(
+    'sourcetree_warm', 'Crawler dependencies loaded (1) or still lazy (0)', lambda: int(startup.state['warm'])
+)
+
+SUMMARY_TOP_N = 10  # per-node metrics in the summary: top N only, like pagerank and dependent_pairs
+
+def farthest_from_bedrock(distances, top_n=SUMMARY_TOP_N):
+    """[(node, hops)] furthest from any bedrock source, unreachable ones (None) first"""
+    return heapq.nsmallest(
+        top_n, (distances or {}).items(),
+        key=lambda item: (item[1] is not None, -(item[1] or 0), item[0])
+    )
+
+def summarize_metrics(metrics):
+    """Subset of analyze_structure() sent to the client"""
+    return {
+        'nodes': metrics.get('total_nodes'),
+        'edges': metrics.get('total_edges'),
+        'max_depth': metrics.get('max_depth'),
+        'pagerank': metrics.get('pagerank'),
+        'hits_authorities': metrics.get('hits_authorities'),
+        'bedrock': metrics.get('bedrock'),
+        'distance_to_bedrock': farthest_from_bedrock(metrics.get('distance_to_bedrock')),
+        'dependent_pairs': metrics.get('dependent_pairs'),
+        'memory': metrics.get('memory')
+    }
+
+def trace_options(data):
+    """
+    Tracer and output format requested by the client:
+    "trace": true (compact span tree) or "chrome", "profile": true adds a
+    sampling-profiler summary. Returns (None, None) when not requested.
+    """
+    fmt = data.get('trace')
+    if not fmt and not data.get('profile'):
+        return None, None
+    return tracing.Tracer(), ('chrome' if fmt == 'chrome' else 'compact')
+
+def new_graph():
+    """A fresh SourceGraph. The crawler stack is imported on first use (see startup.py)."""
+    from backend.graph_builder import SourceGraph
+    return SourceGraph()
+
+def new_layout(data):
+    """IncrementalLayout when the client asked for server-side positions"""
+    if not data.get('layout'):
+        return None
+    from backend.layout import IncrementalLayout
+    return IncrementalLayout()
+
+def result_key(url, data):
+    """Result-cache key: canonical URL plus the options that change the output"""
+    from backend.graph_builder import SourceGraph
+    return cache_key(url, max_depth=SourceGraph.MAX_DEPTH, layout=bool(data.get('layout')))
+
+def cacheable(graph, url):
+    """
+    Whether an analysis is worth caching: the root page was actually fetched
+    (its node has page metadata) or something was found. An unreachable root
+    leaves an empty graph that shouldn't be served as a HIT for the whole TTL.
+    """
+    return graph.G.number_of_edges() > 0 or bool(graph.G.nodes.get(url, {}).get('title'))
+
+def lookup_result(data, key):
+    """
+    Cached analysis for this request, or None. Clients can ask for a fresher
+    result with "max_age" (seconds) in the body, or skip the cache with
+    Cache-Control: no-cache. A hit re-registers its graph for /graphs queries.
+    Misses fall back to a result another worker published to the job store.
+    """
+    if 'no-cache' in request.headers.get('Cache-Control', ''):
+        return None
+    max_age = data.get('max_age')
+    max_age = max_age if isinstance(max_age, (int, float)) else None
+    entry = result_cache.get(key, max_age=max_age)
+    if entry is None:
+        job = job_store.find_result(key, result_cache.ttl if max_age is None else min(max_age, result_cache.ttl))
+        graph = load_graph(job['id']) if job else None
+        if graph is not None:
+            result = job_store.last_event(job['id'], 'complete')
+            entry = result_cache.put(key, {
+                'success': True, 'graph_id': job['id'], 'graph': result['graph'], 'metrics': result['metrics']
+            }, job['id'], graph, stored_at=job['finished'])
+    if entry:
+        graph_store.put(entry.graph_id, entry.graph)
+    return entry
+
+def load_graph(graph_id):
+    """
+    Stored graph by id: this worker's copy, or one rebuilt from the finished
+    job's 'complete' (and 'trace') events when another worker built it.
+    """
+    graph = graph_store.get(graph_id)
+    if graph is not None:
+        return graph
+    job = job_store.get(graph_id)
+    result = job_store.last_event(graph_id, 'complete') if job and job['status'] == jobs.DONE else None
+    if not result or 'graph' not in result:
+        return None
+    graph = graph_queries.load_export(new_graph(), result['graph'])
+    trace = job_store.last_event(graph_id, 'trace')
+    if trace:
+        graph.trace = tracing.ExportedTrace(trace['trace'], trace.get('format', 'compact'))
+    graph_store.put(graph_id, graph)
+    return graph
+
+def send_body(response, body):
+    """
+    Fill `response` from an EncodedBody: strong ETag, 304 when If-None-Match
+    matches, otherwise the body compressed as the client's Accept-Encoding allows.
+    """
+    encoding = None
+    if len(body.raw) >= COMPRESS_MIN_BYTES:
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    response.headers['ETag'] = body.etag(encoding)
+    response.vary.add('Accept-Encoding')
+    if body.matches(request.headers.get('If-None-Match')):
+        response.status_code = 304
+        response.set_data(b'')
+        return response
+    response.set_data(body.encoded(encoding))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.after_request
+def compress_json(response):
+    """ETag + compression for JSON GET responses that didn't handle it themselves"""
+    if (request.method != 'GET' or response.status_code != 200
+            or response.mimetype != 'application/json' or response.is_streamed
+            or 'ETag' in response.headers or 'Content-Encoding' in response.headers):
+        return response
+    return send_body(response, EncodedBody(response.get_data()))
+
+def node_event(graph, node_id, attrs):
+    """Payload of an SSE 'node' event"""
+    return {
+        'id': node_id,
+        'title': attrs.get('title', node_id),
+        'url': attrs.get('url', node_id),
+        'type': attrs.get('type', 'unknown'),
+        'tier': graph.get_tier(attrs.get('type', 'unknown'))
+    }
+
+def emit_graph_updates(graph, emitter, layout=None, tags=None):
+    """
+    Monkey-patch the graph's NetworkX add_node / add_edge so every change is
+    emitted as an SSE event while it is built. `tags` (a dict, read at emit
+    time) is merged into each node/edge event. Returns a function that
+    restores the original methods.
+    """
+    original_nx_add_node = graph.G.add_node
+    original_nx_add_edge = graph.G.add_edge
+
+    def add_node_with_emit(node_id, **attr):
+        result = original_nx_add_node(node_id, **attr)
+        # Emit new node
+        event = node_event(graph, node_id, attr)
+        if layout:
+            # Anchor next to whoever cited it; existing nodes never move
+            anchors = list(graph.G.predecessors(node_id))
+            event['x'], event['y'] = layout.place(node_id, event['tier'], anchors)
+        if tags:
+            event.update(tags)
+        emitter.emit('node', event)
+        return result
+
+    def add_edge_with_emit(source, target, **attr):
+        new_nodes = [n for n in (source, target) if n not in graph.G]
+        result = original_nx_add_edge(source, target, **attr)
+        if layout:
+            # add_edge creates missing endpoints without an add_node call
+            for node_id in new_nodes:
+                tier = graph.get_tier(graph.G.nodes[node_id].get('type', 'unknown'))
+                x, y = layout.place(node_id, tier, [source] if node_id == target else [])
+                emitter.emit('position', {'id': node_id, 'tier': tier, 'x': x, 'y': y})
+        # Emit new edge
+        event = {
+            'source': source,
+            'target': target,
+            'type': attr.get('type', 'unknown'),
+            'confidence': attr.get('confidence', 0.5)
+        }
+        if tags:
+            event.update(tags)
+        emitter.emit('edge', event)
+        return result
+
+    # Patch the graph's methods
+    graph.G.add_node = add_node_with_emit
+    graph.G.add_edge = add_edge_with_emit
+
+    def restore():
+        graph.G.add_node = original_nx_add_node
+        graph.G.add_edge = original_nx_add_edge
+    return restore
 
-    def stream(self):
-        """Generator for SSE stream"""
-        while True:
-            event = self.queue.get()
-            if event is None:  # Sentinel to stop
-                break
+def sse_events(job_id, after=0):
+    """A job's events as SSE text; ids let a client resume with Last-Event-ID"""
+    for seq, event, data in job_store.stream(job_id, after):
+        yield f"id: {seq}\n"
+        yield f"event: {event}\n"
+        yield f"data: {json.dumps(data)}\n\n"
 
-            yield f"event: {event['event']}\n"
-            yield f"data: {json.dumps(event['data'])}\n\n"
+def event_stream(job_id, headers=None, after=0):
+    """SSE response for a job (served by any worker), compressed event by event if the client allows it"""
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        'X-Job-Id': job_id,
+        **(headers or {})
+    }
+    stream = sse_events(job_id, after)
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        stream = compress_stream(stream, encoding)
+        headers['Content-Encoding'] = encoding
+        headers['Vary'] = 'Accept-Encoding'
+    return Response(stream, mimetype='text/event-stream', headers=headers)
+
+def replay_result(emitter, entry, url):
+    """Stream a cached analysis the way a live one arrives: nodes, edges, complete"""
+    result = json.loads(entry.body.raw)
+    emitter.emit('status', {'message': 'Loaded cached analysis', 'url': url, 'cached': True})
+    exported = {node['id']: node for node in result['graph']['nodes']}
+    for node_id, attrs in entry.graph.G.nodes(data=True):
+        event = node_event(entry.graph, node_id, attrs)
+        if 'x' in exported.get(node_id, {}):
+            event['x'], event['y'] = exported[node_id]['x'], exported[node_id]['y']
+        emitter.emit('node', event)
+    for source, target, attrs in entry.graph.G.edges(data=True):
+        emitter.emit('edge', {
+            'source': source,
+            'target': target,
+            'type': attrs.get('type', 'unknown'),
+            'confidence': attrs.get('confidence', 0.5)
+        })
+    emitter.emit('complete', {
+        'message': 'Analysis complete!',
+        'cached': True,
+        'graph_id': result['graph_id'],
+        'metrics': result['metrics'],
+        'graph': result['graph']
+    })
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'ok'})
+    return jsonify({'status': 'ok', 'warm': startup.state['warm'], 'startup_ms': startup.state['ready_ms']})
 
-@app.route('/analyze', methods=['POST'])
-def analyze():
-    """Start analysis of a URL with real-time updates via SSE"""
-    data = request.json
-    url = data.get('url')
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint (per worker process)"""
+    return Response(instrumentation.render_prometheus(), mimetype='text/plain; version=0.0.4')
 
-    if not url:
-        return jsonify({'error': 'URL is required'}), 400
+def run_analysis_job(params, emitter, job_id):
+    """'analyze' job: crawl one URL, emitting graph changes as they happen"""
+    url = params['url']
+    # Optional server-side layout: nodes stream in with fixed x/y
+    layout = new_layout(params)
+    tracer, trace_format = trace_options(params)
 
-    # Create progress emitter
-    emitter = ProgressEmitter()
-    session_id = str(time.time())
-    sessions[session_id] = emitter
+    emitter.emit('status', {'message': 'Starting analysis...', 'url': url})
 
-    def run_analysis():
-        """Run analysis in background thread"""
-        try:
-            emitter.emit('status', {'message': 'Starting analysis...', 'url': url})
-
-            # Monkey-patch NetworkX add_node and add_edge to emit progress
-            import networkx as nx
-
-            graph = SourceGraph()
-            original_nx_add_node = graph.G.add_node
-            original_nx_add_edge = graph.G.add_edge
-
-            def add_node_with_emit(node_id, **attr):
-                result = original_nx_add_node(node_id, **attr)
-                # Emit new node
-                emitter.emit('node', {
-                    'id': node_id,
-                    'title': attr.get('title', node_id),
-                    'url': attr.get('url', node_id),
-                    'type': attr.get('type', 'unknown'),
-                    'tier': graph.get_tier(attr.get('type', 'unknown'))
-                })
-                return result
-
-            def add_edge_with_emit(source, target, **attr):
-                result = original_nx_add_edge(source, target, **attr)
-                # Emit new edge
-                emitter.emit('edge', {
-                    'source': source,
-                    'target': target,
-                    'type': attr.get('type', 'unknown'),
-                    'confidence': attr.get('confidence', 0.5)
-                })
-                return result
-
-            # Patch the graph's methods
-            graph.G.add_node = add_node_with_emit
-            graph.G.add_edge = add_edge_with_emit
+    graph = new_graph()
+    restore = emit_graph_updates(graph, emitter, layout)
 
+    try:
+        with tracing.activate(tracer, profile=params.get('profile')):
             # Build graph
             emitter.emit('status', {'message': f'Scraping {url}...'})
-            graph.build_graph(url)
+            with timer('build_graph'):
+                graph.build_graph(url)
 
             # Restore original methods
-            graph.G.add_node = original_nx_add_node
-            graph.G.add_edge = original_nx_add_edge
+            restore()
 
             # Get final data
-            viz_data = graph.export_for_visualization()
+            viz_data = graph.export_for_visualization(
+                layout=bool(layout),
+                seed={n: xy[0] for n, xy in layout.positions.items()} if layout else None,
+                bands=layout.bands if layout else None
+            )
             metrics = graph.analyze_structure()
+    except Exception:
+        release_graph(graph)  # no store will hold a failed crawl
+        raise
+    graph.trace = tracer
+    graph_store.put(job_id, graph)
 
-            emitter.emit('complete', {
-                'message': 'Analysis complete!',
-                'metrics': {
-                    'nodes': metrics.get('total_nodes'),
-                    'edges': metrics.get('total_edges'),
-                    'max_depth': metrics.get('max_depth')
-                },
-                'graph': viz_data
-            })
+    if tracer:
+        emitter.emit('trace', {'graph_id': job_id, 'format': trace_format, 'trace': tracer.export(trace_format)})
 
-        except Exception as e:
-            emitter.emit('error', {'message': str(e)})
-        finally:
-            emitter.queue.put(None)  # Stop stream
-            # Cleanup session after 5 seconds
-            time.sleep(5)
-            if session_id in sessions:
-                del sessions[session_id]
+    summary = summarize_metrics(metrics)
+    if params.get('key') and cacheable(graph, url):
+        result_cache.put(params['key'], {
+            'success': True, 'graph_id': job_id, 'graph': viz_data, 'metrics': summary
+        }, job_id, graph)
+        job_store.publish(job_id, params['key'])  # other workers' cache misses find it here
+
+    emitter.emit('complete', {
+        'message': 'Analysis complete!',
+        'graph_id': job_id,
+        'metrics': summary,
+        'graph': viz_data
+    })
+
+def analysis_params(data):
+    """The JSON-serialisable options a job needs (it may run in another worker)"""
+    return {name: data[name] for name in ('layout', 'trace', 'profile') if data.get(name)}
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    """Start analysis of a URL with real-time updates via SSE"""
+    data = request.json
+    url = data.get('url')
+
+    if not url:
+        return jsonify({'error': 'URL is required'}), 400
 
-    # Start background thread
-    thread = threading.Thread(target=run_analysis)
-    thread.daemon = True
-    thread.start()
+    # Traced runs always crawl: the trace is the point
+    traced = data.get('trace') or data.get('profile')
+    key = None if traced else result_key(url, data)
+    params = {'url': url, 'key': key, **analysis_params(data)}
+
+    cached = lookup_result(data, key) if key else None
+    if cached:
+        job = job_store.create('analyze', params, worker=jobs.WORKER_ID)
+        replay_result(JobEmitter(job_store, job['id']), cached, url)
+        job_store.finish(job['id'], jobs.DONE)
+        return event_stream(job['id'], {'X-Cache': 'HIT'})
+
+    # The same analysis already queued or running (in any worker): share its stream
+    job = job_store.create('analyze', params, dedup_key=key)
 
     # Return SSE stream
-    return Response(
-        emitter.stream(),
-        mimetype='text/event-stream',
-        headers={
-            'Cache-Control': 'no-cache',
-            'X-Accel-Buffering': 'no'
-        }
-    )
+    return event_stream(job['id'], {'X-Cache': 'MISS'})
 
 @app.route('/quick-analyze', methods=['POST'])
 def quick_analyze():
@@ -159,23 +411,293 @@ def quick_analyze():
     if not url:
         return jsonify({'error': 'URL is required'}), 400
 
-    try:
-        graph = SourceGraph()
-        graph.build_graph(url)
-        viz_data = graph.export_for_visualization()
-        metrics = graph.analyze_structure()
+    tracer, trace_format = trace_options(data)
+    key = None if tracer else result_key(url, data)
+    cached = lookup_result(data, key) if key else None
+    if cached:
+        response = send_body(Response(mimetype='application/json'), cached.body)
+        response.headers['X-Cache'] = 'HIT'
+        return response
 
-        return jsonify({
-            'success': True,
-            'graph': viz_data,
-            'metrics': {
-                'nodes': metrics.get('total_nodes'),
-                'edges': metrics.get('total_edges'),
-                'max_depth': metrics.get('max_depth')
+    # Recorded as a job like streamed analyses: the graph id is the job id and the
+    # job's 'complete' event lets any worker serve /graphs/<graph_id>
+    graph_id = job_store.create('quick', {'url': url}, worker=jobs.WORKER_ID)['id']
+    from backend.graph_builder import RootUnavailable
+    # Heartbeated like runner jobs, so other workers' fail_stale doesn't fail a long crawl
+    graph = None
+    with job_runner.heartbeat(graph_id):
+        try:
+            graph = new_graph()
+            with tracing.activate(tracer, profile=data.get('profile')):
+                with timer('build_graph'):
+                    graph.build_graph(url)
+                viz_data = graph.export_for_visualization(layout=bool(data.get('layout')))
+                metrics = graph.analyze_structure()
+            graph.trace = tracer
+            graph_store.put(graph_id, graph)
+
+            response = {
+                'success': True,
+                'graph_id': graph_id,
+                'graph': viz_data,
+                'metrics': summarize_metrics(metrics)
             }
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+            emitter = JobEmitter(job_store, graph_id)
+            emitter.emit('complete', response)
+            if tracer:
+                response['trace'] = tracer.export(trace_format)
+                emitter.emit('trace', {'graph_id': graph_id, 'format': trace_format, 'trace': response['trace']})
+            stored = not tracer and cacheable(graph, url)
+            if stored:
+                entry = result_cache.put(key, response, graph_id, graph)
+                job_store.publish(graph_id, key)
+            job_store.finish(graph_id, jobs.DONE)
+        except RootUnavailable as e:
+            release_graph(graph)
+            job_store.finish(graph_id, jobs.FAILED, str(e))
+            return jsonify({'error': str(e)}), 422
+        except Exception as e:
+            release_graph(graph)
+            job_store.finish(graph_id, jobs.FAILED, str(e))
+            return jsonify({'error': str(e)}), 500
+
+    if not stored:
+        response = jsonify(response)
+    else:
+        response = send_body(Response(mimetype='application/json'), entry.body)
+    if not tracer:
+        response.headers['X-Cache'] = 'MISS'
+    return response
+
+def run_batch_job(params, emitter, job_id):
+    """'batch' job: crawl every root into one merged graph"""
+    roots = params['urls']
+    layout = new_layout(params)
+    tracer, trace_format = trace_options(params)
+
+    emitter.emit('status', {'message': f'Starting batch of {len(roots)} URLs...', 'roots': roots})
+    graph = new_graph()
+    tags = {'root': None}
+    restore = emit_graph_updates(graph, emitter, layout, tags)
+
+    def on_start(index, root):
+        tags['root'] = index
+        emitter.emit('root_start', {'root': index, 'url': root, 'total': len(roots)})
+
+    def on_done(index, root, stats):
+        emitter.emit('root_complete', {'root': index, **stats})
+
+    with tracing.activate(tracer, profile=params.get('profile')):
+        with timer('build_graph'):
+            root_stats = batch.crawl_roots(graph, roots, on_start, on_done)
+        restore()
+        viz_data = graph.export_for_visualization(
+            layout=bool(layout),
+            seed={n: xy[0] for n, xy in layout.positions.items()} if layout else None,
+            bands=layout.bands if layout else None
+        )
+        metrics = graph.analyze_structure()
+        viz_data, overlap = batch.merged_export(graph, roots, viz_data)
+    graph.trace = tracer
+    graph_store.put(job_id, graph)
+
+    if tracer:
+        emitter.emit('trace', {'graph_id': job_id, 'format': trace_format, 'trace': tracer.export(trace_format)})
+
+    emitter.emit('complete', {
+        'message': 'Batch analysis complete!',
+        'graph_id': job_id,
+        'metrics': summarize_metrics(metrics),
+        'roots': root_stats,
+        'overlap': overlap,
+        'graph': viz_data
+    })
+
+@app.route('/batch-analyze', methods=['POST'])
+def batch_analyze():
+    """
+    Analyze several related URLs into one merged graph via SSE.
+    Body: {"urls": [...], "layout": bool, "trace": ...}. Node/edge events carry
+    the index of the root being crawled; root_start / root_complete events
+    report per-root progress and 'complete' adds attribution and overlap metrics.
+    """
+    data = request.json or {}
+    try:
+        roots = batch.normalise_roots(data.get('urls') or [])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not roots:
+        return jsonify({'error': 'urls must be a non-empty list'}), 400
+
+    job = job_store.create('batch', {'urls': roots, **analysis_params(data)})
+    return event_stream(job['id'])
+
+# --- Jobs: status and (re)connecting to a job's event stream from any worker ---
+
+def export_job(job):
+    return {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'worker': job['worker'],
+        'error': job['error'],
+        'url': job['params'].get('url'),
+        'urls': job['params'].get('urls'),
+        'age_seconds': round(time.time() - job['created'], 1)
+    }
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Queue depth and running jobs across all workers"""
+    return jsonify({
+        'counts': job_store.counts(),
+        'running': [export_job(job) for job in job_store.running()]
+    })
+
+@app.route('/domains', methods=['GET'])
+def list_domains():
+    """What this worker has learned about each host: robots.txt, latency, failures, walls"""
+    hosts = domains.registry.snapshot()
+    return jsonify({
+        'count': len(hosts),
+        'dead': [h['host'] for h in hosts if h['dead']],
+        'domains': hosts
+    })
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify(export_job(job))
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Job's SSE stream from the start, or after ?after=N / the Last-Event-ID header"""
+    if job_store.get(job_id) is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after') or 0)
+    except ValueError:
+        return jsonify({'error': 'Invalid event id'}), 400
+    return event_stream(job_id, after=after)
+
+# --- Graph queries: explore a stored graph without downloading all of it ---
+
+def query_arg(name, cast=str, default=None):
+    """Typed query-string argument; bad values become a 400 via QueryError"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise QueryError(f"Invalid value for '{name}': {value}")
+
+def with_graph(handler):
+    """Look up the stored graph and map query errors to HTTP responses"""
+    @wraps(handler)
+    def wrapper(graph_id):
+        graph = load_graph(graph_id)
+        if graph is not None and not graph.acquire():
+            # Evicted (and closed) since the lookup: another lookup rebuilds it from the job
+            graph = load_graph(graph_id)
+            if graph is not None and not graph.acquire():
+                graph = None
+        if graph is None:
+            return jsonify({'error': 'Graph not found or expired'}), 404
+        try:
+            result = handler(graph)
+            # Handlers may return their own (body, status) for non-query errors
+            return result if isinstance(result, tuple) else jsonify(result)
+        except NodeNotFound as e:
+            return jsonify({'error': f'Node not in graph: {e.args[0]}'}), 404
+        except QueryError as e:
+            return jsonify({'error': str(e)}), 400
+        finally:
+            graph.release()  # an eviction meanwhile closes the spill file now
+    return wrapper
+
+@app.route('/graphs/<graph_id>', methods=['GET'])
+@with_graph
+def graph_info(graph):
+    """Node/link counts for a stored graph"""
+    return graph_queries.graph_summary(graph)
+
+@app.route('/graphs/<graph_id>/nodes', methods=['GET'])
+@with_graph
+def graph_nodes(graph):
+    """Paginated nodes: ?tier=&type=&cursor=&limit="""
+    return graph_queries.list_nodes(
+        graph,
+        tier=query_arg('tier', int),
+        node_type=query_arg('type'),
+        cursor=query_arg('cursor'),
+        limit=query_arg('limit', int)
+    )
+
+@app.route('/graphs/<graph_id>/links', methods=['GET'])
+@with_graph
+def graph_links(graph):
+    """Paginated links: ?type=&min_confidence=&node=&cursor=&limit="""
+    return graph_queries.list_links(
+        graph,
+        link_type=query_arg('type'),
+        min_confidence=query_arg('min_confidence', float),
+        node=query_arg('node'),
+        cursor=query_arg('cursor'),
+        limit=query_arg('limit', int)
+    )
+
+@app.route('/graphs/<graph_id>/ego', methods=['GET'])
+@with_graph
+def graph_ego(graph):
+    """Ego network: ?node=<id>&depth=1&direction=both&min_confidence=&limit="""
+    node = query_arg('node')
+    if not node:
+        raise QueryError("'node' is required")
+    return graph_queries.ego_network(
+        graph,
+        node,
+        depth=query_arg('depth', int, 1),
+        direction=query_arg('direction', str, 'both'),
+        min_confidence=query_arg('min_confidence', float),
+        limit=query_arg('limit', int)
+    )
+
+@app.route('/graphs/<graph_id>/top', methods=['GET'])
+@with_graph
+def graph_top(graph):
+    """Most cited nodes: ?n=10&tier=&type="""
+    return graph_queries.top_cited(
+        graph,
+        n=query_arg('n', int, 10),
+        tier=query_arg('tier', int),
+        node_type=query_arg('type')
+    )
+
+@app.route('/graphs/<graph_id>/trace', methods=['GET'])
+@with_graph
+def graph_trace(graph):
+    """Trace of the run that built the graph: ?format=compact|chrome"""
+    if graph.trace is None:
+        return jsonify({'error': 'No trace recorded (analyze with "trace": true)'}), 404
+    try:
+        return graph.trace.export(query_arg('format', str, 'compact'))
+    except ValueError as e:  # ExportedTrace from another worker: one format only
+        raise QueryError(str(e))
+
+# Heavy dependencies load on first use; SOURCETREE_WARMUP=1 loads them in
+# the background right away instead
+if os.environ.get('SOURCETREE_WARMUP') == '1':
+    startup.start_warmup()
+
+# Every worker executes queued jobs unless SOURCETREE_JOB_RUNNER=0, e.g. for
+# web-only processes whose jobs are run by others sharing the same store
+job_runner = jobs.JobRunner(job_store, {'analyze': run_analysis_job, 'batch': run_batch_job})
+if os.environ.get('SOURCETREE_JOB_RUNNER', '1') != '0':
+    job_runner.start()
+startup.mark_ready()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
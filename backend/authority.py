@@ -0,0 +1,174 @@
+import numpy as np
+import networkx as nx
+from scipy import sparse
+from scipy.sparse.csgraph import dijkstra
+
+BLOCK_ROWS = 256  # citing pages per block when computing shared citations
+
+# All metrics here work on the sparse adjacency matrix A (A[i, j] = 1 when
+# node i cites node j), so they stay fast on graphs with tens of thousands
+# of edges instead of walking NetworkX views node by node.
+
+def adjacency_matrix(G):
+    """Return (nodes, A) where A is the CSR citation matrix in `nodes` order"""
+    nodes = list(G.nodes())
+    if not nodes:
+        return nodes, sparse.csr_matrix((0, 0))
+    A = nx.to_scipy_sparse_array(G, nodelist=nodes, weight=None, format='csr')
+    # Binary adjacency, float for the linear algebra below
+    A = sparse.csr_matrix(A, dtype=np.float64)
+    A.data[:] = 1.0
+    return nodes, A
+
+def pagerank(A, alpha=0.85, tol=1.0e-10, max_iter=100):
+    """Power-iteration PageRank. Dangling nodes spread their rank uniformly."""
+    n = A.shape[0]
+    out_degree = np.asarray(A.sum(axis=1)).ravel()
+    dangling = out_degree == 0
+    inv_out = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+    # Column-stochastic transition matrix, transposed once up front
+    M = (sparse.diags(inv_out) @ A).T.tocsr()
+
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        previous = rank
+        rank = alpha * (M @ rank + previous[dangling].sum() / n) + (1.0 - alpha) / n
+        if np.abs(rank - previous).sum() < n * tol:
+            break
+    return rank / rank.sum()
+
+def hits(A, tol=1.0e-10, max_iter=100):
+    """HITS hub and authority scores (each normalised to sum to 1)"""
+    n = A.shape[0]
+    AT = A.T.tocsr()
+    hubs = np.full(n, 1.0 / n)
+    authorities = hubs
+    for _ in range(max_iter):
+        previous = hubs
+        authorities = AT @ hubs
+        authorities /= authorities.max() or 1.0
+        hubs = A @ authorities
+        hubs /= hubs.max() or 1.0
+        if np.abs(hubs - previous).sum() < n * tol:
+            break
+    return _normalise(hubs), _normalise(authorities)
+
+def distance_to_bedrock(A, bedrock_mask):
+    """
+    Citation hops from every node to the nearest bedrock (tier 1/2) node.
+    Multi-source BFS over the reversed graph; unreachable nodes get inf.
+    """
+    n = A.shape[0]
+    sources = np.flatnonzero(bedrock_mask)
+    if len(sources) == 0:
+        return np.full(n, np.inf)
+    return dijkstra(A.T.tocsr(), directed=True, indices=sources, unweighted=True, min_only=True)
+
+def independence_scores(A, top_n=10):
+    """
+    How independent each pair of citing pages is, from the overlap of what they cite.
+    Returns (per_node, pairs): per_node[i] = 1 - max Jaccard overlap with any other
+    page (NaN for pages that cite nothing), pairs = (i, j, shared, independence) arrays
+    for the top_n least independent pairs, most dependent first.
+
+    The shared-citation matrix A @ A.T is built BLOCK_ROWS citing pages at a time,
+    so memory stays bounded even when a few sources are cited by nearly everyone.
+    """
+    n = A.shape[0]
+    out_degree = np.asarray(A.sum(axis=1)).ravel()
+    max_overlap = np.zeros(n)
+
+    # Only pages that cite something can overlap
+    citing = np.flatnonzero(out_degree > 0)
+    A_citing = A[citing]
+    AT = A_citing.T.tocsr()
+
+    best = [np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)]
+    for start in range(0, len(citing), BLOCK_ROWS):
+        shared = (A_citing[start:start + BLOCK_ROWS] @ AT).tocoo()
+        # Upper triangle only: each pair once, no self-pairs
+        keep = shared.col > shared.row + start
+        rows = citing[shared.row[keep] + start]
+        cols = citing[shared.col[keep]]
+        counts = shared.data[keep]
+
+        jaccard = counts / (out_degree[rows] + out_degree[cols] - counts)
+        np.maximum.at(max_overlap, rows, jaccard)
+        np.maximum.at(max_overlap, cols, jaccard)
+
+        best = _lowest([np.concatenate(x) for x in zip(best, (rows, cols, counts, 1.0 - jaccard))], top_n)
+
+    per_node = np.where(out_degree > 0, 1.0 - max_overlap, np.nan)
+    return per_node, tuple(best)
+
+def _lowest(pairs, top_n):
+    """Keep the top_n pairs with the lowest independence (ties broken by node order)"""
+    rows, cols, counts, independence = pairs
+    if len(independence) > top_n:
+        cutoff = np.partition(independence, top_n - 1)[top_n - 1]
+        keep = independence <= cutoff
+        rows, cols, counts, independence = rows[keep], cols[keep], counts[keep], independence[keep]
+    order = np.lexsort((cols, rows, independence))[:top_n]
+    return [rows[order], cols[order], counts[order], independence[order]]
+
+def compute_authority_metrics(G, bedrock_nodes, top_n=10):
+    """
+    Authority, bedrock distance and independence metrics for a citation graph.
+    `bedrock_nodes` is the set of tier 1/2 nodes (see SourceGraph.get_tier).
+    Everything returned is plain Python (JSON-serialisable).
+    """
+    nodes, A = adjacency_matrix(G)
+    if not nodes:
+        return {
+            'pagerank': [], 'hits_authorities': [], 'hits_hubs': [],
+            'distance_to_bedrock': {}, 'bedrock': _bedrock_summary(np.array([]), 0),
+            'independence': {}, 'dependent_pairs': []
+        }
+
+    rank = pagerank(A)
+    hubs, authorities = hits(A)
+
+    bedrock_mask = np.fromiter((node in bedrock_nodes for node in nodes), dtype=bool, count=len(nodes))
+    distances = distance_to_bedrock(A, bedrock_mask)
+
+    per_node, (rows, cols, counts, independence) = independence_scores(A, top_n)
+
+    return {
+        'pagerank': _top(nodes, rank, top_n),
+        'hits_authorities': _top(nodes, authorities, top_n),
+        'hits_hubs': _top(nodes, hubs, top_n),
+        'distance_to_bedrock': {
+            node: (None if np.isinf(d) else int(d)) for node, d in zip(nodes, distances)
+        },
+        'bedrock': _bedrock_summary(distances, int(bedrock_mask.sum())),
+        'independence': {
+            node: round(float(s), 4) for node, s in zip(nodes, per_node) if not np.isnan(s)
+        },
+        'dependent_pairs': [
+            {
+                'a': nodes[rows[i]],
+                'b': nodes[cols[i]],
+                'shared_citations': int(counts[i]),
+                'independence': round(float(independence[i]), 4)
+            }
+            for i in range(len(independence))
+        ]
+    }
+
+def _top(nodes, scores, top_n):
+    order = np.argsort(-scores, kind='stable')[:top_n]
+    return [(nodes[i], round(float(scores[i]), 6)) for i in order]
+
+def _normalise(scores):
+    total = scores.sum()
+    return scores / total if total else scores
+
+def _bedrock_summary(distances, bedrock_count):
+    finite = distances[np.isfinite(distances)]
+    return {
+        'bedrock_nodes': bedrock_count,
+        'reachable': int(len(finite)),
+        'unreachable': int(len(distances) - len(finite)),
+        'mean_distance': round(float(finite.mean()), 3) if len(finite) else None,
+        'max_distance': int(finite.max()) if len(finite) else None
+    }
@@ -0,0 +1,149 @@
+import time
+from collections import deque
+from itertools import combinations
+
+try:
+    from backend.result_cache import canonical_url
+    from backend.tracing import span
+except ImportError:
+    from result_cache import canonical_url
+    from tracing import span
+
+# Batch analysis: several root articles (e.g. all coverage of one event)
+# crawled into ONE SourceGraph, so they share its visited set, near-duplicate
+# index and link-verdict cache. A source cited by five articles is fetched and
+# verified once. Afterwards every node is attributed to the roots that reach it.
+
+MAX_ROOTS = 20
+TOP_SHARED = 20
+
+def normalise_roots(urls, max_roots=MAX_ROOTS):
+    """Drop blanks and duplicates (by canonical URL), keeping the caller's order"""
+    roots, seen = [], set()
+    for url in urls:
+        if not isinstance(url, str) or not url.strip():
+            continue
+        key = canonical_url(url)
+        if key in seen:
+            continue
+        seen.add(key)
+        roots.append(url.strip())
+    if len(roots) > max_roots:
+        raise ValueError(f'At most {max_roots} URLs per batch')
+    return roots
+
+def crawl_roots(graph, roots, on_start=None, on_done=None):
+    """
+    Crawl every root into `graph`, one after another.
+    All roots are marked visited up front: a root that another root cites is
+    linked to but not crawled there, and gets its own full-depth crawl when
+    its turn comes instead of a shallow one from inside someone else's.
+    on_start(index, root) / on_done(index, root, stats) report progress.
+    """
+    graph.visited.update(roots)
+    stats = []
+    for index, root in enumerate(roots):
+        if on_start:
+            on_start(index, root)
+        nodes, edges = graph.G.number_of_nodes(), graph.G.number_of_edges()
+        started = time.perf_counter()
+        error = None
+        try:
+            with span('crawl', url=root, depth=0):
+                graph.crawl_page(root, 0)
+        except Exception as e:  # one bad root shouldn't sink the batch
+            error = str(e)
+        root_stats = {
+            'root': root,
+            'crawled': root in graph.G,
+            'new_nodes': graph.G.number_of_nodes() - nodes,
+            'new_edges': graph.G.number_of_edges() - edges,
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+        if error:
+            root_stats['error'] = error
+        stats.append(root_stats)
+        if on_done:
+            on_done(index, root, root_stats)
+    return stats
+
+def reachable(graph, root):
+    """Everything `root` cites directly or transitively (excluding itself)"""
+    if root not in graph.G:
+        return set()
+    seen = {root}
+    queue = deque([root])
+    while queue:
+        for target in graph.G.successors(queue.popleft()):
+            if target not in seen:
+                seen.add(target)
+                queue.append(target)
+    seen.discard(root)
+    return seen
+
+def attribute_roots(graph, roots):
+    """node -> sorted indexes of the roots it belongs to (itself or reached by citation)"""
+    attribution = {}
+    for index, root in enumerate(roots):
+        for node in reachable(graph, root) | ({root} if root in graph.G else set()):
+            attribution.setdefault(node, []).append(index)
+    return attribution
+
+def overlap_metrics(graph, roots, attribution):
+    """
+    How much the roots lean on the same sources: per-root source counts,
+    pairwise shared sources / Jaccard overlap, and the most widely shared sources.
+    Roots themselves are not counted as sources of other roots' overlap.
+    """
+    root_set = set(roots)
+    sources = [set() for _ in roots]
+    for node, indexes in attribution.items():
+        if node in root_set:
+            continue
+        for index in indexes:
+            sources[index].add(node)
+
+    per_root = []
+    for index, root in enumerate(roots):
+        unique = sum(1 for node in sources[index] if len(attribution[node]) == 1)
+        per_root.append({'root': root, 'sources': len(sources[index]), 'unique_sources': unique})
+
+    pairs = []
+    for i, j in combinations(range(len(roots)), 2):
+        shared = len(sources[i] & sources[j])
+        union = len(sources[i] | sources[j])
+        pairs.append({
+            'a': roots[i],
+            'b': roots[j],
+            'shared_sources': shared,
+            'jaccard': round(shared / union, 4) if union else 0.0
+        })
+    pairs.sort(key=lambda p: p['jaccard'], reverse=True)
+
+    shared = sorted(
+        ((node, len(indexes)) for node, indexes in attribution.items()
+         if node not in root_set and len(indexes) > 1),
+        key=lambda x: (-x[1], x[0])
+    )
+    all_sources = set().union(*sources) if sources else set()
+    return {
+        'roots': len(roots),
+        'total_sources': len(all_sources),
+        'shared_sources': len(shared),
+        'shared_by_all': sum(1 for _, n in shared if n == len(roots)) if len(roots) > 1 else 0,
+        'per_root': per_root,
+        'pairs': pairs,
+        'most_shared': [{'id': node, 'roots': n} for node, n in shared[:TOP_SHARED]]
+    }
+
+def merged_export(graph, roots, viz_data):
+    """
+    Add per-root attribution to an export_for_visualization() payload:
+    every node gets 'roots' (indexes into the batch's root list).
+    Returns (viz_data, overlap metrics).
+    """
+    attribution = attribute_roots(graph, roots)
+    for node in viz_data['nodes']:
+        node['roots'] = attribution.get(node['id'], [])
+    viz_data['roots'] = roots
+    return viz_data, overlap_metrics(graph, roots, attribution)
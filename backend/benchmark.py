@@ -0,0 +1,495 @@
+"""
+Offline end-to-end benchmark for SourceGraph.
+
+Replays a recorded corpus of pages underneath the real scraper (the fake sits
+at the requests.get level, so streaming, parsing and link extraction all run),
+with a deterministic fake LLM and fake search backend of configurable latency.
+
+    python -m backend.benchmark                      # all scenarios
+    python -m backend.benchmark --scenarios cluster --runs 5 --llm-latency 0.05
+    python -m backend.benchmark --json bench.json
+    python -m backend.benchmark record https://example.com/article ...
+
+The default corpus is generated deterministically on first use (a news
+article, a syndicated wire story, a dense cross-citing blog cluster, a
+Wikipedia-scale page, a PDF report, and error/binary responses). `record`
+adds live pages to the same corpus format.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+import types
+import zlib
+from urllib.parse import urlparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import graph_builder, llm_analyzer, scraper, source_hunter, startup
+from backend.domains import DomainRegistry
+from backend.graph_builder import SourceGraph
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.bench_corpus')
+CORPUS_VERSION = 1
+
+# Crawl scenarios: (root key in the manifest, max_depth)
+SCENARIOS = {
+    'article': ('article', 2),
+    'syndicated': ('syndicated', 2),
+    'cluster': ('cluster', 3),
+    'wikipedia': ('wikipedia', 2),
+}
+# Edge counts for the analysis-only (no crawl) synthetic graphs
+ANALYSIS_SIZES = [1000, 10000, 30000]
+
+# --- Corpus -------------------------------------------------------------------
+
+class CorpusBuilder:
+    """Deterministic synthetic corpus shaped like the pages the crawler sees"""
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.vocab = [self._word() for _ in range(3000)]
+        self.pages = {}      # url -> (status, content_type, body bytes)
+        self.scenarios = {}
+
+    def _word(self):
+        letters = 'etaoinshrdlucmfwypvbgkqjxz'
+        return ''.join(self.rng.choice(letters[:18 if self.rng.random() < .8 else 26])
+                       for _ in range(self.rng.randint(2, 10)))
+
+    def sentence(self, words=None):
+        words = words or self.rng.randint(8, 25)
+        text = ' '.join(self.rng.choice(self.vocab) for _ in range(words))
+        return text.capitalize() + '.'
+
+    def paragraph(self, sentences=None):
+        return ' '.join(self.sentence() for _ in range(sentences or self.rng.randint(3, 7)))
+
+    def html(self, title, body_parts, nav_links=()):
+        nav = ''.join(f'<li><a href="{href}">{label}</a></li>' for href, label in nav_links)
+        scripts = '<script>var tracking = {"id": 1, "events": []};</script>' * 3
+        return (
+            f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>{scripts}</head>'
+            f'<body><nav><ul>{nav}</ul></nav><article>{"".join(body_parts)}</article>'
+            f'<footer><a href="https://www.facebook.com/share">Share</a> '
+            f'<a href="/subscribe">Subscribe</a></footer></body></html>'
+        )
+
+    def cite(self, href, anchor=None):
+        anchor = anchor or ' '.join(self.rng.choice(self.vocab) for _ in range(3))
+        return f'<p>{self.sentence()} <a href="{href}">{anchor}</a> {self.sentence()}</p>'
+
+    def add(self, url, body, content_type='text/html; charset=utf-8', status=200):
+        self.pages[url] = (status, content_type, body if isinstance(body, bytes) else body.encode('utf-8'))
+
+    def build(self):
+        rng = self.rng
+        nav = [('/', 'Home'), ('/world', 'World'), ('/science', 'Science'), ('/login', 'Log in')]
+
+        # Bedrock sources: government, academic, research, NGOs. Sparse links between them.
+        source_domains = ['www.cdc.gov', 'www.nih.gov', 'www.census.gov', 'www.bls.gov',
+                          'www.harvard.edu', 'web.mit.edu', 'www.stanford.edu',
+                          'www.nature.com', 'arxiv.org', 'www.science.org',
+                          'www.pewresearch.org', 'www.who.org']
+        self.sources = [f'https://{d}/report/{i}' for d in source_domains for i in range(5)]
+        for url in self.sources:
+            parts = [f'<p>{self.paragraph()}</p>' for _ in range(rng.randint(8, 20))]
+            parts += [self.cite(target) for target in rng.sample(self.sources, 3) if target != url]
+            self.add(url, self.html(f'Report {url}', parts, nav))
+
+        # Broken and binary links that the fetcher should reject cheaply
+        self.add('https://www.cdc.gov/report/missing', '<html><body>Not Found</body></html>', status=404)
+        self.add('https://www.nih.gov/images/chart.png', b'\x89PNG' + bytes(50000), content_type='image/png')
+        self.add('https://www.census.gov/data/report.pdf', self.pdf(), content_type='application/pdf')
+
+        # Wire story syndicated by several outlets
+        wire = [f'<p>{self.paragraph(5)}</p>' for _ in range(12)]
+        wire_links = [self.cite(url) for url in rng.sample(self.sources, 6)]
+        outlets = ['apnews.com', 'www.reuters.com', 'www.nytimes.com', 'www.washingtonpost.com',
+                   'www.cnn.com', 'www.foxnews.com', 'www.theguardian.com']
+        copies = []
+        for outlet in outlets:
+            url = f'https://{outlet}/2024/wire-story'
+            intro = f'<p>Published by {outlet}. {self.sentence()}</p>'
+            self.add(url, self.html(f'Wire story | {outlet}', [intro] + wire + wire_links, nav))
+            copies.append(url)
+        self.scenarios['syndicated'] = 'https://www.bbc.co.uk/news/roundup'
+        self.add(self.scenarios['syndicated'], self.html(
+            'Coverage roundup', [self.cite(url, 'coverage') for url in copies] + [f'<p>{self.paragraph()}</p>'], nav))
+
+        # Typical news article: some sources, an error page, a PDF, internal nav
+        article_links = rng.sample(self.sources, 10) + [
+            'https://www.cdc.gov/report/missing', 'https://www.nih.gov/images/chart.png',
+            'https://www.census.gov/data/report.pdf', copies[0]
+        ]
+        parts = [f'<p>{self.paragraph()}</p>' for _ in range(25)]
+        parts += [self.cite(url) for url in article_links]
+        parts += [self.cite(f'https://www.npr.org/section/{i}') for i in range(3)]
+        self.scenarios['article'] = 'https://www.npr.org/2024/article'
+        self.add(self.scenarios['article'], self.html('News article', parts, nav))
+        for i in range(3):
+            self.add(f'https://www.npr.org/section/{i}', self.html(f'Section {i}', [f'<p>{self.paragraph()}</p>'], nav))
+
+        # Dense cross-citing cluster of blogs that mostly cite each other
+        cluster = [f'https://writer{i}.substack.com/p/post' for i in range(14)]
+        for url in cluster:
+            peers = rng.sample([c for c in cluster if c != url], 4)
+            parts = [f'<p>{self.paragraph()}</p>' for _ in range(10)]
+            parts += [self.cite(peer) for peer in peers] + [self.cite(rng.choice(self.sources))]
+            self.add(url, self.html('Cluster post', parts, nav))
+        self.scenarios['cluster'] = cluster[0]
+
+        # Wikipedia-scale page: long body, thousands of internal links, big reference list
+        wiki = 'https://en.wikipedia.org/wiki/Benchmark_Topic'
+        parts = []
+        for section in range(60):
+            parts.append(f'<h2>Section {section}</h2>')
+            for _ in range(6):
+                inline = ''.join(
+                    f' <a href="/wiki/{rng.choice(self.vocab).capitalize()}">{rng.choice(self.vocab)}</a> {self.sentence()}'
+                    for _ in range(4)
+                )
+                parts.append(f'<p>{self.paragraph()}{inline}</p>')
+        refs = self.sources + [f'https://{rng.choice(outlets)}/{rng.choice(self.vocab)}/{i}' for i in range(1500)]
+        parts.append('<ol class="references">' + ''.join(
+            f'<li><cite>{self.sentence(12)} <a href="{url}">{self.sentence(5)}</a> Retrieved 2024.</cite></li>'
+            for url in refs
+        ) + '</ol>')
+        navbox = ''.join(f'<a href="/wiki/Topic_{i}">Topic {i}</a> ' for i in range(1500))
+        parts.append(f'<div class="navbox">{navbox}</div>')
+        self.scenarios['wikipedia'] = wiki
+        self.add(wiki, self.html('Benchmark Topic - Wikipedia', parts, nav))
+
+        return self.pages, self.scenarios
+
+    def pdf(self):
+        lines = [self.sentence() for _ in range(200)]
+        lines[50] += ' See https://www.bls.gov/report/2 for details.'
+        stream = zlib.compress(''.join(f'BT ({line}) Tj ET\n' for line in lines).encode('latin-1'))
+        return b'%PDF-1.4\n1 0 obj\n<< /Filter /FlateDecode >>\nstream\n' + stream + b'\nendstream\nendobj\n%%EOF'
+
+def write_corpus(path, pages, scenarios):
+    os.makedirs(path, exist_ok=True)
+    manifest = {'version': CORPUS_VERSION, 'scenarios': scenarios, 'pages': {}}
+    for i, (url, (status, content_type, body)) in enumerate(sorted(pages.items())):
+        filename = f'page_{i:05d}.bin'
+        with open(os.path.join(path, filename), 'wb') as f:
+            f.write(body)
+        manifest['pages'][url] = {'file': filename, 'status': status, 'content_type': content_type}
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+def load_corpus(path=DEFAULT_CORPUS):
+    """Load (generating if missing) a corpus: ({url: (status, content_type, body)}, scenarios)"""
+    manifest_path = os.path.join(path, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        write_corpus(path, *CorpusBuilder().build())
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    pages = {}
+    for url, entry in manifest['pages'].items():
+        with open(os.path.join(path, entry['file']), 'rb') as f:
+            pages[url] = (entry['status'], entry['content_type'], f.read())
+    return pages, manifest['scenarios']
+
+def record(urls, path=DEFAULT_CORPUS):
+    """Fetch live pages and add them to the corpus (each becomes a scenario root)"""
+    pages, scenarios = load_corpus(path)
+    for url in urls:
+        response = scraper.requests.get(url, headers=scraper.HEADERS, timeout=30)
+        pages[url] = (response.status_code, response.headers.get('Content-Type', ''), response.content)
+        scenarios[f'recorded:{urlparse(url).netloc}{urlparse(url).path}'] = url
+        print(f"Recorded {url} ({len(response.content)} bytes, HTTP {response.status_code})")
+    write_corpus(path, pages, scenarios)
+
+# --- Fakes ----------------------------------------------------------------------
+
+class ReplayResponse:
+    """Just enough of requests.Response for scraper.fetch_document"""
+    def __init__(self, status, content_type, body):
+        self.status_code = status
+        self.headers = {'Content-Type': content_type, 'Content-Length': str(len(body))}
+        self.encoding = 'utf-8' if 'charset' in content_type.lower() else None
+        self._body = body
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self._body), chunk_size):
+            yield self._body[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class FakeBackends:
+    """Replay HTTP, fake LLM and fake search, with per-call latency in seconds"""
+    def __init__(self, pages, fetch_latency=0.0, llm_latency=0.0, search_latency=0.0):
+        self.pages = pages
+        self.fetch_latency = fetch_latency
+        self.llm_latency = llm_latency
+        self.search_latency = search_latency
+        self.search_pool = sorted(u for u in pages if urlparse(u).netloc.endswith(('.gov', '.edu', '.org')))
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        if self.fetch_latency:
+            time.sleep(self.fetch_latency)
+        status, content_type, body = self.pages.get(url, (404, 'text/html', b'<html><body>Not Found</body></html>'))
+        return ReplayResponse(status, content_type, body)
+
+    def verify_link_significance(self, context_text, link_url, link_anchor):
+        if self.llm_latency:
+            time.sleep(self.llm_latency)
+        score = 30 + zlib.crc32(link_url.encode()) % 70
+        return {'score': score, 'type': 'Source' if score > 60 else 'Related', 'reason': 'benchmark'}
+
+    def llm_extract_implicit_sources(self, page_text, page_url):
+        if self.llm_latency:
+            time.sleep(self.llm_latency)
+        rng = random.Random(zlib.crc32(page_url.encode()))
+        words = page_text.split()
+        claims = []
+        for i in range(6):
+            claim = ' '.join(rng.sample(words, min(12, len(words))))
+            claims.append({
+                'claim': claim,
+                'needs_source_type': 'government data',
+                # Every third claim names no source and has no search query: nothing
+                # to discover, so it becomes a virtual node labelled by needs_source_type
+                'mentioned_source': '' if i % 3 == 0 else rng.choice(['CDC', 'Pew Research', 'NIH', 'Census Bureau']),
+                'has_explicit_link': i % 4 == 0,
+                'search_query': f'benchmark query {i}' if i % 3 else ''
+            })
+        return claims
+
+    def search(self, query, num_results=10, sleep_interval=0, advanced=False):
+        if self.search_latency:
+            time.sleep(self.search_latency)
+        rng = random.Random(zlib.crc32(query.encode()))
+        urls = rng.sample(self.search_pool, min(num_results, len(self.search_pool)))
+        return iter(self.search_result(url) for url in urls) if advanced else iter(urls)
+
+    def search_result(self, url):
+        """googlesearch-style advanced result: url, title and a snippet of the page text"""
+        html = self.pages[url][2].decode('utf-8', 'replace')
+        title = re.search(r'<title>(.*?)</title>', html)
+        words = re.sub(r'<[^>]+>', ' ', html.split('<article>', 1)[-1]).split()
+        return types.SimpleNamespace(url=url, title=title.group(1) if title else '', description=' '.join(words[:40]))
+
+# --- Measurement ------------------------------------------------------------------
+
+class StageTimer:
+    """Collects call durations per named stage"""
+    def __init__(self):
+        self.durations = {}
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.durations.setdefault(stage, []).append(time.perf_counter() - start)
+        return timed
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {
+        'count': len(ordered),
+        'total_ms': round(sum(ordered) * 1000, 3),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': round(pick(0.5) * 1000, 3),
+        'p90_ms': round(pick(0.9) * 1000, 3),
+        'p99_ms': round(pick(0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
+
+@contextlib.contextmanager
+def patched(fakes, timer):
+    """Swap the network/LLM/search entry points for timed fakes"""
+    targets = [
+        (scraper.requests, 'get', timer.wrap('fetch', fakes.get)),
+        (graph_builder, 'fetch_document', timer.wrap('fetch_document', scraper.fetch_document)),
+        (graph_builder, 'BeautifulSoup', timer.wrap('parse', graph_builder.BeautifulSoup)),
+        (llm_analyzer, 'verify_link_significance', timer.wrap('verify_link_significance', fakes.verify_link_significance)),
+        (graph_builder, 'llm_extract_implicit_sources', timer.wrap('llm_extract_implicit_sources', fakes.llm_extract_implicit_sources)),
+        (source_hunter, 'search', timer.wrap('search', fakes.search)),
+        (graph_builder, 'find_sources_for_claims', timer.wrap('find_sources_for_claims', source_hunter.find_sources_for_claims)),
+    ]
+    originals = [(obj, name, getattr(obj, name)) for obj, name, _ in targets]
+    try:
+        for obj, name, replacement in targets:
+            setattr(obj, name, replacement)
+        yield
+    finally:
+        for obj, name, original in originals:
+            setattr(obj, name, original)
+
+def run_pipeline(root_url, max_depth, timer):
+    """build_graph -> analyze_structure -> export_for_visualization, each timed"""
+    # A fresh domain registry per run: every run pays for its robots.txt reads
+    # and no run skips hosts an earlier one marked dead
+    graph = SourceGraph(domains=DomainRegistry())
+    graph.max_depth = max_depth
+    stages = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        graph.build_graph(root_url)
+        stages['build_graph'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        graph.analyze_structure()
+        stages['analyze_structure'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        graph.export_for_visualization()
+        stages['export_for_visualization'] = time.perf_counter() - start
+    return graph, stages
+
+def measure_peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_scenario(name, pages, root_url, max_depth, runs, latencies, memory=True):
+    fakes = FakeBackends(pages, **latencies)
+    timer = StageTimer()
+    end_to_end = {'build_graph': [], 'analyze_structure': [], 'export_for_visualization': [], 'total': []}
+    graph = None
+
+    with patched(fakes, timer):
+        for _ in range(runs):
+            graph, stages = run_pipeline(root_url, max_depth, timer)
+            for stage, seconds in stages.items():
+                end_to_end[stage].append(seconds)
+            end_to_end['total'].append(sum(stages.values()))
+        per_run_calls = {stage: len(d) // runs for stage, d in timer.durations.items()}
+        peak = measure_peak_memory(lambda: run_pipeline(root_url, max_depth, StageTimer())) if memory else None
+
+    build_p50 = percentiles(end_to_end['build_graph'])['p50_ms'] / 1000
+    pages_fetched = per_run_calls.get('fetch_document', 0)
+    return {
+        'scenario': name,
+        'root': root_url,
+        'max_depth': max_depth,
+        'runs': runs,
+        'nodes': graph.G.number_of_nodes(),
+        'edges': graph.G.number_of_edges(),
+        'pages_fetched': pages_fetched,
+        'pages_per_second': round(pages_fetched / build_p50, 2) if build_p50 else None,
+        'end_to_end': {stage: percentiles(samples) for stage, samples in end_to_end.items()},
+        'stages': {stage: percentiles(samples) for stage, samples in timer.durations.items()},
+        'calls_per_run': per_run_calls,
+        'peak_memory_mb': round(peak / 1024 / 1024, 2) if peak is not None else None
+    }
+
+def synthetic_graph(edge_count, seed=0):
+    """Citation-shaped random graph: few citing pages, many cited sources, skewed popularity"""
+    rng = random.Random(seed)
+    graph = SourceGraph()
+    citing = max(10, edge_count // 12)
+    cited = max(20, edge_count // 2)
+    tlds = ['gov', 'edu', 'org', 'com', 'com', 'com']
+    # Zipf-like target popularity so there are real hubs
+    popularity = list(itertools.accumulate(1.0 / (k + 1) ** 0.9 for k in range(cited)))
+    edges = set()
+    while len(edges) < edge_count:
+        site = rng.randrange(citing)
+        src = rng.choices(range(cited), cum_weights=popularity)[0]
+        edges.add((f'https://site{site}.{tlds[site % len(tlds)]}/page', f'https://src{src}.{tlds[src % len(tlds)]}/doc'))
+    for source, target in sorted(edges):
+        graph.G.add_edge(source, target, type='explicit', confidence=rng.random(), context='')
+    for node in graph.G.nodes():
+        graph.G.nodes[node]['type'] = graph.classify_domain(node)
+    return graph
+
+def bench_analysis(edge_count, runs, memory=True):
+    graph = synthetic_graph(edge_count)
+    timings = {'analyze_structure': [], 'export_for_visualization': []}
+    for _ in range(runs):
+        for stage in timings:
+            start = time.perf_counter()
+            getattr(graph, stage)()
+            timings[stage].append(time.perf_counter() - start)
+    peak = measure_peak_memory(lambda: (graph.analyze_structure(), graph.export_for_visualization())) if memory else None
+    return {
+        'scenario': f'analysis-{edge_count}',
+        'nodes': graph.G.number_of_nodes(),
+        'edges': graph.G.number_of_edges(),
+        'runs': runs,
+        'end_to_end': {stage: percentiles(samples) for stage, samples in timings.items()},
+        'edges_per_second': {
+            stage: round(edge_count / (percentiles(samples)['p50_ms'] / 1000), 1)
+            for stage, samples in timings.items() if percentiles(samples)['p50_ms']
+        },
+        'peak_memory_mb': round(peak / 1024 / 1024, 2) if peak is not None else None
+    }
+
+def print_report(results):
+    for result in results:
+        print(f"\n== {result['scenario']}: {result['nodes']} nodes, {result['edges']} edges, "
+              f"{result['runs']} runs, peak {result['peak_memory_mb']} MB")
+        if 'pages_fetched' in result:
+            print(f"   {result['pages_fetched']} pages fetched, {result['pages_per_second']} pages/s")
+        rows = list(result['end_to_end'].items()) + list(result.get('stages', {}).items())
+        print(f"   {'stage':<30}{'calls':>7}{'p50 ms':>11}{'p90 ms':>11}{'p99 ms':>11}{'total ms':>12}")
+        for stage, stats in rows:
+            print(f"   {stage:<30}{stats['count']:>7}{stats['p50_ms']:>11}{stats['p90_ms']:>11}"
+                  f"{stats['p99_ms']:>11}{stats['total_ms']:>12}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline SourceGraph benchmark')
+    parser.add_argument('command', nargs='?', default='run', choices=['run', 'record'])
+    parser.add_argument('urls', nargs='*', help='URLs to record (record command)')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--scenarios', nargs='*', help='Crawl scenarios (default: all in the corpus)')
+    parser.add_argument('--analysis-sizes', nargs='*', type=int, default=ANALYSIS_SIZES)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--fetch-latency', type=float, default=0.0)
+    parser.add_argument('--llm-latency', type=float, default=0.0)
+    parser.add_argument('--search-latency', type=float, default=0.0)
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc pass')
+    parser.add_argument('--json', help='Also write results to this file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        record(args.urls, args.corpus)
+        return
+
+    pages, scenarios = load_corpus(args.corpus)
+    # Lazy dependencies (spaCy above all) load now, not inside the first run's stages
+    startup.warm_up()
+    latencies = {
+        'fetch_latency': args.fetch_latency,
+        'llm_latency': args.llm_latency,
+        'search_latency': args.search_latency
+    }
+
+    results = []
+    for name in args.scenarios if args.scenarios is not None else list(scenarios):
+        root_key, depth = SCENARIOS.get(name, (name, 2))
+        results.append(bench_scenario(name, pages, scenarios[root_key], depth, args.runs, latencies,
+                                      memory=not args.no_memory))
+    for edge_count in args.analysis_sizes:
+        results.append(bench_analysis(edge_count, args.runs, memory=not args.no_memory))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
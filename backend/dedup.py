@@ -0,0 +1,95 @@
+import re
+import zlib
+import random
+
+# MinHash parameters: 64 hash functions split into 16 LSH bands of 4 rows.
+# With 4 rows per band, two pages with Jaccard similarity 0.8 share at least
+# one bucket >99.9% of the time; pages at 0.3 only become candidates ~12% of
+# the time and are then rejected by the full signature comparison.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+SHINGLE_SIZE = 5        # words per shingle
+MIN_WORDS = 60          # too little text to say anything about duplication
+MAX_WORDS = 2000        # the opening of an article is enough to recognise a copy
+DUPLICATE_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed so signatures are comparable across processes and runs
+_rng = random.Random(1729)
+_PERMUTATIONS = [
+    (_rng.randint(1, _MERSENNE_PRIME - 1), _rng.randint(0, _MERSENNE_PRIME - 1))
+    for _ in range(NUM_PERM)
+]
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Hash every run of `size` consecutive words into a set of 32-bit ints"""
+    words = re.findall(r'\w+', text.lower())[:MAX_WORDS]
+    if len(words) < size:
+        return set()
+    return {
+        zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+        for i in range(len(words) - size + 1)
+    }
+
+def minhash_signature(shingle_set):
+    """MinHash signature: the minimum of each permuted hash over all shingles"""
+    return tuple(
+        min(((a * x + b) % _MERSENNE_PRIME) & _MAX_HASH for x in shingle_set)
+        for a, b in _PERMUTATIONS
+    )
+
+def estimate_similarity(sig_a, sig_b):
+    """Fraction of matching MinHash slots ~= Jaccard similarity of the shingle sets"""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH index over fetched page text.
+    Used by SourceGraph to spot syndicated copies (wire stories republished
+    across outlets) so they are linked to the first copy instead of re-crawled.
+    """
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.signatures = {}   # url -> signature
+        self.buckets = {}      # (band, band hash) -> [url, ...]
+
+    def _band_keys(self, signature):
+        for band in range(BANDS):
+            yield (band, signature[band * ROWS:(band + 1) * ROWS])
+
+    def signature_for(self, text):
+        """Signature for a page's text, or None if the text is too short to judge"""
+        shingle_set = shingles(text)
+        if len(shingle_set) < MIN_WORDS - SHINGLE_SIZE + 1:
+            return None
+        return minhash_signature(shingle_set)
+
+    def find_duplicate(self, signature):
+        """Return (url, similarity) of the closest indexed page above threshold, or None"""
+        if signature is None:
+            return None
+
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+
+        best = None
+        for url in candidates:
+            similarity = estimate_similarity(signature, self.signatures[url])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (url, similarity)
+        return best
+
+    def add(self, url, signature):
+        if signature is None or url in self.signatures:
+            return
+        self.signatures[url] = signature
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, []).append(url)
+
+    def __len__(self):
+        return len(self.signatures)
@@ -0,0 +1,275 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+# Per-host facts shared by every crawl in the process: robots.txt rules and
+# Crawl-delay, base domain and authority class, fetch latency and failures,
+# and whether pages on the host turned out paywalled or JavaScript-only.
+# Like the graph and result stores it is an LRU: at most MAX_DOMAINS hosts,
+# and a host nobody asked about for DOMAIN_TTL is forgotten.
+# build_graph asks it before verifying a link or fetching a page:
+#   dead host       (DEAD_AFTER failures in a row)  -> links skipped until DOMAIN_TTL passes
+#   robots disallow (the page's path)               -> page not fetched (checked at fetch time)
+#   paywall/JS-only (FLAG_AFTER pages, most pages)  -> linked, but not fetched or recursed into
+
+DOMAIN_TTL = float(os.environ.get('SOURCETREE_DOMAIN_TTL', 3600))  # robots.txt / dead-host memory, seconds
+MAX_DOMAINS = int(os.environ.get('SOURCETREE_MAX_DOMAINS', 5000))  # hosts remembered, least recently used dropped
+MAX_CRAWL_DELAY = float(os.environ.get('SOURCETREE_MAX_CRAWL_DELAY', 5))  # cap on a host's Crawl-delay
+ROBOTS_TIMEOUT = 5
+ROBOTS_RETRY = 60  # seconds before retrying a robots.txt that couldn't be reached
+ROBOTS_MAX_BYTES = 500 * 1024  # RFC 9309: parse at least 500 KiB
+DEAD_AFTER = 3
+FLAG_AFTER = 2
+LATENCY_ALPHA = 0.3  # weight of the newest fetch in the latency average
+
+DEAD, DISALLOWED = 'dead', 'robots'
+
+def base_domain(netloc):
+    """
+    Heuristic to get base domain (e.g. 'cnn.com' from 'edition.cnn.com')
+    Assumes 'example.com' or 'example.co.uk' structure
+    """
+    parts = netloc.split('.')
+    if len(parts) > 2:
+        # Very rough heuristic: if last part is 2 chars (uk, jp), might be co.uk
+        if len(parts[-1]) == 2 and len(parts[-2]) <= 3:
+            return '.'.join(parts[-3:])
+        return '.'.join(parts[-2:])
+    return netloc
+
+def user_agent():
+    """The crawler's User-Agent (scraper.HEADERS), which robots.txt groups are matched against"""
+    try:
+        from backend.scraper import HEADERS
+    except ImportError:
+        from scraper import HEADERS
+    return HEADERS['User-Agent']
+
+def host_failure(result, status=None):
+    """Whether a fetch outcome says something about the host rather than the page"""
+    if result == 'error':  # timeout, DNS, refused connection
+        return True
+    return result == 'http_error' and status is not None and (status >= 500 or status in (403, 429))
+
+class RobotsUnavailable(Exception):
+    """robots.txt couldn't be fetched (network error), so its rules are unknown"""
+
+class DomainInfo:
+    """What we know about one host"""
+    def __init__(self, host, scheme='https'):
+        self.host = host
+        self.scheme = scheme
+        self.seen_at = time.time()  # last lookup, for LRU/TTL eviction
+        self.robots_lock = threading.Lock()  # one robots.txt fetch at a time
+        self.base = base_domain(host)
+        self.type = None           # SourceGraph.classify_host(), filled on first use
+        self.robots = None         # RobotFileParser, or None = everything allowed
+        self.robots_at = None      # when robots.txt was (last) read
+        self.robots_retry = 0.0    # monotonic time an unreachable robots.txt may be retried
+        self.crawl_delay = 0.0
+        self.next_fetch = 0.0      # monotonic time the next fetch may start
+        self.fetches = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.dead_until = 0.0
+        self.latency_ms = None     # moving average
+        self.pages = 0             # pages fetched and checked for a wall
+        self.flags = {}            # 'paywall' / 'js_only' -> pages seen with it
+
+    def access(self):
+        """'paywall' / 'js_only' once most pages on the host showed it, else None"""
+        for flag, seen in self.flags.items():
+            if seen >= FLAG_AFTER and seen * 2 > self.pages:
+                return flag
+        return None
+
+    def report(self):
+        return {
+            'host': self.host,
+            'base': self.base,
+            'type': self.type,
+            'crawl_delay': self.crawl_delay,
+            'robots_read': self.robots_at is not None,
+            'fetches': self.fetches,
+            'failure_rate': round(self.failures / self.fetches, 3) if self.fetches else 0.0,
+            'latency_ms': round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            'dead': self.dead_until > time.time(),
+            'access': self.access()
+        }
+
+class DomainRegistry:
+    def __init__(self, ttl=DOMAIN_TTL, max_crawl_delay=MAX_CRAWL_DELAY, max_hosts=MAX_DOMAINS):
+        self.ttl = ttl
+        self.max_crawl_delay = max_crawl_delay
+        self.max_hosts = max_hosts
+        self._hosts = OrderedDict()  # host -> DomainInfo, least recently used first
+        self._lock = threading.Lock()
+
+    def info(self, url):
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        now = time.time()
+        with self._lock:
+            info = self._hosts.get(host)
+            if info is None:
+                info = self._hosts[host] = DomainInfo(host, parsed.scheme or 'https')
+                self._evict(now)
+            else:
+                info.seen_at = now
+                self._hosts.move_to_end(host)
+        return info
+
+    def _evict(self, now):
+        """Drop hosts over max_hosts or idle for the TTL (caller holds the lock)"""
+        while self._hosts:
+            oldest = next(iter(self._hosts.values()))
+            if len(self._hosts) <= self.max_hosts and now - oldest.seen_at <= self.ttl:
+                break
+            self._hosts.popitem(last=False)
+
+    def classification(self, url, classify):
+        """classify(host) for the URL's host, computed once per host"""
+        info = self.info(url)
+        if info.type is None:
+            info.type = classify(info.host)
+        return info.type
+
+    # --- robots.txt ---
+
+    def rules(self, info):
+        """
+        The host's robots.txt rules, fetched on first use and after DOMAIN_TTL.
+        A robots.txt that couldn't be reached allows everything for now and is
+        asked for again after ROBOTS_RETRY, not cached.
+        """
+        if info.robots_at is not None and time.time() - info.robots_at < self.ttl:
+            return info.robots
+        with info.robots_lock:  # one robots.txt fetch per host, even with concurrent crawls
+            if info.robots_at is None or time.time() - info.robots_at >= self.ttl:
+                if time.monotonic() < info.robots_retry:
+                    return info.robots  # last good rules, if any
+                try:
+                    info.robots = self._read_robots(info)
+                except RobotsUnavailable:
+                    info.robots_retry = time.monotonic() + ROBOTS_RETRY
+                    return info.robots
+                info.robots_at = time.time()
+        return info.robots
+
+    def _read_robots(self, info):
+        import requests
+        try:
+            from backend.scraper import read_body
+        except ImportError:
+            from scraper import read_body
+        url = f'{info.scheme}://{info.host}/robots.txt'
+        try:
+            with requests.get(url, headers={'User-Agent': user_agent()}, timeout=ROBOTS_TIMEOUT, stream=True) as response:
+                status = response.status_code
+                body = read_body(response, ROBOTS_MAX_BYTES)[0].decode('utf-8', 'replace') if status < 400 else ''
+        except Exception as e:
+            self.observe_failure(info)  # counts towards the host being dead, not as a page fetch
+            raise RobotsUnavailable(url) from e
+        rules = RobotFileParser()
+        if status >= 500:
+            rules.disallow_all = True  # server error: assume nothing may be crawled (RFC 9309)
+        elif status < 400:
+            rules.parse(body.splitlines())
+        else:
+            return None  # no robots.txt: everything allowed
+        delay = rules.crawl_delay(user_agent())
+        info.crawl_delay = min(float(delay), self.max_crawl_delay) if delay else 0.0
+        return rules
+
+    def allowed(self, url):
+        info = self.info(url)
+        rules = self.rules(info)
+        return rules is None or rules.can_fetch(user_agent(), url)
+
+    # --- decisions ---
+
+    def dead(self, url):
+        """Whether `url`'s host is marked dead - links there aren't worth verifying"""
+        info = self.info(url)
+        with self._lock:
+            if info.dead_until:
+                if info.dead_until > time.time():
+                    return True
+                info.dead_until = 0.0
+                info.consecutive_failures = 0  # TTL passed: give the host another chance
+        return False
+
+    def skip_reason(self, url):
+        """DEAD / DISALLOWED when `url` shouldn't be fetched, else None (may read robots.txt)"""
+        if self.dead(url):
+            return DEAD
+        if not self.allowed(url):
+            return DISALLOWED
+        return None
+
+    def access(self, url):
+        return self.info(url).access()
+
+    def wait(self, url):
+        """Sleep as long as the host's Crawl-delay asks since our last fetch there"""
+        info = self.info(url)
+        if not info.crawl_delay:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, info.next_fetch)
+            info.next_fetch = start + info.crawl_delay
+        if start > now:
+            time.sleep(start - now)
+
+    # --- observations ---
+
+    def observe(self, url, result, status=None, seconds=None, wall=None):
+        """
+        Record one page fetch: result is scraper's fetch result ('ok', 'http_error', ...),
+        wall the page's detect_access_wall() verdict when it was parsed.
+        """
+        info = self.info(url)
+        with self._lock:
+            info.fetches += 1
+            if seconds is not None and result != 'error':
+                ms = seconds * 1000
+                info.latency_ms = ms if info.latency_ms is None else \
+                    LATENCY_ALPHA * ms + (1 - LATENCY_ALPHA) * info.latency_ms
+            if result in ('ok', 'truncated'):
+                info.pages += 1
+                if wall:
+                    info.flags[wall] = info.flags.get(wall, 0) + 1
+            if host_failure(result, status):
+                info.failures += 1
+                self._host_failed(info)
+            else:
+                info.consecutive_failures = 0
+
+    def observe_failure(self, info):
+        """A failure that says the host is down but wasn't a page fetch (e.g. robots.txt)"""
+        with self._lock:
+            self._host_failed(info)
+
+    def _host_failed(self, info):
+        info.consecutive_failures += 1
+        if info.consecutive_failures >= DEAD_AFTER:
+            info.dead_until = time.time() + self.ttl
+
+    def snapshot(self):
+        with self._lock:
+            hosts = list(self._hosts.values())
+        return sorted((info.report() for info in hosts), key=lambda r: r['host'])
+
+    def clear(self):
+        with self._lock:
+            self._hosts.clear()
+
+    def __len__(self):
+        return len(self._hosts)
+
+# Shared by every SourceGraph in the process
+registry = DomainRegistry()
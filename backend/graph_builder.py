@@ -1,5 +1,6 @@
 import networkx as nx
 from datetime import datetime
+import hashlib
 import time
 import json
 from urllib.parse import urlparse
@@ -9,20 +10,53 @@ import traceback
 # Import our modules
 # Assuming they are in the same package or path is set up correctly
 try:
-    from backend.scraper import fetch_page, extract_links, extract_metadata
+    from backend.scraper import fetch_document, extract_links, extract_metadata, extract_pdf_links, extract_main_text, detect_access_wall
+    from backend.domains import registry as domain_registry, DEAD, DISALLOWED
+    from backend.dedup import NearDuplicateIndex
+    from backend.authority import compute_authority_metrics
+    from backend.layout import compute_layout
+    from backend.instrumentation import timed, timer, count, cache_lookup
+    from backend.tracing import span
+    from backend.memory import MemoryGuard, StringSpill, CEILING, unspill
+    from backend import memory
     from backend.llm_analyzer import llm_extract_implicit_sources
-    from backend.source_hunter import find_implicit_sources
+    from backend.source_hunter import find_sources_for_claims
 except ImportError:
     # Fallback for when running directly
-    from scraper import fetch_page, extract_links, extract_metadata
+    from scraper import fetch_document, extract_links, extract_metadata, extract_pdf_links, extract_main_text, detect_access_wall
+    from domains import registry as domain_registry, DEAD, DISALLOWED
+    from dedup import NearDuplicateIndex
+    from authority import compute_authority_metrics
+    from layout import compute_layout
+    from instrumentation import timed, timer, count, cache_lookup
+    from tracing import span
+    from memory import MemoryGuard, StringSpill, CEILING, unspill
+    import memory
     from llm_analyzer import llm_extract_implicit_sources
-    from source_hunter import find_implicit_sources
+    from source_hunter import find_sources_for_claims
+
+class RootUnavailable(Exception):
+    """The analysed URL itself may not be fetched (robots.txt disallows it, or its host is dead)"""
 
 class SourceGraph:
-    def __init__(self):
+    MAX_DEPTH = 2  # Don't go too deep
+    UNEXPORTED_EDGE_FIELDS = ('claim', 'reason', 'search_query')  # dropped in bounded mode
+
+    def __init__(self, bounded=None, max_rss_mb=None, domains=None):
+        """
+        bounded: share/spill long edge strings (default SOURCETREE_MEMORY_MODE=bounded)
+        max_rss_mb: RSS ceiling to degrade at (default SOURCETREE_MAX_RSS_MB; 0 = none)
+        domains: domains.DomainRegistry to consult (default: the process-wide one)
+        """
         self.G = nx.DiGraph()
         self.visited = set()
-        self.max_depth = 2  # Don't go too deep
+        self.max_depth = self.MAX_DEPTH
+        self.dedup = NearDuplicateIndex()  # Catches syndicated (wire) copies
+        self.trace = None  # tracing.Tracer of the run that built this graph, if traced
+        self.link_verdicts = {}  # (url, anchor, context) -> verify_link_significance result
+        self.memory = MemoryGuard(max_rss_mb)  # RSS start/peak and the degrade decision
+        self.strings = StringSpill() if (memory.BOUNDED if bounded is None else bounded) else None
+        self.domains = domain_registry if domains is None else domains  # robots.txt, host health, classes
         
     def add_page_node(self, url, metadata):
         """Add a page as a node"""
@@ -34,15 +68,40 @@ class SourceGraph:
         """
         Add directed edge: from_url cites to_url
         """
+        if self.strings:
+            # Bounded mode: the context string lives in the spill file (read back
+            # by export_link); fields no export reads aren't kept at all
+            edge_data = {
+                key: self.strings.store(value) for key, value in edge_data.items()
+                if key not in self.UNEXPORTED_EDGE_FIELDS
+            }
         self.G.add_edge(from_url, to_url, **edge_data)
+
+    def acquire(self):
+        """
+        Start reading the graph's spilled strings (pair with release()); a close()
+        meanwhile waits for the release. False once the graph is closed.
+        """
+        return self.strings.acquire() if self.strings else True
+
+    def release(self):
+        if self.strings:
+            self.strings.release()
+
+    def close(self):
+        """Release the bounded-mode spill file; spilled strings can't be read afterwards"""
+        if self.strings:
+            self.strings.close()
     
     def classify_domain(self, url):
         """
         Classify webpage by authority type for color-coding
+        (worked out once per host, see domains.py)
         """
-        parsed = urlparse(url)
-        domain = parsed.netloc.lower()
-        
+        return self.domains.classification(url, self.classify_host)
+
+    def classify_host(self, domain):
+        """Authority type of a (lowercase) host name"""
         # Government/Official
         if domain.endswith('.gov') or 'government' in domain:
             return 'government'
@@ -110,41 +169,76 @@ class SourceGraph:
         
         self.visited.add(root_url)
         print(f"Analyzing: {root_url} (depth {current_depth})")
-        
-        # Fetch and parse page
-        html = fetch_page(root_url)
-        if not html:
-            return
-            
-        soup = BeautifulSoup(html, 'html.parser')
-        text = soup.get_text()
-        
-        # Extract metadata
-        metadata = extract_metadata(soup, root_url)
-        self.add_page_node(root_url, metadata)
-        
-        # TRADITIONAL SCRAPING: Explicit links
-        explicit_links = extract_links(soup, root_url)
-        
+
+        # One trace span per recursion level (no-op unless the run is traced)
+        with span('crawl', url=root_url, depth=current_depth):
+            self.crawl_page(root_url, current_depth)
+
+    def read_page(self, root_url, current_depth):
+        """
+        Fetch and parse one page into a compact record: metadata, the candidate
+        links worth verifying, its near-duplicate signature and (root only) the
+        text for claim extraction. The parse tree is decomposed before returning
+        (its parent/child links are reference cycles that would otherwise wait
+        for the cyclic GC) and the HTML and full text die on return, so none of
+        it is held while crawl_page recurses into the page's sources.
+        """
+        # Dead hosts and pages robots.txt disallows aren't fetched at all
+        reason = self.domains.skip_reason(root_url)
+        if reason:
+            count('sourcetree_domain_skipped_total', reason=reason)
+            if current_depth == 0:
+                # The submitted page itself: an empty graph would look like a successful analysis
+                message = 'disallowed by robots.txt' if reason == DISALLOWED else 'host is not responding'
+                raise RootUnavailable(f'{root_url}: {message}')
+            print(f"   [-] Skipping {root_url} ({reason})")
+            return None
+
+        # Fetch page (streamed, size-capped, error pages and binaries already dropped)
+        self.domains.wait(root_url)  # the host's Crawl-delay, if it set one
+        outcome = {}
+        started = time.perf_counter()
+        document = fetch_document(root_url, max_bytes=self.memory.page_bytes(), outcome=outcome)
+        seconds = time.perf_counter() - started
+        if not document:
+            self.domains.observe(root_url, outcome.get('result'), outcome.get('status'), seconds)
+            return None
+        wall = None
+
+        if document['kind'] == 'pdf':
+            # PDFs skip the HTML parser entirely: plain text + URLs found in it
+            text = document['text']
+            body_text = text
+            metadata = {
+                'url': root_url,
+                'title': urlparse(root_url).path.rsplit('/', 1)[-1] or root_url,
+                'domain': urlparse(root_url).netloc,
+                'format': 'pdf'
+            }
+            explicit_links = extract_pdf_links(text)
+        else:
+            with timer('parse'):
+                soup = BeautifulSoup(document['html'], 'html.parser')
+                text = soup.get_text()
+                body_text = extract_main_text(soup)
+
+            # Extract metadata
+            metadata = extract_metadata(soup, root_url)
+
+            # TRADITIONAL SCRAPING: Explicit links
+            explicit_links = extract_links(soup, root_url)
+
+            # Paywalled / JavaScript-only page: remembered per host
+            wall = detect_access_wall(document['html'], body_text)
+            if wall:
+                metadata['access'] = wall
+            soup.decompose()
+        self.domains.observe(root_url, outcome.get('result'), outcome.get('status'), seconds, wall)
+
         # PRIORITIZATION STRATEGY:
         # Separate internal vs external links using STRICT base domain comparison
-        # This handles edition.cnn.com vs cnn.com
-        
-        def get_base_domain(netloc):
-            """
-            Heuristic to get base domain (e.g. 'cnn.com' from 'edition.cnn.com')
-            Assumes 'example.com' or 'example.co.uk' structure
-            """
-            parts = netloc.split('.')
-            if len(parts) > 2:
-                # Very rough heuristic: if last part is 2 chars (uk, jp), might be co.uk
-                if len(parts[-1]) == 2 and len(parts[-2]) <= 3:
-                     return '.'.join(parts[-3:])
-                return '.'.join(parts[-2:])
-            return netloc
-
-        root_netloc = urlparse(root_url).netloc
-        root_base = get_base_domain(root_netloc)
+        # This handles edition.cnn.com vs cnn.com (base domains cached per host)
+        root_base = self.domains.info(root_url).base
         
         external_links = []
         internal_links = []
@@ -153,8 +247,7 @@ class SourceGraph:
             # Skip self-loops
             if link['url'] == root_url: continue
             
-            link_netloc = urlparse(link['url']).netloc
-            link_base = get_base_domain(link_netloc)
+            link_base = self.domains.info(link['url']).base
             
             # STRICT CHECK: If base domains match, it's internal!
             if link_base != root_base and link_base not in root_base and root_base not in link_base:
@@ -169,11 +262,62 @@ class SourceGraph:
         print(f"   Found {len(explicit_links)} links. Filtered to {len(external_links)} truly external.")
         print(f"   Selected {len(selected_links)} candidate links for Deep Analysis.")
 
-        for link in selected_links:
+        return {
+            'metadata': metadata,
+            'links': selected_links,
+            'signature': self.dedup.signature_for(body_text),
+            # Only the root's text goes to the claim extractor, and only the start of it
+            'claim_text': text[:5000] if current_depth == 0 else None
+        }
+
+    def crawl_page(self, root_url, current_depth):
+        """
+        Fetch one page, add its node and citations, and recurse into sources
+        """
+        # Near the memory ceiling: stop crawling, keep what we have
+        if self.memory.check() == CEILING:
+            self.memory.skipped_pages += 1
+            count('sourcetree_memory_skipped_pages_total')
+            print(f"   [!] Memory ceiling reached, not crawling {root_url}")
+            return
+
+        page = self.read_page(root_url, current_depth)
+        if not page:
+            return
+        self.add_page_node(root_url, page['metadata'])
+
+        # SYNDICATION CHECK: Wire stories are republished almost verbatim.
+        # Link a near-duplicate to the first copy we saw and stop here -
+        # its links were already verified (and recursed into) on that copy.
+        signature = page['signature']
+        duplicate = self.dedup.find_duplicate(signature)
+        if duplicate:
+            original_url, similarity = duplicate
+            print(f"   [=] Syndicated copy of {original_url} (similarity {similarity:.2f}), skipping links")
+            count('sourcetree_syndicated_pages_total')
+            self.G.nodes[root_url]['syndicated_of'] = original_url
+            self.add_citation_edge(
+                root_url,
+                original_url,
+                {
+                    'type': 'syndicated',
+                    'confidence': similarity,
+                    'reason': 'Near-duplicate page text'
+                }
+            )
+            return
+        self.dedup.add(root_url, signature)
+
+        for link in page['links']:
             # DEEP SEMANTIC ANALYSIS (The "Truth Seeker" Step)
             # We ask the LLM: Is this link actually a source?
             # print(f"   Analyzing significance of: {link['url']}...")
             
+            # Dead hosts: not worth an LLM call (robots.txt is checked if we fetch it)
+            if self.domains.dead(link['url']):
+                count('sourcetree_domain_skipped_total', reason=DEAD)
+                continue
+
             # Use cached context from scraper
             context = link.get('context', '')
             anchor = link.get('anchor_text', '')
@@ -181,7 +325,17 @@ class SourceGraph:
             # This function is imported from llm_analyzer
             from backend.llm_analyzer import verify_link_significance
             
-            analysis = verify_link_significance(context, link['url'], anchor)
+            # Related articles often quote the same passage with the same link
+            # (see batch.py, where one graph serves many roots) - ask only once
+            verdict_key = (link['url'], anchor, context)
+            if self.strings:
+                # Don't pin every context string in memory; a 128-bit digest won't collide
+                verdict_key = hashlib.blake2b('\0'.join(verdict_key).encode('utf-8'), digest_size=16).digest()
+            analysis = self.link_verdicts.get(verdict_key)
+            cache_lookup('link_verdicts', analysis is not None)
+            if analysis is None:
+                analysis = verify_link_significance(context, link['url'], anchor)
+                self.link_verdicts[verdict_key] = analysis
             score = analysis['score']
             link_type = analysis['type']
             
@@ -207,29 +361,33 @@ class SourceGraph:
             )
             
             # Add node if not exists
+            access = self.domains.access(link['url'])  # host known to be paywalled / JS-only
             if link['url'] not in self.G:
                  self.add_page_node(link['url'], {
                      'url': link['url'],
-                     'type': 'source' if score > 75 else 'related'
+                     'type': 'source' if score > 75 else 'related',
+                     **({'access': access} if access else {})
                  })
 
             # Recurse only for High Significance links (True Sources)
-            # time.sleep(1)  # Be polite
-            if score > 60 and current_depth + 1 < self.max_depth:
+            # whose pages we'd actually get to read
+            if score > 60 and current_depth + 1 < self.max_depth and not access:
                 self.build_graph(link['url'], current_depth + 1)
         
         # SEMANTIC ANALYSIS: Implicit sources
         # Only run LLM on the root or interesting pages to save tokens/time
         if current_depth == 0: 
-            claims = llm_extract_implicit_sources(text[:5000], root_url)
-            
-            for claim in claims:
+            claims = llm_extract_implicit_sources(page['claim_text'], root_url)
+            # Try to discover the sources: all claims searched and ranked together
+            discovered = find_sources_for_claims(claims)
+
+            for claim, discovered_sources in zip(claims, discovered):
                 if not claim.get('has_explicit_link'):
-                    # Try to discover the source
-                    discovered_sources = find_implicit_sources(claim)
-                    
                     if discovered_sources:
                         for source in discovered_sources:
+                            if self.domains.dead(source['url']):
+                                count('sourcetree_domain_skipped_total', reason=DEAD)
+                                continue
                             self.add_citation_edge(
                                 root_url,
                                 source['url'],
@@ -237,6 +395,7 @@ class SourceGraph:
                                     'type': 'discovered',
                                     'claim': claim.get('claim'),
                                     'confidence': source.get('confidence'),
+                                    'relevance': source.get('relevance'),
                                     'search_query': source.get('search_query')
                                 }
                             )
@@ -245,7 +404,7 @@ class SourceGraph:
                                 self.add_page_node(source['url'], {'url': source['url']})
                             
                             # Recurse on discovered sources
-                            if current_depth + 1 < self.max_depth:
+                            if current_depth + 1 < self.max_depth and not self.domains.access(source['url']):
                                 self.build_graph(source['url'], current_depth + 1)
                     else:
                         # VIRTUAL NODE LOGIC (For offline/missing sources)
@@ -266,6 +425,7 @@ class SourceGraph:
                                  }
                              )
     
+    @timed('analyze_structure')
     def analyze_structure(self):
         """
         Compute epistemological metrics
@@ -276,6 +436,13 @@ class SourceGraph:
         except:
              cycles = []
 
+        # Bedrock = tier 1/2 sources (government, academic, research, offline originals)
+        bedrock_nodes = {
+            n for n, node_type in self.G.nodes(data='type')
+            if self.get_tier(node_type or 'unknown') <= 2
+        }
+        authority = compute_authority_metrics(self.G, bedrock_nodes)
+
         return {
             'total_nodes': self.G.number_of_nodes(),
             'total_edges': self.G.number_of_edges(),
@@ -298,9 +465,40 @@ class SourceGraph:
                 reverse=True
             )[:10],
             
+            # Authority: PageRank / HITS instead of raw in-degree
+            'pagerank': authority['pagerank'],
+            'hits_authorities': authority['hits_authorities'],
+            'hits_hubs': authority['hits_hubs'],
+
+            # Depth: Citation hops from each node to the nearest tier 1/2 source
+            'distance_to_bedrock': authority['distance_to_bedrock'],
+            'bedrock': authority['bedrock'],
+
+            # Independence: 1 - overlap of what two pages cite
+            'independence': authority['independence'],
+            'dependent_pairs': authority['dependent_pairs'],
+
             # Orphans: Claims with no sources
-            'unsourced_nodes': [n for n in self.G.nodes() if self.G.out_degree(n) == 0]
+            'unsourced_nodes': [n for n in self.G.nodes() if self.G.out_degree(n) == 0],
+
+            # Syndication: pages that are near-copies of another page in the graph
+            'syndicated_copies': [
+                {'url': n, 'original': d['syndicated_of']}
+                for n, d in self.G.nodes(data=True) if d.get('syndicated_of')
+            ],
+
+            # Memory: RSS over the analysis, and whether the crawl was cut short
+            'memory': self.memory_report()
         }
+
+    def memory_report(self):
+        self.memory.check()
+        report = self.memory.report()
+        report['bounded'] = self.strings is not None
+        if self.strings:
+            report['spilled_strings'] = self.strings.spilled
+            report['spilled_mb'] = round(self.strings.spilled_bytes / (1024 * 1024), 3)
+        return report
     
     def find_bottlenecks(self, threshold=3):
         """
@@ -318,42 +516,63 @@ class SourceGraph:
                 })
         return bottlenecks
     
-    def export_for_visualization(self):
+    def export_node(self, node_id, attrs):
+        """Client-facing dict for one node (shared by full export and graph queries)"""
+        domain_val = attrs.get('domain')
+        if not domain_val:
+            if node_id.startswith('[Offline]'):
+                domain_val = node_id # The name is the domain for virtual nodes
+            else:
+                domain_val = urlparse(node_id).netloc
+
+        node_type = attrs.get('type', 'unknown')
+
+        return {
+            'id': node_id,
+            'title': attrs.get('title', node_id),
+            'domain': domain_val,
+            'type': node_type,
+            'tier': self.get_tier(node_type),
+            'citations': self.G.in_degree(node_id)
+        }
+
+    def export_link(self, source, target, attrs):
+        """Client-facing dict for one citation edge"""
+        return {
+            'source': source,
+            'target': target,
+            'type': attrs.get('type', 'unknown'),
+            'confidence': attrs.get('confidence', 0.5),
+            'context': unspill(attrs.get('context', ''))
+        }
+
+    @timed('export')
+    def export_for_visualization(self, layout=False, seed=None, bands=None):
         """
         Export graph as JSON for D3.js
+        With layout=True, nodes also carry precomputed normalised x/y (0-1)
+        and the payload gets the tier bands used (see layout.compute_layout;
+        seed and bands come from the IncrementalLayout of a streamed run).
         """
         nodes = []
         links = []
+
+        positions = {}
+        if layout:
+            tier_of = {n: self.get_tier(t or 'unknown') for n, t in self.G.nodes(data='type')}
+            positions, bands = compute_layout(self.G, tier_of, seed=seed, bands=bands)
         
         for node in self.G.nodes(data=True):
             try:
-                domain_val = node[1].get('domain')
-                if not domain_val:
-                    if node[0].startswith('[Offline]'):
-                        domain_val = node[0] # The name is the domain for virtual nodes
-                    else:
-                        domain_val = urlparse(node[0]).netloc
-                
-                node_type = node[1].get('type', 'unknown')
-                
-                nodes.append({
-                    'id': node[0],
-                    'title': node[1].get('title', node[0]),
-                    'domain': domain_val,
-                    'type': node_type,
-                    'tier': self.get_tier(node_type),
-                    'citations': self.G.in_degree(node[0])
-                })
+                nodes.append(self.export_node(node[0], node[1]))
+                if node[0] in positions:
+                    nodes[-1]['x'], nodes[-1]['y'] = positions[node[0]]
             except Exception as e:
                 print(f"Error exporting node {node[0]}: {e}")
         
         for edge in self.G.edges(data=True):
-            links.append({
-                'source': edge[0],
-                'target': edge[1],
-                'type': edge[2].get('type', 'unknown'),
-                'confidence': edge[2].get('confidence', 0.5),
-                'context': edge[2].get('context', '')
-            })
+            links.append(self.export_link(*edge))
         
-        return {'nodes': nodes, 'links': links}
+        if layout:
+            return {'nodes': nodes, 'links': links, 'layout': {'bands': bands}}
+        return {'nodes': nodes, 'links': links}
\ No newline at end of file
@@ -0,0 +1,236 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+try:
+    from backend.instrumentation import cache_lookup
+except ImportError:
+    from instrumentation import cache_lookup
+
+# Query helpers over finished SourceGraphs so clients can explore a large
+# graph in small pieces instead of downloading export_for_visualization().
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+MAX_EGO_DEPTH = 4
+
+class GraphStore:
+    """
+    In-memory LRU of recently built graphs, keyed by graph id.
+    Bounded by count and age so long-running workers don't grow forever.
+    on_evict(graph) is called, outside the lock, for every graph that
+    drops out by LRU, TTL or replacement.
+    """
+    def __init__(self, max_graphs=50, ttl=3600, on_evict=None):
+        self.max_graphs = max_graphs
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._graphs = OrderedDict()  # graph_id -> (stored_at, SourceGraph)
+        self._lock = threading.Lock()
+
+    def put(self, graph_id, graph):
+        evicted = []
+        with self._lock:
+            previous = self._graphs.get(graph_id)
+            if previous and previous[1] is not graph:
+                evicted.append(previous[1])
+            self._graphs[graph_id] = (time.time(), graph)
+            self._graphs.move_to_end(graph_id)
+            while len(self._graphs) > self.max_graphs:
+                evicted.append(self._graphs.popitem(last=False)[1][1])
+        self._evicted(evicted)
+
+    def get(self, graph_id):
+        evicted = []
+        with self._lock:
+            entry = self._graphs.get(graph_id)
+            if entry and time.time() - entry[0] > self.ttl:
+                evicted.append(self._graphs.pop(graph_id)[1])
+                entry = None
+            cache_lookup('graph_store', entry is not None)
+            if entry:
+                self._graphs.move_to_end(graph_id)
+        self._evicted(evicted)
+        return entry[1] if entry else None
+
+    def holds(self, graph):
+        """Whether `graph` is still stored, under any id"""
+        with self._lock:
+            return any(stored is graph for _, stored in self._graphs.values())
+
+    def _evicted(self, graphs):
+        if self.on_evict:
+            for graph in graphs:
+                self.on_evict(graph)
+
+    def __len__(self):
+        return len(self._graphs)
+
+class QueryError(ValueError):
+    """Bad query parameters (reported to the client as a 400)"""
+
+class NodeNotFound(QueryError):
+    """The queried node isn't in the graph (reported to the client as a 404)"""
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({'o': offset}).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded))['o']
+    except Exception:
+        raise QueryError('Invalid cursor')
+    if not isinstance(offset, int) or offset < 0:
+        raise QueryError('Invalid cursor')
+    return offset
+
+def _page(items, cursor, limit):
+    """Slice `items` at the cursor; returns (page, next_cursor or None)"""
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    offset = decode_cursor(cursor)
+    page = items[offset:offset + limit]
+    next_offset = offset + len(page)
+    return page, (encode_cursor(next_offset) if next_offset < len(items) else None)
+
+def _link_matches(attrs, link_type=None, min_confidence=None):
+    if link_type and attrs.get('type', 'unknown') != link_type:
+        return False
+    if min_confidence is not None and (attrs.get('confidence') or 0) < min_confidence:
+        return False
+    return True
+
+def _induced_links(graph, node_ids, link_type=None, min_confidence=None):
+    return [
+        graph.export_link(u, v, attrs)
+        for u, v, attrs in graph.G.subgraph(node_ids).edges(data=True)
+        if _link_matches(attrs, link_type, min_confidence)
+    ]
+
+def list_nodes(graph, tier=None, node_type=None, cursor=None, limit=None):
+    """Nodes filtered by tier and/or type, in crawl order, one page at a time"""
+    matches = []
+    for node_id, attrs in graph.G.nodes(data=True):
+        node_tier = graph.get_tier(attrs.get('type', 'unknown'))
+        if tier is not None and node_tier != tier:
+            continue
+        if node_type and attrs.get('type', 'unknown') != node_type:
+            continue
+        matches.append(node_id)
+
+    page, next_cursor = _page(matches, cursor, limit)
+    return {
+        'nodes': [graph.export_node(n, graph.G.nodes[n]) for n in page],
+        'total': len(matches),
+        'next_cursor': next_cursor
+    }
+
+def list_links(graph, link_type=None, min_confidence=None, node=None, cursor=None, limit=None):
+    """Links filtered by type / confidence (optionally touching one node), paginated"""
+    if node is not None:
+        if node not in graph.G:
+            raise NodeNotFound(node)
+        edges = list(graph.G.in_edges(node, data=True)) + list(graph.G.out_edges(node, data=True))
+    else:
+        edges = graph.G.edges(data=True)
+
+    matches = [(u, v, attrs) for u, v, attrs in edges if _link_matches(attrs, link_type, min_confidence)]
+    page, next_cursor = _page(matches, cursor, limit)
+    return {
+        'links': [graph.export_link(u, v, attrs) for u, v, attrs in page],
+        'total': len(matches),
+        'next_cursor': next_cursor
+    }
+
+def ego_network(graph, node, depth=1, direction='both', min_confidence=None, limit=None):
+    """
+    Neighbourhood of `node` up to `depth` hops.
+    direction: 'out' (what it cites), 'in' (who cites it) or 'both'.
+    Closest nodes win when the neighbourhood exceeds `limit`.
+    """
+    if node not in graph.G:
+        raise NodeNotFound(node)
+    if direction not in ('in', 'out', 'both'):
+        raise QueryError("direction must be 'in', 'out' or 'both'")
+    depth = max(0, min(depth, MAX_EGO_DEPTH))
+    limit = max(1, min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE))
+
+    def neighbours(n):
+        if direction in ('out', 'both'):
+            for _, v, attrs in graph.G.out_edges(n, data=True):
+                if _link_matches(attrs, min_confidence=min_confidence):
+                    yield v
+        if direction in ('in', 'both'):
+            for u, _, attrs in graph.G.in_edges(n, data=True):
+                if _link_matches(attrs, min_confidence=min_confidence):
+                    yield u
+
+    # Breadth-first so truncation drops the farthest nodes first
+    distance = {node: 0}
+    queue = deque([node])
+    truncated = False
+    while queue:
+        current = queue.popleft()
+        if distance[current] == depth:
+            continue
+        for neighbour in neighbours(current):
+            if neighbour in distance:
+                continue
+            if len(distance) >= limit:
+                truncated = True
+                queue.clear()
+                break
+            distance[neighbour] = distance[current] + 1
+            queue.append(neighbour)
+
+    nodes = []
+    for n in distance:
+        exported = graph.export_node(n, graph.G.nodes[n])
+        exported['distance'] = distance[n]
+        nodes.append(exported)
+
+    return {
+        'center': node,
+        'depth': depth,
+        'nodes': nodes,
+        'links': _induced_links(graph, list(distance), min_confidence=min_confidence),
+        'truncated': truncated
+    }
+
+def top_cited(graph, n=10, tier=None, node_type=None):
+    """The N most cited nodes (optionally within a tier/type) and the links between them"""
+    n = max(1, min(n, MAX_PAGE_SIZE))
+    candidates = [
+        (node_id, graph.G.in_degree(node_id))
+        for node_id, attrs in graph.G.nodes(data=True)
+        if (tier is None or graph.get_tier(attrs.get('type', 'unknown')) == tier)
+        and (not node_type or attrs.get('type', 'unknown') == node_type)
+    ]
+    top = [node_id for node_id, _ in sorted(candidates, key=lambda x: x[1], reverse=True)[:n]]
+    return {
+        'nodes': [graph.export_node(node_id, graph.G.nodes[node_id]) for node_id in top],
+        'links': _induced_links(graph, top)
+    }
+
+def load_export(graph, viz_data):
+    """
+    Refill an empty SourceGraph from an export_for_visualization() payload,
+    e.g. one another worker stored in the job store. Enough for every query
+    here; crawl-time details that aren't exported (reasons, claims) are lost.
+    """
+    for node in viz_data['nodes']:
+        graph.G.add_node(node['id'], url=node['id'], title=node['title'], domain=node['domain'], type=node['type'])
+    for link in viz_data['links']:
+        graph.G.add_edge(link['source'], link['target'], type=link['type'],
+                         confidence=link['confidence'], context=link.get('context', ''))
+    return graph
+
+def graph_summary(graph):
+    return {
+        'nodes': graph.G.number_of_nodes(),
+        'links': graph.G.number_of_edges()
+    }
@@ -0,0 +1,179 @@
+import os
+import time
+import threading
+from functools import wraps
+
+try:
+    from backend import tracing
+except ImportError:
+    import tracing
+
+# Lightweight in-process metrics: stage timers (histograms), counters and
+# gauges, rendered in Prometheus text format by api.py's /metrics endpoint.
+# Set SOURCETREE_METRICS=0 to disable; every hook then returns after a single
+# flag check. Metrics are per process (one set per gunicorn worker).
+# Timers also open a span on the active per-analysis tracer (see tracing.py),
+# so traced runs get stage spans even when metrics are disabled.
+
+ENABLED = os.environ.get('SOURCETREE_METRICS', '1') != '0'
+
+# Seconds. Fetches and LLM calls dominate, so the buckets lean long.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_histograms = {}   # stage -> [bucket counts..., +Inf count, sum]
+_counters = {}     # (name, labels tuple) -> value
+_gauges = {}       # name -> (help, callback)
+
+HELP = {
+    'sourcetree_stage_duration_seconds': 'Time spent in each analysis stage',
+    'sourcetree_stage_errors_total': 'Exceptions raised inside a stage',
+    'sourcetree_fetch_total': 'Page fetches by outcome',
+    'sourcetree_fetch_bytes_total': 'Body bytes read by the fetcher',
+    'sourcetree_cache_requests_total': 'Cache lookups by cache and result',
+    'sourcetree_syndicated_pages_total': 'Pages collapsed as near-duplicates',
+    'sourcetree_llm_tokens_total': 'Claude tokens used, by direction',
+}
+
+def set_enabled(enabled):
+    global ENABLED
+    ENABLED = enabled
+
+def observe(stage, seconds):
+    """Record one duration for `stage`"""
+    if not ENABLED:
+        return
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(BUCKETS)] += 1
+        hist[-1] += seconds
+
+def count(name, amount=1, **labels):
+    """Increment a counter, e.g. count('sourcetree_fetch_total', result='ok')"""
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def cache_lookup(cache, hit):
+    count('sourcetree_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+def register_gauge(name, help_text, callback):
+    """Gauge sampled at scrape time, e.g. queue depth or active sessions"""
+    _gauges[name] = (help_text, callback)
+
+class _Timer:
+    __slots__ = ('stage', 'start', 'span')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.span = tracing.start(self.stage)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self.start)
+        if exc_type is not None:
+            count('sourcetree_stage_errors_total', stage=self.stage)
+            tracing.annotate(error=exc_type.__name__)
+        tracing.end(self.span)
+        return False
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+def timer(stage):
+    """Context manager timing an inline block: `with timer('parse'): ...`"""
+    return _Timer(stage) if ENABLED or tracing.current() else _NULL_TIMER
+
+def timed(stage):
+    """Decorator timing every call of a function as `stage`"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED and tracing.current() is None:
+                return fn(*args, **kwargs)
+            with _Timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+def snapshot():
+    """Plain-dict copy of all stage histograms and counters"""
+    with _lock:
+        return {
+            'stages': {
+                stage: {'count': sum(hist[:-1]), 'sum': hist[-1]} for stage, hist in _histograms.items()
+            },
+            'counters': {
+                name + _format_labels(labels): value for (name, labels), value in _counters.items()
+            }
+        }
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    with _lock:
+        histograms = {stage: list(hist) for stage, hist in _histograms.items()}
+        counters = dict(_counters)
+
+    name = 'sourcetree_stage_duration_seconds'
+    lines.append(f'# HELP {name} {HELP[name]}')
+    lines.append(f'# TYPE {name} histogram')
+    for stage in sorted(histograms):
+        hist = histograms[stage]
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS, hist):
+            cumulative += bucket
+            lines.append(f'{name}_bucket{{stage="{_escape(stage)}",le="{bound}"}} {cumulative}')
+        cumulative += hist[len(BUCKETS)]
+        lines.append(f'{name}_bucket{{stage="{_escape(stage)}",le="+Inf"}} {cumulative}')
+        lines.append(f'{name}_sum{{stage="{_escape(stage)}"}} {hist[-1]:.6f}')
+        lines.append(f'{name}_count{{stage="{_escape(stage)}"}} {cumulative}')
+
+    for counter in sorted({name for name, _ in counters}):
+        lines.append(f'# HELP {counter} {HELP.get(counter, counter)}')
+        lines.append(f'# TYPE {counter} counter')
+        for (name, labels), value in sorted(counters.items()):
+            if name == counter:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    for gauge, (help_text, callback) in sorted(_gauges.items()):
+        try:
+            value = callback()
+        except Exception:
+            continue
+        lines.append(f'# HELP {gauge} {help_text}')
+        lines.append(f'# TYPE {gauge} gauge')
+        lines.append(f'{gauge} {value}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,520 @@
+import contextlib
+import json
+from abc import ABC, abstractmethod
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+# Analysis jobs and their event logs, shared by every API worker.
+# A POST enqueues a job; a JobRunner in any worker process claims and runs
+# it, appending events; any worker can stream those events to a client (or
+# to a client reconnecting with Last-Event-ID). Pick the store with
+# SOURCETREE_JOB_STORE:
+#   memory://                  - single process (the default; no sharing)
+#   sqlite:////path/to/jobs.db - all workers on one host share the file
+# Other brokers plug in by subclassing JobStore and extending open_store().
+# A finished job's 'complete' event is also its result: graph ids are job ids,
+# and a worker that didn't run the job rebuilds the graph from that event.
+# publish() offers it as the cached result for a key, for JOB_TTL seconds.
+
+JOB_STORE_URL = os.environ.get('SOURCETREE_JOB_STORE', 'memory://')
+JOB_THREADS = int(os.environ.get('SOURCETREE_JOB_THREADS', 4))
+JOB_TTL = 600        # seconds a finished job's events stay readable
+STALE_AFTER = 300    # running job with no heartbeat for this long has lost its worker
+HEARTBEAT = 30       # seconds between runner heartbeats / maintenance passes
+POLL_INTERVAL = 0.1  # seconds between polls for stores that can't block
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+FINISHED = (DONE, FAILED)
+
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+class JobStore(ABC):
+    """
+    Jobs move queued -> running -> done | failed; each has an append-only
+    event log numbered from 1. Subclasses implement the storage; one that
+    misses a method fails when it's constructed, not halfway through a request.
+    """
+    @abstractmethod
+    def create(self, kind, params, dedup_key=None, worker=None):
+        """
+        New job; with `worker` it starts out claimed (running) by that worker.
+        With `dedup_key`, a queued or running job with the same key is returned
+        instead - lookup and insert are one atomic step, so two workers taking
+        the same request concurrently still share one run.
+        """
+
+    @abstractmethod
+    def get(self, job_id):
+        """The job as a dict, or None"""
+
+    @abstractmethod
+    def claim(self, worker, kinds, wait=0):
+        """Atomically take the oldest queued job of one of `kinds` (None if none within `wait` s)"""
+
+    @abstractmethod
+    def append(self, job_id, event, data):
+        """Add an event (also the job's heartbeat); returns its sequence number"""
+
+    @abstractmethod
+    def events(self, job_id, after=0, wait=0):
+        """[(seq, event, data)] after `after`, waiting up to `wait` s for the first one"""
+
+    @abstractmethod
+    def touch(self, job_ids):
+        """Heartbeat: these jobs are still being worked on"""
+
+    @abstractmethod
+    def finish(self, job_id, status, error=None):
+        """Mark a job DONE or FAILED"""
+
+    @abstractmethod
+    def counts(self):
+        """{status: number of jobs}"""
+
+    @abstractmethod
+    def running(self):
+        """Running jobs, over all workers"""
+
+    @abstractmethod
+    def fail_stale(self, stale_after=STALE_AFTER):
+        """Fail running jobs whose worker stopped heartbeating; returns their ids"""
+
+    @abstractmethod
+    def purge(self, ttl=JOB_TTL):
+        """Forget jobs (and events) that finished more than `ttl` s ago"""
+
+    @abstractmethod
+    def publish(self, job_id, result_key):
+        """Offer the job's 'complete' event as the result for `result_key` once it is DONE"""
+
+    @abstractmethod
+    def find_result(self, result_key, max_age):
+        """Latest DONE job published under `result_key` that finished within `max_age` s"""
+
+    def last_event(self, job_id, event):
+        """Data of the job's last `event` (e.g. 'complete'), or None"""
+        for _, name, data in reversed(self.events(job_id)):
+            if name == event:
+                return data
+        return None
+
+    def stream(self, job_id, after=0):
+        """Yield (seq, event, data) as they arrive until the job has finished"""
+        while True:
+            batch = self.events(job_id, after, wait=1.0)
+            for seq, event, data in batch:
+                after = seq
+                yield seq, event, data
+            if batch:
+                continue
+            job = self.get(job_id)
+            # Re-check after seeing it finished: the last events may have landed in between
+            if job is None or (job['status'] in FINISHED and not self.events(job_id, after)):
+                return
+
+class MemoryJobStore(JobStore):
+    """Process-local stand-in: same behaviour, nothing shared between workers"""
+    def __init__(self):
+        self._jobs = {}
+        self._events = {}
+        self._changed = threading.Condition()
+
+    def create(self, kind, params, dedup_key=None, worker=None):
+        now = time.time()
+        with self._changed:
+            if dedup_key is not None:
+                active = self._active(dedup_key)
+                if active:
+                    return dict(active)
+            job = {
+                'id': new_job_id(), 'kind': kind, 'params': params, 'dedup_key': dedup_key, 'result_key': None,
+                'status': RUNNING if worker else QUEUED, 'worker': worker, 'error': None,
+                'created': now, 'updated': now, 'finished': None
+            }
+            self._jobs[job['id']] = job
+            self._events[job['id']] = []
+            self._changed.notify_all()
+        return dict(job)
+
+    def get(self, job_id):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _active(self, dedup_key):
+        for job in self._jobs.values():
+            if job['dedup_key'] == dedup_key and job['status'] not in FINISHED:
+                return job
+        return None
+
+    def claim(self, worker, kinds, wait=0):
+        deadline = time.time() + wait
+        with self._changed:
+            while True:
+                queued = [j for j in self._jobs.values() if j['status'] == QUEUED and j['kind'] in kinds]
+                if queued:
+                    job = min(queued, key=lambda j: j['created'])
+                    job.update(status=RUNNING, worker=worker, updated=time.time())
+                    return dict(job)
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._changed.wait(remaining)
+
+    def append(self, job_id, event, data):
+        with self._changed:
+            log = self._events[job_id]
+            log.append((len(log) + 1, event, data))
+            self._jobs[job_id]['updated'] = time.time()
+            self._changed.notify_all()
+            return len(log)
+
+    def events(self, job_id, after=0, wait=0):
+        deadline = time.time() + wait
+        with self._changed:
+            while True:
+                log = self._events.get(job_id, [])
+                if len(log) > after or job_id not in self._jobs:
+                    return log[after:]
+                if self._jobs[job_id]['status'] in FINISHED:
+                    return []
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return []
+                self._changed.wait(remaining)
+
+    def touch(self, job_ids):
+        with self._changed:
+            for job_id in job_ids:
+                if job_id in self._jobs:
+                    self._jobs[job_id]['updated'] = time.time()
+
+    def finish(self, job_id, status, error=None):
+        with self._changed:
+            now = time.time()
+            self._jobs[job_id].update(status=status, error=error, updated=now, finished=now)
+            self._changed.notify_all()
+
+    def counts(self):
+        with self._changed:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return counts
+
+    def running(self):
+        with self._changed:
+            return [dict(j) for j in self._jobs.values() if j['status'] == RUNNING]
+
+    def fail_stale(self, stale_after=STALE_AFTER):
+        cutoff = time.time() - stale_after
+        stale = [j['id'] for j in self.running() if j['updated'] < cutoff]
+        for job_id in stale:
+            self.append(job_id, 'error', {'message': 'Worker stopped before finishing'})
+            self.finish(job_id, FAILED, 'worker lost')
+        return stale
+
+    def purge(self, ttl=JOB_TTL):
+        cutoff = time.time() - ttl
+        with self._changed:
+            for job_id in [j['id'] for j in self._jobs.values() if j['finished'] and j['finished'] < cutoff]:
+                del self._jobs[job_id]
+                del self._events[job_id]
+
+    def publish(self, job_id, result_key):
+        with self._changed:
+            self._jobs[job_id]['result_key'] = result_key
+
+    def find_result(self, result_key, max_age):
+        cutoff = time.time() - max_age
+        with self._changed:
+            done = [j for j in self._jobs.values()
+                    if j['result_key'] == result_key and j['status'] == DONE and j['finished'] >= cutoff]
+            return dict(max(done, key=lambda j: j['finished'])) if done else None
+
+class SQLiteJobStore(JobStore):
+    """
+    Jobs and events in one SQLite file (WAL mode), shared by every process
+    that opens it. Readers poll, so a streaming client sees events within
+    POLL_INTERVAL of a worker on another process writing them.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, dedup_key TEXT,
+            status TEXT NOT NULL, worker TEXT, error TEXT,
+            created REAL NOT NULL, updated REAL NOT NULL, finished REAL, result_key TEXT
+        );
+        CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+        CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status);
+        CREATE TABLE IF NOT EXISTS events (
+            job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, data TEXT NOT NULL,
+            PRIMARY KEY (job_id, seq)
+        );
+    """
+    COLUMNS = ('id', 'kind', 'params', 'dedup_key', 'status', 'worker', 'error', 'created', 'updated', 'finished',
+               'result_key')
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        if 'result_key' not in {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}:
+            conn.execute('ALTER TABLE jobs ADD COLUMN result_key TEXT')  # file from an older version
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_result ON jobs (result_key, finished)')
+
+    def _conn(self):
+        """One connection per thread (sqlite3 connections can't be shared across threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _job(self, row):
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def _select(self, where, args=()):
+        return self._conn().execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE {where}", args)
+
+    def create(self, kind, params, dedup_key=None, worker=None):
+        now = time.time()
+        job_id = new_job_id()
+        conn = self._conn()
+        # IMMEDIATE: no other worker can insert the same dedup_key between our lookup and insert
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = None
+            if dedup_key is not None:
+                row = conn.execute(
+                    'SELECT id FROM jobs WHERE dedup_key = ? AND status IN (?, ?) ORDER BY created LIMIT 1',
+                    (dedup_key, QUEUED, RUNNING)
+                ).fetchone()
+            if row:
+                job_id = row[0]
+            else:
+                conn.execute(
+                    'INSERT INTO jobs (id, kind, params, dedup_key, status, worker, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (job_id, kind, json.dumps(params), dedup_key, RUNNING if worker else QUEUED, worker, now, now)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return self.get(job_id)
+
+    def get(self, job_id):
+        return self._job(self._select('id = ?', (job_id,)).fetchone())
+
+    def claim(self, worker, kinds, wait=0):
+        deadline = time.time() + wait
+        conn = self._conn()
+        marks = ', '.join('?' * len(kinds))
+        while True:
+            # IMMEDIATE takes the write lock up front, so two workers can't claim the same row
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    f'SELECT id FROM jobs WHERE status = ? AND kind IN ({marks}) ORDER BY created LIMIT 1',
+                    (QUEUED, *kinds)
+                ).fetchone()
+                if row:
+                    conn.execute('UPDATE jobs SET status = ?, worker = ?, updated = ? WHERE id = ?',
+                                 (RUNNING, worker, time.time(), row[0]))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            if row:
+                return self.get(row[0])
+            if time.time() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def append(self, job_id, event, data):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            seq = conn.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM events WHERE job_id = ?', (job_id,)).fetchone()[0]
+            conn.execute('INSERT INTO events (job_id, seq, event, data) VALUES (?, ?, ?, ?)',
+                         (job_id, seq, event, json.dumps(data)))
+            conn.execute('UPDATE jobs SET updated = ? WHERE id = ?', (time.time(), job_id))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return seq
+
+    def events(self, job_id, after=0, wait=0):
+        deadline = time.time() + wait
+        while True:
+            rows = self._conn().execute(
+                'SELECT seq, event, data FROM events WHERE job_id = ? AND seq > ? ORDER BY seq', (job_id, after)
+            ).fetchall()
+            if rows or time.time() >= deadline:
+                return [(seq, event, json.loads(data)) for seq, event, data in rows]
+            job = self.get(job_id)
+            if job is None or job['status'] in FINISHED:
+                return []
+            time.sleep(POLL_INTERVAL)
+
+    def touch(self, job_ids):
+        now = time.time()
+        self._conn().executemany('UPDATE jobs SET updated = ? WHERE id = ?', [(now, j) for j in job_ids])
+
+    def finish(self, job_id, status, error=None):
+        now = time.time()
+        self._conn().execute('UPDATE jobs SET status = ?, error = ?, updated = ?, finished = ? WHERE id = ?',
+                             (status, error, now, now, job_id))
+
+    def counts(self):
+        return dict(self._conn().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    def running(self):
+        return [self._job(row) for row in self._select('status = ? ORDER BY created', (RUNNING,)).fetchall()]
+
+    def fail_stale(self, stale_after=STALE_AFTER):
+        cutoff = time.time() - stale_after
+        stale = [row[0] for row in self._conn().execute(
+            'SELECT id FROM jobs WHERE status = ? AND updated < ?', (RUNNING, cutoff)
+        ).fetchall()]
+        for job_id in stale:
+            self.append(job_id, 'error', {'message': 'Worker stopped before finishing'})
+            self.finish(job_id, FAILED, 'worker lost')
+        return stale
+
+    def purge(self, ttl=JOB_TTL):
+        cutoff = time.time() - ttl
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM events WHERE job_id IN (SELECT id FROM jobs WHERE finished < ?)', (cutoff,))
+            conn.execute('DELETE FROM jobs WHERE finished < ?', (cutoff,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def publish(self, job_id, result_key):
+        self._conn().execute('UPDATE jobs SET result_key = ? WHERE id = ?', (result_key, job_id))
+
+    def find_result(self, result_key, max_age):
+        return self._job(self._select(
+            'result_key = ? AND status = ? AND finished >= ? ORDER BY finished DESC LIMIT 1',
+            (result_key, DONE, time.time() - max_age)
+        ).fetchone())
+
+def open_store(url=JOB_STORE_URL):
+    """JobStore for a SOURCETREE_JOB_STORE url"""
+    if url.startswith('sqlite:///'):
+        return SQLiteJobStore(url[len('sqlite:///'):])
+    if url in ('memory://', 'memory', ''):
+        return MemoryJobStore()
+    raise ValueError(f'Unsupported job store: {url}')
+
+class JobEmitter:
+    """emit(event, data) into a job's shared event log"""
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    def emit(self, event_type, data):
+        self.store.append(self.job_id, event_type, data)
+
+class JobRunner:
+    """
+    Claims queued jobs from `store` and runs them on `threads` daemon threads.
+    handlers: kind -> fn(params, emitter, job_id). A handler that raises fails
+    the job with an 'error' event. One extra thread heartbeats this runner's
+    jobs and does store maintenance (failing jobs of dead workers, purging old ones).
+    """
+    def __init__(self, store, handlers, threads=JOB_THREADS, worker=WORKER_ID):
+        self.store = store
+        self.handlers = handlers
+        self.threads = threads
+        self.worker = worker
+        self.active = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = False
+        self._maintaining = False
+
+    def start(self):
+        if self._started:
+            return self
+        self._started = True
+        for i in range(self.threads):
+            threading.Thread(target=self._work, name=f'sourcetree-job-{i}', daemon=True).start()
+        self._start_maintenance()
+        return self
+
+    def _start_maintenance(self):
+        with self._lock:
+            if self._maintaining:
+                return
+            self._maintaining = True
+        threading.Thread(target=self._maintain, name='sourcetree-job-heartbeat', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim(self.worker, list(self.handlers), wait=1.0)
+            except Exception as e:  # e.g. database locked for longer than its timeout
+                print(f"Job claim failed: {e}")
+                time.sleep(1.0)
+                continue
+            if job:
+                self.run(job)
+
+    def run(self, job):
+        emitter = JobEmitter(self.store, job['id'])
+        with self.heartbeat(job['id']):
+            try:
+                self.handlers[job['kind']](job['params'], emitter, job['id'])
+            except Exception as e:
+                emitter.emit('error', {'message': str(e)})
+                self.store.finish(job['id'], FAILED, str(e))
+            else:
+                self.store.finish(job['id'], DONE)
+
+    @contextlib.contextmanager
+    def heartbeat(self, job_id):
+        """
+        Heartbeat `job_id` while the block runs, so fail_stale leaves it alone;
+        also for jobs run outside the runner's threads (e.g. in a request).
+        """
+        self._start_maintenance()
+        with self._lock:
+            self.active.add(job_id)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active.discard(job_id)
+
+    def _maintain(self):
+        while not self._stop.wait(HEARTBEAT):
+            try:
+                with self._lock:
+                    active = list(self.active)
+                self.store.touch(active)
+                self.store.fail_stale()
+                self.store.purge()
+            except Exception as e:
+                print(f"Job store maintenance failed: {e}")
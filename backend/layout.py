@@ -0,0 +1,202 @@
+import bisect
+import numpy as np
+from scipy import sparse
+
+try:
+    from backend.authority import adjacency_matrix
+except ImportError:
+    from authority import adjacency_matrix
+
+# Server-side Lombardi layout. Coordinates are normalised to [0, 1] so the
+# client only has to scale them to its viewport:
+#   y - centre of the node's tier band (tier 1 at the top)
+#   x - position within the band, ordered to reduce edge crossings
+MARGIN = 0.05
+SWEEPS = 12
+MIN_GAP = 0.02   # horizontal spacing for incrementally placed nodes (shrinks as a band fills)
+ALL_TIERS = [1, 2, 3, 4, 5]
+
+def tier_bands(tiers):
+    """Evenly split the vertical axis between the tiers present (like the client does)"""
+    present = sorted(set(tiers)) or ALL_TIERS
+    height = 1.0 / len(present)
+    return [
+        {'tier': tier, 'y0': round(i * height, 4), 'y1': round((i + 1) * height, 4)}
+        for i, tier in enumerate(present)
+    ]
+
+def _spread(order, band_of, band_count):
+    """Evenly spaced x for nodes listed in `order` (sorted by band, then by position)"""
+    starts = np.concatenate(([0], np.cumsum(band_count)[:-1]))
+    sorted_bands = band_of[order]
+    rank = np.arange(len(order)) - starts[sorted_bands]
+    x = np.empty(len(order))
+    x[order] = MARGIN + (1 - 2 * MARGIN) * (rank + 0.5) / band_count[sorted_bands]
+    return x
+
+def _keep_seeded(order, band_of, x, seeded):
+    """
+    Seeded x where the final order allows it: per band, the longest run of nodes
+    (in final order) whose seeded x still increases keeps it; the other nodes
+    are spaced evenly between their kept neighbours. A kept neighbour that
+    leaves them too little room gives up its seeded x as well.
+    """
+    x = x.copy()
+    for band in np.unique(band_of):
+        members = list(order[band_of[order] == band])
+        # Longest strictly increasing subsequence of seeded x, O(n log n)
+        tails, tail_at, parent = [], [], {}
+        for i in members:
+            if np.isnan(seeded[i]):
+                continue
+            k = bisect.bisect_left(tails, seeded[i])
+            parent[i] = tail_at[k - 1] if k else None
+            if k == len(tails):
+                tails.append(seeded[i])
+                tail_at.append(i)
+            else:
+                tails[k], tail_at[k] = seeded[i], i
+        kept = set()
+        i = tail_at[-1] if tail_at else None
+        while i is not None:
+            kept.add(i)
+            i = parent[i]
+
+        min_step = min(MIN_GAP / 4, (1 - 2 * MARGIN) / (len(members) + 1))
+        while True:
+            runs = _runs(members, kept, seeded)
+            crowded = next((r for r in runs if r[3] and (r[2] - r[1]) / (len(r[3]) + 1) < min_step), None)
+            if crowded is None:
+                break
+            kept.discard(crowded[4] if crowded[4] is not None else crowded[0])
+        for _, left, right, run, _ in runs:
+            for j, node in enumerate(run):
+                x[node] = left + (right - left) * (j + 1) / (len(run) + 1)
+        for i in kept:
+            x[i] = seeded[i]
+    return x
+
+def _runs(members, kept, seeded):
+    """(left node, left x, right x, [nodes between], right node) between consecutive kept nodes"""
+    runs, left_node, left, run = [], None, MARGIN, []
+    for i in members + [None]:
+        if i is not None and i not in kept:
+            run.append(i)
+            continue
+        right = seeded[i] if i is not None else 1 - MARGIN
+        runs.append((left_node, left, right, run, i))
+        if i is not None:
+            left_node, left, run = i, seeded[i], []
+    return runs
+
+def compute_layout(G, tier_of, seed=None, bands=None):
+    """
+    Tier-banded layout with barycentric crossing reduction.
+
+    `tier_of` maps node -> tier (1-5). `seed` optionally maps node -> x from an
+    earlier (incremental) layout: nodes whose order the crossing reduction
+    doesn't change keep that x. `bands` overrides the tier bands, e.g. the
+    IncrementalLayout's, so streamed nodes keep their y as well.
+    Returns ({node: (x, y)}, bands).
+    """
+    nodes, A = adjacency_matrix(G)
+    bands = bands or tier_bands([tier_of[n] for n in nodes])
+    if not nodes:
+        return {}, bands
+
+    band_index = {b['tier']: i for i, b in enumerate(bands)}
+    band_of = np.array([band_index[tier_of[n]] for n in nodes])
+    band_count = np.bincount(band_of, minlength=len(bands))
+    band_y = np.array([(b['y0'] + b['y1']) / 2 for b in bands])
+
+    # Undirected neighbourhood, row-normalised, so W @ x is each node's barycentre
+    W = ((A + A.T) > 0).astype(np.float64)
+    degree = np.asarray(W.sum(axis=1)).ravel()
+    W = sparse.diags(np.divide(1.0, degree, out=np.zeros_like(degree), where=degree > 0)) @ W
+    isolated = degree == 0
+
+    if seed:
+        start = np.array([seed.get(n, 0.5) for n in nodes])
+    else:
+        start = np.arange(len(nodes), dtype=np.float64)  # insertion (crawl) order
+    order = np.lexsort((start, band_of))
+    x = _spread(order, band_of, band_count)
+
+    for _ in range(SWEEPS):
+        barycentre = np.where(isolated, x, W @ x)
+        # Ties keep the current order so the layout is stable between sweeps
+        new_order = np.lexsort((x, barycentre, band_of))
+        if np.array_equal(new_order, order):
+            break
+        order = new_order
+        x = _spread(order, band_of, band_count)
+
+    if seed:
+        x = _keep_seeded(order, band_of, x, np.array([seed.get(n, np.nan) for n in nodes], dtype=np.float64))
+    y = band_y[band_of]
+    positions = {
+        node: (round(float(x[i]), 4), round(float(y[i]), 4)) for i, node in enumerate(nodes)
+    }
+    return positions, bands
+
+class IncrementalLayout:
+    """
+    Places nodes one at a time as they stream in (SSE) without moving any
+    node that has already been sent to the client. Uses fixed bands for all
+    five tiers so a new tier appearing never shifts existing nodes.
+    """
+    def __init__(self):
+        self.bands = tier_bands(ALL_TIERS)
+        self.positions = {}                    # node -> (x, y)
+        self.tiers = {}                        # node -> tier it was placed in
+        self.occupied = {t: [] for t in ALL_TIERS}  # tier -> sorted x values
+
+    def band_y(self, tier):
+        band = self.bands[tier - 1]
+        return round((band['y0'] + band['y1']) / 2, 4)
+
+    def place(self, node, tier, anchors=()):
+        """
+        Position `node` near the barycentre of its already-placed anchors.
+        A node is only moved again if its tier changes (e.g. an edge target
+        that is later fetched and classified).
+        """
+        if node in self.positions:
+            if self.tiers[node] == tier:
+                return self.positions[node]
+            self.occupied[self.tiers[node]].remove(self.positions[node][0])
+
+        placed = [self.positions[a][0] for a in anchors if a in self.positions]
+        target = sum(placed) / len(placed) if placed else 0.5
+        x = self._free_slot(self.occupied[tier], target)
+
+        bisect.insort(self.occupied[tier], x)
+        self.tiers[node] = tier
+        self.positions[node] = (x, self.band_y(tier))
+        return self.positions[node]
+
+    def _free_slot(self, taken, target):
+        """
+        Closest x to target that keeps a gap from every taken slot. The gap is
+        MIN_GAP until the band fills up, then shrinks with its occupancy; if no
+        slot near the target is left, the middle of the widest free interval.
+        """
+        low, high = MARGIN, 1 - MARGIN
+        gap = min(MIN_GAP, (high - low) / (len(taken) + 1))
+        steps = int((high - low) / gap) + 1
+        for step in range(steps * 2):
+            offset = ((step + 1) // 2) * gap * (1 if step % 2 else -1)
+            candidate = round(target + offset, 4)
+            if low <= candidate <= high and self._is_free(taken, candidate, gap):
+                return candidate
+        edges = [low] + taken + [high]
+        widest = max(range(len(edges) - 1), key=lambda i: edges[i + 1] - edges[i])
+        return round((edges[widest] + edges[widest + 1]) / 2, 4)
+
+    def _is_free(self, taken, x, gap):
+        i = bisect.bisect_left(taken, x)
+        if i < len(taken) and taken[i] - x < gap:
+            return False
+        if i > 0 and x - taken[i - 1] < gap:
+            return False
+        return True
@@ -1,26 +1,57 @@
-import anthropic
 import os
 import json
-
-# Initialize the client. 
-# Defaults to ANTHROPIC_API_KEY environment variable
-api_key = os.environ.get("ANTHROPIC_API_KEY")
-if not api_key:
-    print("DEBUG: ANTHROPIC_API_KEY not found in environment variables.")
-else:
-    print(f"DEBUG: ANTHROPIC_API_KEY found (starts with {api_key[:10]}...)")
+import threading
 
 try:
-    client = anthropic.Anthropic(api_key=api_key)
-except Exception as e:
-    print(f"Warning: Anthropic client failed to initialize (check API key): {e}")
-    client = None
+    from backend.instrumentation import timed, count
+    from backend.tracing import annotate
+except ImportError:
+    from instrumentation import timed, count
+    from tracing import annotate
+
+# The Anthropic SDK takes over a second to import, so the client is created
+# on first use rather than when the API worker boots.
+_client = None
+_client_ready = False
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Shared Anthropic client, initialised on first call.
+    Defaults to ANTHROPIC_API_KEY environment variable; None if unavailable.
+    """
+    global _client, _client_ready
+    if _client_ready:
+        return _client
+    with _client_lock:
+        if not _client_ready:
+            if not os.environ.get("ANTHROPIC_API_KEY"):
+                print("Warning: ANTHROPIC_API_KEY not found in environment variables.")
+            try:
+                import anthropic
+                _client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+            except Exception as e:
+                print(f"Warning: Anthropic client failed to initialize (check API key): {e}")
+                _client = None
+            _client_ready = True
+    return _client
+
+def record_usage(message, url):
+    """Token counts for the current trace span and the token counter"""
+    usage = getattr(message, 'usage', None)
+    if usage is None:
+        return
+    annotate(url=url, input_tokens=usage.input_tokens, output_tokens=usage.output_tokens)
+    count('sourcetree_llm_tokens_total', usage.input_tokens, direction='input')
+    count('sourcetree_llm_tokens_total', usage.output_tokens, direction='output')
 
+@timed('llm_extract_implicit_sources')
 def llm_extract_implicit_sources(page_text, page_url):
     """
     Use Claude to identify claims that SHOULD have sources
     but don't explicitly link to them
     """
+    client = get_client()
     if not client:
         return []
 
@@ -58,6 +89,7 @@ Return ONLY a JSON array like:
             max_tokens=2000,
             messages=[{"role": "user", "content": prompt}]
         )
+        record_usage(message, page_url)
         
         # Parse JSON response
         response_text = message.content[0].text
@@ -75,11 +107,13 @@ Return ONLY a JSON array like:
 
 import re
 
+@timed('verify_link_significance')
 def verify_link_significance(context_text, link_url, link_anchor):
     """
     Asks LLM to determine if loop is a CAUSAL SOURCE or just related reading.
     Returns: { 'score': 0-100, 'reason': '...', 'is_source': True/False }
     """
+    client = get_client()
     if not client:
         return {'score': 50, 'reason': 'No LLM available', 'type': 'Error'}
 
@@ -104,6 +138,7 @@ def verify_link_significance(context_text, link_url, link_anchor):
             max_tokens=300,
             messages=[{"role": "user", "content": prompt}]
         )
+        record_usage(message, link_url)
         response_text = message.content[0].text
         
         # Extract JSON
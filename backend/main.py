@@ -1,58 +1,229 @@
-from backend.graph_builder import SourceGraph
+from backend.graph_builder import SourceGraph, RootUnavailable
+from backend.result_cache import canonical_url
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+import argparse
+import contextlib
 import json
 import os
 import sys
+import time
 
-# Ensure frontend dir exists
-os.makedirs('frontend', exist_ok=True)
+def analyze_single(url):
+    # Ensure frontend dir exists
+    os.makedirs('frontend', exist_ok=True)
+
+    print(f"\n{'='*60}")
+    print(f"Analyzing: {url}")
+    print('='*60)
+
+    # Build graph
+    graph = SourceGraph()
+    graph.build_graph(url)
+
+    # Analyze
+    metrics = graph.analyze_structure()
+    print("\nAnalysis Metrics:")
+    print(f"Nodes: {metrics.get('total_nodes')}")
+    print(f"Edges: {metrics.get('total_edges')}")
+    print(f"Max Depth: {metrics.get('max_depth')}")
+    print(f"Cycles found: {metrics.get('circular_citations_count')}")
+    # print(json.dumps(metrics, indent=2, default=str)) # Too verbose
+
+    # Export for visualization
+    viz_data = graph.export_for_visualization()
+
+    # Create a safe filename
+    safe_name = url.replace('https://', '').replace('http://', '').replace('/', '_')[:50]
+    filename = f"frontend/graph_data_{safe_name}.json"
+
+    # Also save as 'graph_data.json' for the default visualization to pick up easily
+    with open('frontend/graph_data.json', 'w') as f:
+        json.dump(viz_data, f, indent=2)
+
+    with open(filename, 'w') as f:
+        json.dump(viz_data, f, indent=2)
+
+    print(f"\nSaved to: {filename} and frontend/graph_data.json")
+
+# --- Batch mode: many URLs, concurrent workers, one JSONL record each ---
+#
+# The output file doubles as the checkpoint: every finished URL is appended
+# (and flushed) as one line, and a rerun with the same output skips URLs that
+# already have a record. A half-written last line from a killed run is dropped.
+
+def analysis_record(url, max_depth=None, include_graph=False, bounded=None, max_rss_mb=None):
+    """Crawl + analyze one URL; returns a compact, JSON-serialisable record"""
+    started = time.perf_counter()
+    record = {'url': url}
+    graph = None
+    try:
+        graph = SourceGraph(bounded=bounded, max_rss_mb=max_rss_mb)
+        if max_depth is not None:
+            graph.max_depth = max_depth
+        graph.build_graph(url)
+        if url not in graph.G:
+            record['status'] = 'unreachable'
+        else:
+            metrics = graph.analyze_structure()
+            record.update({
+                'status': 'ok',
+                'nodes': metrics['total_nodes'],
+                'edges': metrics['total_edges'],
+                'max_depth': metrics['max_depth'],
+                'cycles': metrics['circular_citations_count'],
+                'bottlenecks': len(metrics['bottlenecks']),
+                'unsourced': len(metrics['unsourced_nodes']),
+                'syndicated': len(metrics['syndicated_copies']),
+                'bedrock': metrics['bedrock'],
+                'pagerank': metrics['pagerank'][:5],
+                'dependent_pairs': metrics['dependent_pairs'][:3],
+                'memory': metrics['memory']
+            })
+            if include_graph:
+                record['graph'] = graph.export_for_visualization()
+    except RootUnavailable as e:
+        record.update({'status': 'unreachable', 'error': str(e)})
+    except Exception as e:
+        record.update({'status': 'error', 'error': f'{type(e).__name__}: {e}'})
+    finally:
+        if graph is not None:
+            graph.close()
+    record['seconds'] = round(time.perf_counter() - started, 3)
+    record['finished_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    return record
+
+def read_urls(source):
+    """URLs from an open file, one per line; blank lines and # comments skipped"""
+    for line in source:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+def load_checkpoint(path, retry_failed=False):
+    """
+    Canonical URLs that already have a record in `path`.
+    Truncates a trailing partial line so appending starts on a clean line.
+    With retry_failed, only successful records count as done.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+            data = data[:data.rfind(b'\n') + 1]
+    for line in data.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        url = record.get('url') if isinstance(record, dict) else None
+        if not url or (retry_failed and record.get('status') != 'ok'):
+            continue  # not one of our records, or one to retry
+        done.add(canonical_url(url))
+    return done
+
+def run_batch(urls, output, workers=4, max_depth=None, include_graph=False, retry_failed=False,
+              bounded=None, max_rss_mb=None, log=sys.stderr):
+    """
+    Analyze `urls` (any iterable, consumed lazily) with `workers` threads,
+    appending one record per URL to `output`. Returns a summary dict.
+    """
+    done = load_checkpoint(output, retry_failed)
+    counts = {'ok': 0, 'unreachable': 0, 'error': 0, 'skipped': 0}
+    started = time.perf_counter()
+    pending = {}
+
+    def write(future, out):
+        record = future.result()
+        pending.pop(future)
+        out.write(json.dumps(record, separators=(',', ':')) + '\n')
+        out.flush()
+        counts[record['status']] += 1
+        finished = counts['ok'] + counts['unreachable'] + counts['error']
+        print(f"[{finished}] {record['status']:<11} {record['seconds']:>7.1f}s  {record['url']}", file=log)
+
+    # Crawlers print progress to stdout; with several workers that is just noise.
+    # The redirect encloses the pool so no worker prints after it is restored.
+    quiet = open(os.devnull, 'w') if workers > 1 else contextlib.nullcontext(sys.stdout)
+    with open(output, 'a') as out, quiet as sink, contextlib.redirect_stdout(sink):
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for url in urls:
+                key = canonical_url(url)
+                if key in done:
+                    counts['skipped'] += 1
+                    continue
+                done.add(key)
+                # Keep a small window in flight so stdin / huge files stream through
+                while len(pending) >= workers * 2:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        write(future, out)
+                pending[pool.submit(analysis_record, url, max_depth, include_graph, bounded, max_rss_mb)] = url
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    write(future, out)
+        except KeyboardInterrupt:
+            # Records written are the checkpoint: keep the ones that already finished,
+            # drop the queue and don't wait for in-flight URLs (they rerun next time)
+            for future in [f for f in pending if f.done() and not f.cancelled()]:
+                write(future, out)
+            pool.shutdown(wait=False, cancel_futures=True)
+            print(f"Interrupted with {len(pending)} analyses in flight; rerun to resume", file=log)
+            raise
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    analyzed = counts['ok'] + counts['unreachable'] + counts['error']
+    return {
+        **counts,
+        'seconds': round(elapsed, 1),
+        'per_minute': round(analyzed / elapsed * 60, 1) if elapsed else 0.0
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build and analyze citation graphs')
+    parser.add_argument('url', nargs='?', help='Analyze one URL and write frontend/graph_data.json')
+    parser.add_argument('--batch', metavar='FILE', help="Batch mode: file of URLs, one per line ('-' = stdin)")
+    parser.add_argument('--output', default='results.jsonl', help='Batch JSONL output, also the resume checkpoint')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-depth', type=int, help=f'Crawl depth (default {SourceGraph.MAX_DEPTH})')
+    parser.add_argument('--include-graph', action='store_true', help='Add the full exported graph to each record')
+    parser.add_argument('--retry-failed', action='store_true', help='Re-analyze URLs whose record is not ok')
+    parser.add_argument('--bounded', action='store_true', default=None,
+                        help='Bounded-memory mode: spill long edge strings to disk')
+    parser.add_argument('--max-rss-mb', type=float, help='Stop crawling new pages above this RSS')
+    args = parser.parse_args(argv)
+
+    if args.batch:
+        with (contextlib.nullcontext(sys.stdin) if args.batch == '-' else open(args.batch)) as source:
+            summary = run_batch(
+                read_urls(source), args.output, workers=max(1, args.workers), max_depth=args.max_depth,
+                include_graph=args.include_graph, retry_failed=args.retry_failed,
+                bounded=args.bounded, max_rss_mb=args.max_rss_mb
+            )
+        print(json.dumps(summary), file=sys.stderr)
+        return
 
-def main():
     # Test URLs
     test_urls = [
          # A good starting point - Wikipedia usually has many citations
         "https://en.wikipedia.org/wiki/Epistemology",
         # Example news article (might be behind paywall or complex, but let's try)
-        # "https://www.nytimes.com/2024/11/15/climate/climate-change-report.html", 
+        # "https://www.nytimes.com/2024/11/15/climate/climate-change-report.html",
         # "https://www.reddit.com/r/science/top/"
     ]
-    
+
     # Allow passing URL from command line
-    if len(sys.argv) > 1:
-        test_urls = [sys.argv[1]]
-    
+    if args.url:
+        test_urls = [args.url]
+
     for url in test_urls:
-        print(f"\n{'='*60}")
-        print(f"Analyzing: {url}")
-        print('='*60)
-        
-        # Build graph
-        graph = SourceGraph()
-        graph.build_graph(url)
-        
-        # Analyze
-        metrics = graph.analyze_structure()
-        print("\nAnalysis Metrics:")
-        print(f"Nodes: {metrics.get('total_nodes')}")
-        print(f"Edges: {metrics.get('total_edges')}")
-        print(f"Max Depth: {metrics.get('max_depth')}")
-        print(f"Cycles found: {metrics.get('circular_citations_count')}")
-        # print(json.dumps(metrics, indent=2, default=str)) # Too verbose
-        
-        # Export for visualization
-        viz_data = graph.export_for_visualization()
-        
-        # Create a safe filename
-        safe_name = url.replace('https://', '').replace('http://', '').replace('/', '_')[:50]
-        filename = f"frontend/graph_data_{safe_name}.json"
-        
-        # Also save as 'graph_data.json' for the default visualization to pick up easily
-        with open('frontend/graph_data.json', 'w') as f:
-            json.dump(viz_data, f, indent=2)
-            
-        with open(filename, 'w') as f:
-            json.dump(viz_data, f, indent=2)
-        
-        print(f"\nSaved to: {filename} and frontend/graph_data.json")
+        analyze_single(url)
 
 if __name__ == '__main__':
     # Add project root to path so we can import packages if run directly
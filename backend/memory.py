@@ -0,0 +1,165 @@
+import os
+import sys
+import tempfile
+import threading
+
+# Memory bounds for one analysis. SourceGraph always reduces pages to compact
+# records before recursing; on top of that:
+#   SOURCETREE_MEMORY_MODE=bounded - repeated short strings on edges are shared
+#       and long ones (link context, claims, reasons) are spilled to a temp file
+#   SOURCETREE_MAX_RSS_MB=N - RSS ceiling for the worker process. Above 80% of
+#       it pages are fetched with a smaller byte cap; at the ceiling no new
+#       pages are crawled and the analysis finishes with what it has.
+# The ceiling is per process, so concurrent analyses in one worker share it.
+
+BOUNDED = os.environ.get('SOURCETREE_MEMORY_MODE', 'normal') == 'bounded'
+MAX_RSS_MB = float(os.environ.get('SOURCETREE_MAX_RSS_MB', 0))  # 0 = no ceiling
+SPILL_MIN_CHARS = 128           # shorter strings are shared, not spilled
+PRESSURE_FRACTION = 0.8         # of the ceiling
+PRESSURE_PAGE_BYTES = 512 * 1024
+
+PRESSURE, CEILING = 'pressure', 'ceiling'
+
+try:
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if it can't be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # No /proc (macOS): fall back to the peak, the best the OS offers cheaply
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _mb(value):
+    return round(value / (1024 * 1024), 1) if value is not None else None
+
+class SpilledText:
+    """A string parked in a StringSpill file; str() reads it back"""
+    __slots__ = ('spill', 'offset', 'length')
+
+    def __init__(self, spill, offset, length):
+        self.spill = spill
+        self.offset = offset
+        self.length = length
+
+    def __str__(self):
+        return self.spill.read(self.offset, self.length)
+
+    def __repr__(self):
+        return f'SpilledText({self.length} bytes)'
+
+class StringSpill:
+    """
+    Per-graph string store for bounded mode: short strings are deduplicated,
+    long ones are written to an anonymous temp file (deleted on close).
+    """
+    def __init__(self, min_chars=SPILL_MIN_CHARS):
+        self.min_chars = min_chars
+        self.shared = {}
+        self.spilled = 0
+        self.spilled_bytes = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._readers = 0
+        self._closed = False
+
+    def store(self, value):
+        if not isinstance(value, str):
+            return value
+        if len(value) < self.min_chars:
+            return self.shared.setdefault(value, value)
+        data = value.encode('utf-8')
+        with self._lock:
+            if self._file is None:
+                self._file = tempfile.TemporaryFile()
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(data)
+            self.spilled += 1
+            self.spilled_bytes += len(data)
+        return SpilledText(self, offset, len(data))
+
+    def read(self, offset, length):
+        with self._lock:
+            if self._file is None:
+                raise ValueError('string spill is closed')
+            self._file.seek(offset)
+            return self._file.read(length).decode('utf-8')
+
+    def acquire(self):
+        """Register a reader that close() waits for; False once closed"""
+        with self._lock:
+            if self._closed:
+                return False
+            self._readers += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._readers -= 1
+            self._close_if_idle()
+
+    def close(self):
+        """Delete the temp file, or once the last reader releases if any are active"""
+        with self._lock:
+            self._closed = True
+            self._close_if_idle()
+
+    def _close_if_idle(self):
+        if self._closed and not self._readers and self._file is not None:
+            self._file.close()
+            self._file = None
+
+def unspill(value):
+    """Plain str for a value that may have been spilled"""
+    return str(value) if isinstance(value, SpilledText) else value
+
+class MemoryGuard:
+    """
+    Tracks RSS over one analysis (start and peak) and says when to degrade:
+    None, PRESSURE (above PRESSURE_FRACTION of the ceiling) or CEILING.
+    Once reached, a state sticks for the rest of the analysis.
+    """
+    def __init__(self, ceiling_mb=None):
+        ceiling_mb = MAX_RSS_MB if ceiling_mb is None else ceiling_mb
+        self.ceiling = int(ceiling_mb * 1024 * 1024) if ceiling_mb else None
+        self.start = current_rss()
+        self.peak = self.start
+        self.state = None
+        self.skipped_pages = 0
+
+    def check(self):
+        rss = current_rss()
+        if rss is None:
+            return self.state
+        self.peak = max(self.peak or 0, rss)
+        if self.ceiling:
+            if rss >= self.ceiling:
+                self.state = CEILING
+            elif rss >= self.ceiling * PRESSURE_FRACTION and self.state is None:
+                self.state = PRESSURE
+        return self.state
+
+    def page_bytes(self):
+        """Fetch size cap for the next page (None = the fetcher's default)"""
+        return PRESSURE_PAGE_BYTES if self.state else None
+
+    def report(self):
+        return {
+            'start_rss_mb': _mb(self.start),
+            'peak_rss_mb': _mb(self.peak),
+            'growth_mb': _mb(self.peak - self.start) if self.peak is not None and self.start is not None else None,
+            'ceiling_mb': _mb(self.ceiling),
+            'degraded': self.state,
+            'skipped_pages': self.skipped_pages
+        }
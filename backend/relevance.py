@@ -0,0 +1,101 @@
+import re
+from urllib.parse import urlparse
+
+import numpy as np
+from scipy import sparse
+
+# Local claim -> candidate source ranking. Every claim (its text, the source
+# it names and the entities in it) and every search candidate (title, snippet
+# and URL words) becomes a TF-IDF vector; the ranking is one sparse product of
+# the claim matrix with the candidate matrix, cosine similarity in [0, 1].
+# IDF is fitted on all candidates of all claims together, so a word that
+# every result shares (the search engine matched on it) counts for little.
+
+ENTITY_WEIGHT = 2   # entity / named-source terms count this many times
+
+STOPWORDS = frozenset('''
+a an and are as at be been but by for from has have in is it its of on or
+that the this to was were which with will not no than then there these they
+www com org gov edu net html htm php index
+'''.split())
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+def tokenize(text):
+    """Lowercased word tokens without stopwords or single characters"""
+    return [t for t in _TOKEN.findall((text or '').lower()) if len(t) > 1 and t not in STOPWORDS]
+
+def url_words(url):
+    """Host and path of a URL as text ('www.cdc.gov/nchs/obesity' -> 'cdc nchs obesity')"""
+    parsed = urlparse(url)
+    return f'{parsed.netloc} {parsed.path}'.replace('-', ' ').replace('_', ' ')
+
+# Entities come from spaCy via semantic_analyzer; without the model the ranker
+# still works on the claim text and the named source alone.
+_entities_ok = True
+
+def claim_entities(text):
+    """Organisations, people and publications named in `text` ([] without spaCy)"""
+    global _entities_ok
+    if not _entities_ok or not text:
+        return []
+    try:
+        try:
+            from backend.semantic_analyzer import extract_entities
+        except ImportError:
+            from semantic_analyzer import extract_entities
+        entities = extract_entities(text)
+    except (ImportError, OSError):
+        _entities_ok = False
+        return []
+    return entities['orgs'] + entities['people'] + entities['publications']
+
+def claim_terms(claim):
+    """Query tokens for one LLM claim dict; named sources and entities weighted up"""
+    text = claim.get('claim') or ''
+    named = [claim.get('mentioned_source') or ''] + claim_entities(text)
+    return tokenize(text) + tokenize(' '.join(named)) * ENTITY_WEIGHT
+
+def candidate_terms(candidate):
+    """Document tokens for one search candidate: title, snippet and URL words"""
+    return tokenize(f"{candidate.get('snippet') or ''} {url_words(candidate['url'])}")
+
+def _counts(token_lists, vocab):
+    rows, cols = [], []
+    for row, tokens in enumerate(token_lists):
+        for token in tokens:
+            col = vocab.get(token)
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+    data = np.ones(len(rows))
+    counts = sparse.csr_matrix((data, (rows, cols)), shape=(len(token_lists), len(vocab)))
+    counts.sum_duplicates()  # repeated (row, col) pairs -> term counts
+    return counts
+
+def _weigh(counts, idf):
+    """Sublinear tf * idf, rows L2-normalised"""
+    counts = counts.copy()
+    counts.data = 1.0 + np.log(counts.data)
+    weighted = sparse.csr_matrix(counts.multiply(idf))
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ weighted
+
+def similarity(queries, documents):
+    """
+    Cosine similarity of TF-IDF vectors: a len(queries) x len(documents)
+    array for lists of token lists. IDF is fitted on `documents`; query
+    terms that no document contains are ignored.
+    """
+    scores = np.zeros((len(queries), len(documents)))
+    vocab = {}
+    for tokens in documents:
+        for token in tokens:
+            vocab.setdefault(token, len(vocab))
+    if not vocab or not queries:
+        return scores
+    docs = _counts(documents, vocab)
+    df = np.bincount(docs.indices, minlength=len(vocab))
+    idf = np.log((1 + len(documents)) / (1 + df)) + 1.0
+    return (_weigh(_counts(queries, vocab), idf) @ _weigh(docs, idf).T).toarray()
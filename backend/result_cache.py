@@ -0,0 +1,221 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # gzip only
+
+try:
+    from backend.instrumentation import cache_lookup
+except ImportError:
+    from instrumentation import cache_lookup
+
+# Finished analyses keyed by canonical URL + crawl parameters, so repeat
+# requests for the same page skip the crawl. Results are kept as serialised
+# JSON with a strong ETag, and compressed variants are built once per entry.
+# SOURCETREE_RESULT_TTL sets the default freshness in seconds.
+
+RESULT_TTL = float(os.environ.get('SOURCETREE_RESULT_TTL', 900))
+COMPRESS_MIN_BYTES = 1024   # smaller bodies aren't worth compressing
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5          # 11 is several times slower for a few % more
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga'}
+
+def canonical_url(url):
+    """
+    Normalise a URL for cache keys: lowercase scheme and host, no default
+    port, fragment or tracking parameters, remaining query sorted.
+    """
+    url = url.strip()
+    parts = urlsplit(url)
+    if not parts.netloc:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f'{host}:{port}'
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in TRACKING_PARAMS and not k.startswith('utm_')
+    ))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+def cache_key(url, **params):
+    """Stable key for one analysis: canonical URL plus every parameter that changes the result"""
+    raw = json.dumps({'url': canonical_url(url), **params}, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def choose_encoding(accept_encoding):
+    """Best Content-Encoding we can produce for an Accept-Encoding header (None = identity)"""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    return data
+
+def compress_stream(chunks, encoding):
+    """
+    Compress a text/event-stream generator incrementally. The compressor is
+    flushed after every complete event so clients still see events as they
+    happen rather than when a compression block fills up.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip framing
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = process(chunk)
+        if chunk.endswith(b'\n\n'):
+            data += flush()
+        if data:
+            yield data
+    yield finish()
+
+class EncodedBody:
+    """
+    A serialised response body with a strong ETag and lazily built compressed
+    variants. Each encoding gets its own ETag (strong validators must differ
+    per representation); If-None-Match accepts any of them.
+    """
+    def __init__(self, raw):
+        self.raw = raw
+        self.tag = hashlib.sha256(raw).hexdigest()[:32]
+        self._encoded = {}
+
+    def etag(self, encoding=None):
+        return f'"{self.tag}-{encoding}"' if encoding else f'"{self.tag}"'
+
+    def matches(self, if_none_match):
+        if not if_none_match:
+            return False
+        for candidate in if_none_match.split(','):
+            candidate = candidate.strip()
+            if candidate == '*':
+                return True
+            if candidate.startswith('W/'):
+                candidate = candidate[2:]
+            if candidate.strip('"').split('-')[0] == self.tag:
+                return True
+        return False
+
+    def encoded(self, encoding):
+        if not encoding:
+            return self.raw
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = compress(self.raw, encoding)
+        return data
+
+class CachedResult:
+    __slots__ = ('body', 'graph_id', 'graph', 'stored_at')
+
+    def __init__(self, body, graph_id, graph, stored_at=None):
+        self.body = body
+        self.graph_id = graph_id
+        self.graph = graph
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    def age(self):
+        return time.time() - self.stored_at
+
+class ResultCache:
+    """
+    LRU of finished analyses. Entries older than `ttl` are never served;
+    callers may ask for something fresher per request via `max_age`.
+    on_evict(entry) is called, outside the lock, for every entry that drops
+    out by LRU, TTL, replacement or clear().
+    """
+    def __init__(self, max_entries=100, ttl=RESULT_TTL, on_evict=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # key -> CachedResult
+        self._lock = threading.Lock()
+
+    def get(self, key, max_age=None):
+        max_age = self.ttl if max_age is None else min(max_age, self.ttl)
+        evicted = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.age() > self.ttl:
+                evicted.append(self._entries.pop(key))
+                entry = None
+            if entry and entry.age() > max_age:
+                entry = None  # too old for this caller, but still fine for others
+            cache_lookup('result_cache', entry is not None)
+            if entry:
+                self._entries.move_to_end(key)
+        self._evicted(evicted)
+        return entry
+
+    def put(self, key, payload, graph_id, graph, stored_at=None):
+        """Serialise `payload` once and store it; returns the CachedResult"""
+        entry = CachedResult(EncodedBody(json.dumps(payload).encode()), graph_id, graph, stored_at)
+        evicted = []
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous:
+                evicted.append(previous)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+        self._evicted(evicted)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            evicted = list(self._entries.values())
+            self._entries.clear()
+        self._evicted(evicted)
+
+    def holds(self, graph):
+        """Whether any entry still refers to `graph`"""
+        with self._lock:
+            return any(entry.graph is graph for entry in self._entries.values())
+
+    def _evicted(self, entries):
+        if self.on_evict:
+            for entry in entries:
+                self.on_evict(entry)
+
+    def __len__(self):
+        return len(self._entries)
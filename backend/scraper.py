@@ -1,17 +1,199 @@
+import os
+import re
+import zlib
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 
-def fetch_page(url):
-    """Fetch HTML content from URL"""
-    headers = {'User-Agent': 'Mozilla/5.0 (Educational Research Bot)'}
+try:
+    from backend.instrumentation import timed, count
+    from backend.tracing import annotate
+except ImportError:
+    from instrumentation import timed, count
+    from tracing import annotate
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Educational Research Bot)'}
+
+# Hard cap on bytes read per page (HTML or PDF). Anything past this is dropped.
+MAX_PAGE_BYTES = int(os.environ.get('SOURCETREE_MAX_PAGE_BYTES', 2 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+
+HTML_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+PDF_TYPES = ('application/pdf', 'application/x-pdf')
+
+def fetch_page(url, max_bytes=None):
+    """Fetch HTML content from URL (returns None for non-HTML or error pages)"""
+    document = fetch_document(url, max_bytes=max_bytes)
+    if not document or document['kind'] != 'html':
+        return None
+    return document['html']
+
+@timed('fetch')
+def fetch_document(url, max_bytes=None, outcome=None):
+    """
+    Streaming fetch that checks status and Content-Type before reading the body.
+
+    Returns a dict with 'kind' ('html' or 'pdf'), the decoded 'html' or extracted
+    'text', and bookkeeping ('status', 'content_type', 'bytes', 'truncated'),
+    or None if the page is an error, an unsupported type, or could not be fetched.
+    A dict passed as `outcome` receives the fetch 'result' (as counted in
+    sourcetree_fetch_total) and the HTTP 'status', also when None is returned.
+    """
+    max_bytes = max_bytes or MAX_PAGE_BYTES
+    outcome = {} if outcome is None else outcome
+    annotate(url=url)
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        return response.text
+        with requests.get(url, headers=HEADERS, timeout=10, stream=True) as response:
+            annotate(status=response.status_code)
+            outcome['status'] = response.status_code
+            if response.status_code >= 400:
+                print(f"Skipping {url}: HTTP {response.status_code}")
+                _fetch_result(outcome, 'http_error')
+                return None
+
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            kind = classify_content_type(content_type, url)
+            if kind is None:
+                print(f"Skipping {url}: unsupported content type '{content_type}'")
+                _fetch_result(outcome, 'unsupported_type')
+                return None
+
+            # Refuse early when the server already tells us the body is too big for a PDF;
+            # HTML is still read up to the cap since the head of the page is usually enough.
+            declared = response.headers.get('Content-Length')
+            if kind == 'pdf' and declared and declared.isdigit() and int(declared) > max_bytes:
+                print(f"Skipping {url}: PDF too large ({declared} bytes)")
+                _fetch_result(outcome, 'too_large')
+                return None
+
+            body, truncated = read_body(response, max_bytes, stop_at_body_end=(kind == 'html'))
+            count('sourcetree_fetch_bytes_total', len(body), kind=kind)
+            _fetch_result(outcome, 'truncated' if truncated else 'ok')
+            annotate(kind=kind, bytes=len(body), truncated=truncated)
+
+            document = {
+                'url': url,
+                'kind': kind,
+                'status': response.status_code,
+                'content_type': content_type,
+                'bytes': len(body),
+                'truncated': truncated
+            }
+            if kind == 'pdf':
+                document['text'] = extract_pdf_text(body)
+            else:
+                # requests defaults text/* to ISO-8859-1 when the header has no charset,
+                # so only trust response.encoding when the server actually declared one
+                declared_charset = 'charset' in response.headers.get('Content-Type', '').lower()
+                encoding = response.encoding if declared_charset else sniff_charset(body)
+                document['html'] = body.decode(encoding or 'utf-8', errors='replace')
+            return document
     except Exception as e:
         print(f"Error fetching {url}: {e}")
+        _fetch_result(outcome, 'error')
         return None
 
+def _fetch_result(outcome, result):
+    outcome['result'] = result
+    count('sourcetree_fetch_total', result=result)
+
+def classify_content_type(content_type, url=''):
+    """Map a Content-Type header to the parser path: 'html', 'pdf' or None (skip)"""
+    if content_type in PDF_TYPES:
+        return 'pdf'
+    if not content_type:
+        # No header: trust the extension, otherwise assume HTML
+        return 'pdf' if urlparse(url).path.lower().endswith('.pdf') else 'html'
+    if content_type in HTML_TYPES:
+        return 'html'
+    return None
+
+def read_body(response, max_bytes, stop_at_body_end=False):
+    """
+    Read the response body in chunks up to max_bytes.
+    For HTML, stop as soon as the closing </body> tag has arrived - nothing
+    after it is useful for link or text extraction.
+    Returns (bytes, truncated).
+    """
+    chunks = []
+    size = 0
+    tail = b''
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        if not chunk:
+            continue
+        chunks.append(chunk)
+        size += len(chunk)
+
+        if stop_at_body_end:
+            # Keep a small overlap so a tag split across chunks is still found
+            window = (tail + chunk).lower()
+            if b'</body' in window:
+                break
+            tail = window[-8:]
+
+        if size >= max_bytes:
+            return b''.join(chunks)[:max_bytes], True
+
+    return b''.join(chunks), False
+
+def sniff_charset(body):
+    """Find a <meta charset> in the first few KB, defaulting to UTF-8"""
+    match = re.search(rb'<meta[^>]+charset=["\']?([\w-]+)', body[:4096], re.IGNORECASE)
+    if match:
+        charset = match.group(1).decode('ascii', errors='ignore')
+        try:
+            ''.encode(charset)
+            return charset
+        except LookupError:
+            pass
+    return 'utf-8'
+
+def extract_pdf_text(data):
+    """
+    Lightweight PDF text extraction (no PDF library required).
+    Inflates FlateDecode streams and collects the string operands of the
+    Tj / TJ text operators. Good enough for claim extraction, not for layout.
+    """
+    texts = []
+    for match in re.finditer(rb'stream\r?\n(.*?)\r?\nendstream', data, re.DOTALL):
+        raw = match.group(1)
+        try:
+            content = zlib.decompress(raw)
+        except zlib.error:
+            content = raw
+        for block in re.findall(rb'BT(.*?)ET', content, re.DOTALL):
+            parts = re.findall(rb'\(((?:\\.|[^\\)])*)\)', block)
+            line = b''.join(parts)
+            if line:
+                texts.append(_unescape_pdf_string(line))
+    return '\n'.join(texts)
+
+def _unescape_pdf_string(raw):
+    raw = re.sub(rb'\\([nrtbf()\\])', lambda m: {
+        b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'', b'f': b''
+    }.get(m.group(1), m.group(1)), raw)
+    return raw.decode('latin-1', errors='replace')
+
+def extract_pdf_links(text):
+    """Pull plain http(s) URLs out of extracted PDF text"""
+    links = []
+    for url in dict.fromkeys(re.findall(r'https?://[^\s)\]>"]+', text)):
+        url = url.rstrip('.,;')
+        if is_valid_source(url):
+            links.append({
+                'url': url,
+                'context': _context_around(text, url),
+                'anchor_text': url,
+                'type': 'pdf_link'
+            })
+    return links
+
+def _context_around(text, needle, width=150):
+    index = text.find(needle)
+    if index < 0:
+        return ''
+    return ' '.join(text[max(0, index - width):index + len(needle) + width].split())[:300]
+
 def extract_metadata(soup, url):
     """Extract page metadata for graph node"""
     return {
@@ -21,6 +203,37 @@ def extract_metadata(soup, url):
         # 'type' will be classified later by graph_builder
     }
 
+def extract_main_text(soup):
+    """
+    Article body text (paragraphs only), without nav/footer boilerplate.
+    Falls back to the full page text for pages that don't use <p>.
+    """
+    paragraphs = [p.get_text(' ', strip=True) for p in soup.find_all('p')]
+    text = '\n'.join(p for p in paragraphs if p)
+    return text if len(text) > 200 else soup.get_text(' ', strip=True)
+
+# Signs that the text we got is not the article: a paywall, or a page that
+# only renders with JavaScript. Only trusted when the readable text is short,
+# except for the schema.org flag publishers set on paywalled articles.
+MIN_READABLE_CHARS = 500
+PAYWALL_MARKERS = re.compile(
+    r'subscribe to (?:continue|read|keep reading)|subscribers only|already a subscriber|paywall', re.IGNORECASE)
+JS_ONLY_MARKERS = re.compile(
+    r'enable javascript|javascript is (?:required|disabled)|requires javascript|turn on javascript', re.IGNORECASE)
+NOT_FREE = re.compile(r'"isAccessibleForFree"\s*:\s*"?false', re.IGNORECASE)
+
+def detect_access_wall(html, body_text):
+    """'paywall', 'js_only' or None for a fetched HTML page and its main text"""
+    if NOT_FREE.search(html):
+        return 'paywall'
+    if len(body_text.strip()) >= MIN_READABLE_CHARS:
+        return None
+    if PAYWALL_MARKERS.search(html):
+        return 'paywall'
+    if JS_ONLY_MARKERS.search(html):
+        return 'js_only'
+    return None
+
 def extract_links(soup, base_url):
     """Extract all outbound links from page"""
     links = []
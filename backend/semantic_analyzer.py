@@ -1,13 +1,24 @@
-import spacy
 import re
+import threading
 
-# Load SpaCy model - remember to install it: python -m spacy download en_core_web_sm
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("SpaCy model 'en_core_web_sm' not found. Please run: python -m spacy download en_core_web_sm")
-    # Fallback or exit? For now let's just create a dummy object or re-raise
-    raise
+# SpaCy model - remember to install it: python -m spacy download en_core_web_sm
+# Loaded on first use: importing this module stays cheap, and a missing model
+# only fails the calls that need it.
+_nlp = None
+_nlp_lock = threading.Lock()
+
+def get_nlp():
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                import spacy
+                try:
+                    _nlp = spacy.load("en_core_web_sm")
+                except OSError:
+                    print("SpaCy model 'en_core_web_sm' not found. Please run: python -m spacy download en_core_web_sm")
+                    raise
+    return _nlp
 
 def extract_claims(text):
     """
@@ -17,7 +28,7 @@ def extract_claims(text):
     # Helper to clean text
     text = re.sub(r'\s+', ' ', text).strip()
     
-    doc = nlp(text)
+    doc = get_nlp()(text)
     claims = []
     
     for sent in doc.sents:
@@ -67,7 +78,7 @@ def extract_entities(text):
     Find organizations, people, publications mentioned
     These are potential sources to search for
     """
-    doc = nlp(text)
+    doc = get_nlp()(text)
     
     entities = {
         'orgs': [],      # CDC, WHO, Harvard, etc.
@@ -1,77 +1,139 @@
-from googlesearch import search
 from urllib.parse import urlparse
 import time
 
-def find_implicit_sources(claim_data):
-    """
-    For claims without explicit links, try to find the original source
-    using the search query generated by LLM
-    """
-    
-    if claim_data.get('has_explicit_link', False):
-        return []
-    
-    query = claim_data.get('search_query')
-    if not query:
-        return []
-        
-    # Search for the source
-    potential_sources = []
+try:
+    from backend.instrumentation import timed, timer, count
+    from backend.relevance import claim_terms, candidate_terms, similarity
+except ImportError:
+    from instrumentation import timed, timer, count
+    from relevance import claim_terms, candidate_terms, similarity
+
+SEARCH_RESULTS = 5
+MAX_SOURCES_PER_CLAIM = 3
+MIN_RELEVANCE = 0.1  # cosine similarity claim <-> candidate; below this it's a different page
+                     # (not applied to results without title/description: URL words alone score low)
+
+def search(query, num_results=10, sleep_interval=0, advanced=False):
+    """googlesearch's search(), imported on first use to keep API startup fast"""
+    from googlesearch import search as google_search
+    return google_search(query, num_results=num_results, sleep_interval=sleep_interval, advanced=advanced)
+
+def search_candidates(query):
+    """Authoritative search results for `query` as {'url', 'snippet'} dicts"""
+    candidates = []
     try:
         # Note: googlesearch-python might pause to avoid rate limits
-        for url in search(query, num_results=5, sleep_interval=2):
-            # Filter for authoritative domains
-            if is_authoritative_domain(url):
-                potential_sources.append({
-                    'url': url,
-                    'search_query': query,
-                    'confidence': calculate_relevance(url, claim_data),
-                    'type': 'discovered'
-                })
+        with timer('search'):
+            # advanced=True also returns each result's title and description
+            for result in search(query, num_results=SEARCH_RESULTS, sleep_interval=2, advanced=True):
+                if isinstance(result, str):  # plain URL, no title or description
+                    url, snippet = result, ''
+                else:
+                    url = result.url
+                    snippet = ' '.join(filter(None, [getattr(result, 'title', None), getattr(result, 'description', None)]))
+                # Filter for authoritative domains
+                if is_authoritative_domain(url):
+                    candidates.append({'url': url, 'snippet': snippet})
     except Exception as e:
         print(f"Search failed: {e}")
-    
-    return potential_sources[:3]  # Top 3 results
+    return candidates
+
+@timed('find_sources_for_claims')
+def find_sources_for_claims(claims):
+    """
+    For claims without explicit links, try to find the original source
+    using the search query generated by LLM.
+
+    Candidates of all claims are ranked against all claims in one pass
+    (see relevance.py); a claim keeps at most MAX_SOURCES_PER_CLAIM results
+    scoring MIN_RELEVANCE or more (or without text to score), best first.
+    Returns one list per claim.
+    """
+    results = [[] for _ in claims]
+    searched = []  # (claim index, query, candidates)
+    for index, claim_data in enumerate(claims):
+        if claim_data.get('has_explicit_link', False):
+            continue
+        query = claim_data.get('search_query')
+        if not query:
+            continue
+        searched.append((index, query, search_candidates(query)))
+
+    # One document per distinct URL, whichever claim's search found it
+    documents = {}
+    for _, _, candidates in searched:
+        for candidate in candidates:
+            documents.setdefault(candidate['url'], candidate)
+    if not documents:
+        return results
+    urls = list(documents)
+    column = {url: i for i, url in enumerate(urls)}
+    scores = similarity(
+        [claim_terms(claims[index]) for index, _, _ in searched],
+        [candidate_terms(documents[url]) for url in urls]
+    )
+
+    for row, (index, query, candidates) in enumerate(searched):
+        ranked = sorted(
+            {c['url'] for c in candidates},
+            key=lambda url: scores[row, column[url]],
+            reverse=True
+        )
+        for url in ranked:
+            relevance = float(scores[row, column[url]])
+            if relevance < MIN_RELEVANCE and documents[url]['snippet']:
+                count('sourcetree_discovered_sources_total', result='rejected', reason='relevance')
+                continue
+            if len(results[index]) >= MAX_SOURCES_PER_CLAIM:
+                count('sourcetree_discovered_sources_total', result='rejected', reason='cap')
+                continue
+            count('sourcetree_discovered_sources_total', result='accepted')
+            results[index].append({
+                'url': url,
+                'search_query': query,
+                'relevance': round(relevance, 4),
+                'confidence': calculate_confidence(url, relevance),
+                'type': 'discovered'
+            })
+    return results
+
+def find_implicit_sources(claim_data):
+    """find_sources_for_claims() for a single claim"""
+    return find_sources_for_claims([claim_data])[0]
 
 def is_authoritative_domain(url):
     """Check if domain is typically authoritative"""
     try:
         parsed = urlparse(url)
         domain = parsed.netloc.lower()
-        
+
         # High-authority TLDs
         if domain.endswith(('.gov', '.edu', '.org')):
             return True
-        
+
         # Known authoritative sources (can be expanded)
         authoritative = [
             'nih.gov', 'cdc.gov', 'who.int', 'nature.com', 'science.org',
             'nytimes.com', 'washingtonpost.com', 'reuters.com', 'apnews.com',
             'jstor.org', 'arxiv.org', 'pubmed.ncbi.nlm.nih.gov'
         ]
-        
+
         return any(auth in domain for auth in authoritative)
     except:
         return False
 
-def calculate_relevance(url, claim_data):
+def calculate_confidence(url, relevance):
     """
     Score how likely this URL is the actual source
-    based on domain authority + entity matching
+    based on claim relevance + domain authority
     """
-    score = 0.5  # baseline
-    
-    # Boost if mentioned source appears in URL
-    mentioned_source = claim_data.get('mentioned_source')
-    if mentioned_source:
-        source_slug = mentioned_source.lower().replace(' ', '')
-        if source_slug in url.lower():
-            score += 0.3
-    
+    score = 0.5 + 0.4 * relevance  # baseline + how well the page matches the claim
+
     # Boost for authoritative domains
-    if '.gov' in url:
-        score += 0.2
-    elif '.edu' in url:
-        score += 0.15
-    
-    return min(score, 1.0)
+    domain = urlparse(url).netloc.lower()
+    if domain.endswith('.gov'):
+        score += 0.1
+    elif domain.endswith('.edu'):
+        score += 0.05
+
+    return round(min(score, 1.0), 3)
@@ -0,0 +1,104 @@
+import importlib
+import os
+import sys
+import threading
+import time
+
+# Cold-start bookkeeping. The API imports only Flask and light helpers; the
+# crawler stack (NetworkX, BeautifulSoup, numpy/scipy, the Anthropic client,
+# googlesearch, spaCy) loads on first use. warm_up() loads it ahead of time -
+# in a background thread when SOURCETREE_WARMUP=1 - so the first analysis
+# doesn't pay for it, while /health answers as soon as the worker is up.
+
+def process_age():
+    """Seconds since this process started (the OS's start time), or None if unknown"""
+    try:
+        with open('/proc/self/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()  # the command name may contain spaces
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+# Start of the cold start ready_ms measures: when the process started, so the
+# interpreter and everything imported before this module count too (without
+# /proc, when this module was imported)
+PROCESS_START = time.perf_counter() - (process_age() or 0.0)
+BUDGET_MS = float(os.environ.get('SOURCETREE_STARTUP_BUDGET_MS', 500))
+
+# Modules that must not load at import time (the budget check names them)
+HEAVY_MODULES = ('anthropic', 'networkx', 'bs4', 'numpy', 'scipy', 'spacy', 'googlesearch')
+
+_lock = threading.Lock()
+state = {
+    'ready_ms': None,     # import -> app ready
+    'warm': False,        # warm_up() finished
+    'warmup_ms': {},      # step -> milliseconds
+    'warmup_errors': {}   # step -> error
+}
+
+def mark_ready(budget_ms=BUDGET_MS, log=sys.stderr):
+    """
+    Record how long the app took to become ready and warn when that exceeds
+    the startup budget, naming any heavy modules that were imported eagerly.
+    """
+    ready_ms = round((time.perf_counter() - PROCESS_START) * 1000, 1)
+    state['ready_ms'] = ready_ms
+    if budget_ms and ready_ms > budget_ms:
+        eager = [name for name in HEAVY_MODULES if name in sys.modules]
+        print(
+            f"Warning: startup took {ready_ms:.0f}ms (budget {budget_ms:.0f}ms)"
+            + (f"; eagerly imported: {', '.join(eager)}" if eager else ''),
+            file=log
+        )
+    return ready_ms
+
+def _load_graph_builder():
+    importlib.import_module('backend.graph_builder')
+
+def _load_llm_client():
+    from backend.llm_analyzer import get_client
+    get_client()
+
+def _load_search():
+    importlib.import_module('googlesearch')
+
+def _load_spacy():
+    from backend.semantic_analyzer import get_nlp
+    get_nlp()
+
+def _load_relevance():
+    # The ranker's entity extraction: its first call otherwise lands in the
+    # find_sources_for_claims stage timing
+    from backend.relevance import claim_entities
+    claim_entities('Warm-up sentence from the Centers for Disease Control.')
+
+WARMUP_STEPS = [
+    ('graph_builder', _load_graph_builder),   # networkx, bs4, numpy/scipy
+    ('llm_client', _load_llm_client),
+    ('search', _load_search),
+    ('spacy', _load_spacy),
+    ('relevance', _load_relevance),
+]
+
+def warm_up():
+    """Load every lazily initialised dependency now; failures are recorded, not raised"""
+    with _lock:
+        if state['warm']:
+            return state
+        for name, step in WARMUP_STEPS:
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:  # e.g. spaCy model not downloaded
+                state['warmup_errors'][name] = f'{type(e).__name__}: {e}'
+            state['warmup_ms'][name] = round((time.perf_counter() - start) * 1000, 1)
+        state['warm'] = True
+    return state
+
+def start_warmup():
+    """warm_up() in a daemon thread, so the worker can serve requests meanwhile"""
+    thread = threading.Thread(target=warm_up, name='sourcetree-warmup', daemon=True)
+    thread.start()
+    return thread
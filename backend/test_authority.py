@@ -0,0 +1,34 @@
+from backend.authority import compute_authority_metrics, adjacency_matrix, pagerank
+from backend.api import farthest_from_bedrock
+import networkx as nx
+
+def test():
+    print("Testing authority metrics...")
+    G = nx.DiGraph()
+    G.add_edges_from([
+        ("blog", "news1"), ("blog", "news2"),
+        ("news1", "cdc.gov"), ("news2", "cdc.gov"), ("news2", "wire"),
+        ("news1", "wire"), ("wire", "cdc.gov"),
+    ])
+    G.add_node("orphan")
+
+    nodes, A = adjacency_matrix(G)
+    expected = nx.pagerank(G, alpha=0.85, tol=1e-12)
+    for node, score in zip(nodes, pagerank(A)):
+        assert abs(score - expected[node]) < 1e-6
+
+    metrics = compute_authority_metrics(G, {"cdc.gov"})
+    assert metrics['pagerank'][0][0] == "cdc.gov"
+    assert metrics['distance_to_bedrock'] == {
+        "blog": 2, "news1": 1, "news2": 1, "cdc.gov": 0, "wire": 1, "orphan": None
+    }
+    assert metrics['bedrock']['unreachable'] == 1
+    # The client summary only gets the worst-sourced nodes
+    assert farthest_from_bedrock(metrics['distance_to_bedrock'], top_n=2) == [("orphan", None), ("blog", 2)]
+    # news1 and news2 cite exactly the same two sources
+    pair = metrics['dependent_pairs'][0]
+    assert {pair['a'], pair['b']} == {"news1", "news2"} and pair['independence'] == 0.0
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,45 @@
+import contextlib
+import io
+import json
+import tempfile
+from collections import Counter
+from backend import benchmark
+from backend.api import app
+
+def test():
+    print("Testing batch analysis...")
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        pages, scenarios = benchmark.load_corpus(corpus_dir)
+    roots = [scenarios['article'], scenarios['syndicated'], scenarios['article'] + '#dup']
+    timer = benchmark.StageTimer()
+    fakes = benchmark.FakeBackends(pages)
+    fetches = Counter()
+    replay = fakes.get
+    fakes.get = lambda url, **kwargs: fetches.update([url]) or replay(url, **kwargs)
+    with benchmark.patched(fakes, timer), contextlib.redirect_stdout(io.StringIO()):
+        body = app.test_client().post('/batch-analyze', json={'urls': roots}).get_data(as_text=True)
+
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((fields['event'], json.loads(fields['data'])))
+    names = [name for name, _ in events]
+    # Fragment-only duplicate dropped; each root reports start and completion
+    assert names.count('root_start') == 2 and names.count('root_complete') == 2
+    assert {data['root'] for name, data in events if name == 'node'} <= {0, 1}
+
+    complete = dict(events)['complete']
+    overlap = complete['overlap']
+    assert overlap['roots'] == 2 and len(overlap['pairs']) == 1
+    # The article cites one wire copy and the roundup links them all: shared sources
+    assert overlap['shared_sources'] > 0 and overlap['pairs'][0]['shared_sources'] == overlap['shared_sources']
+    nodes = {node['id']: node for node in complete['graph']['nodes']}
+    assert nodes[scenarios['article']]['roots'] == [0]
+    assert any(node['roots'] == [0, 1] for node in nodes.values())
+
+    # Shared sources were fetched once, not once per root
+    assert fetches and max(fetches.values()) == 1
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,24 @@
+from backend import benchmark
+import tempfile
+
+def test():
+    print("Testing offline benchmark harness...")
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        pages, scenarios = benchmark.load_corpus(corpus_dir)
+        # Second load replays the recorded files
+        assert benchmark.load_corpus(corpus_dir)[0] == pages
+
+        result = benchmark.bench_scenario(
+            'syndicated', pages, scenarios['syndicated'], 2, runs=1, latencies={}, memory=False
+        )
+    assert result['nodes'] > 1 and result['pages_fetched'] > 1
+    # Fakes stood in for every external call
+    for stage in ('fetch', 'parse', 'verify_link_significance', 'llm_extract_implicit_sources'):
+        assert result['stages'][stage]['count'] > 0
+
+    analysis = benchmark.bench_analysis(500, runs=1, memory=False)
+    assert analysis['edges'] == 500
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
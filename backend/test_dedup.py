@@ -0,0 +1,24 @@
+from backend.dedup import NearDuplicateIndex
+import random
+
+def test():
+    print("Testing near-duplicate index...")
+    rng = random.Random(0)
+    vocab = [f"word{i}" for i in range(500)]
+    story = ' '.join(rng.choice(vocab) for _ in range(400))
+    # Same wire story with an outlet-specific intro and a couple of edits
+    copy = "Published by Example Times. " + story.replace(story.split()[200], "changed", 1)
+    unrelated = ' '.join(rng.choice(vocab) for _ in range(400))
+
+    index = NearDuplicateIndex()
+    index.add("http://wire.com/story", index.signature_for(story))
+
+    match = index.find_duplicate(index.signature_for(copy))
+    assert match and match[0] == "http://wire.com/story"
+    assert index.find_duplicate(index.signature_for(unrelated)) is None
+    # Short pages are never judged
+    assert index.signature_for("too short to tell") is None
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,91 @@
+import contextlib
+import io
+from backend import benchmark
+from backend.domains import DomainRegistry, RobotsUnavailable, DEAD, DISALLOWED, DEAD_AFTER
+from backend.graph_builder import SourceGraph, RootUnavailable
+from backend.scraper import detect_access_wall
+
+HTML = 'text/html; charset=utf-8'
+TEXT = 'Officials published the figures on Monday after a long review of the survey data. ' * 8
+
+def page(*hrefs, extra=''):
+    links = ''.join(f'<p>{TEXT} <a href="{href}">the report</a></p>' for href in hrefs)
+    return (200, HTML, f'<html><head><title>Story</title>{extra}</head><body>{links}</body></html>'.encode())
+
+PAGES = {
+    'https://news.example.com/story': page(
+        'https://blocked.example.org/private/report', 'https://down.example.net/a', 'https://www.cdc.gov/data'),
+    'https://blocked.example.org/robots.txt': (200, 'text/plain', b'User-agent: *\nDisallow: /private/\nCrawl-delay: 30\n'),
+    'https://blocked.example.org/private/report': page(),
+    'https://down.example.net/a': (503, HTML, b'<html><body>Unavailable</body></html>'),
+    'https://www.cdc.gov/data': page(),
+}
+PAYWALLED = '<script type="application/ld+json">{"isAccessibleForFree": false}</script>'
+for i in (1, 2):
+    PAGES[f'https://paper.example.com/{i}'] = (200, HTML, f'<html><head>{PAYWALLED}</head><body><p>Teaser</p></body></html>'.encode())
+
+def test():
+    print("Testing domain registry...")
+    assert detect_access_wall(PAYWALLED, 'Teaser') == 'paywall'
+    assert detect_access_wall('<noscript>Please enable JavaScript</noscript>', '') == 'js_only'
+    assert detect_access_wall('<p>Subscribe to continue reading</p>', TEXT * 2) is None  # full article text
+
+    registry = DomainRegistry(max_crawl_delay=0.05)
+    fakes = benchmark.FakeBackends(PAGES)
+    verified = []
+    verify = fakes.verify_link_significance
+    fakes.verify_link_significance = lambda context, url, anchor: verified.append(url) or {
+        'score': 90, 'type': 'Source', 'reason': 'test'}
+    fetched = []
+    get = fakes.get
+    fakes.get = lambda url, **kwargs: fetched.append(url) or get(url, **kwargs)
+    for _ in range(DEAD_AFTER):
+        registry.observe('https://down.example.net/b', 'http_error', status=503, seconds=0.2)
+
+    with benchmark.patched(fakes, benchmark.StageTimer()), contextlib.redirect_stdout(io.StringIO()):
+        assert registry.skip_reason('https://down.example.net/a') == DEAD
+        assert registry.skip_reason('https://blocked.example.org/private/report') == DISALLOWED
+        assert registry.skip_reason('https://blocked.example.org/public') is None
+        assert registry.info('https://blocked.example.org/').crawl_delay == 0.05  # capped
+
+        graph = SourceGraph(domains=registry)
+        graph.build_graph('https://news.example.com/story')
+        for i in (1, 2):
+            SourceGraph(domains=registry).build_graph(f'https://paper.example.com/{i}')
+        try:  # the submitted page itself is disallowed: an error, not an empty analysis
+            SourceGraph(domains=registry).build_graph('https://blocked.example.org/private/report')
+            assert False, 'expected RootUnavailable'
+        except RootUnavailable as e:
+            assert 'robots.txt' in str(e)
+    fakes.verify_link_significance = verify
+
+    # The dead host cost no LLM verification; the disallowed page is cited but never fetched
+    assert 'https://www.cdc.gov/data' in verified
+    assert not any('down.example.net' in url for url in verified)
+    assert ('https://news.example.com/story', 'https://www.cdc.gov/data') in graph.G.edges
+    assert ('https://news.example.com/story', 'https://blocked.example.org/private/report') in graph.G.edges
+    assert 'https://blocked.example.org/private/report' not in fetched
+    assert 'https://blocked.example.org/robots.txt' in fetched
+
+    assert registry.access('https://paper.example.com/3') == 'paywall'
+    report = {r['host']: r for r in registry.snapshot()}
+    assert report['down.example.net']['dead'] and report['down.example.net']['failure_rate'] == 1.0
+    assert report['www.cdc.gov']['failure_rate'] == 0.0 and report['www.cdc.gov']['type'] == 'government'
+    assert report['paper.example.com']['access'] == 'paywall'
+
+    # An unreachable robots.txt allows the page for now and isn't cached
+    flaky = DomainRegistry()
+    def unreachable(info):
+        raise RobotsUnavailable(info.host)
+    flaky._read_robots = unreachable
+    assert flaky.allowed('https://flaky.example/a') and flaky.info('https://flaky.example/').robots_at is None
+
+    # Bounded like the other stores: least recently used host goes first
+    small = DomainRegistry(max_hosts=2)
+    for url in ('https://a.example/', 'https://b.example/', 'https://a.example/x', 'https://c.example/'):
+        small.info(url)
+    assert [r['host'] for r in small.snapshot()] == ['a.example', 'c.example']
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
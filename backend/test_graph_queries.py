@@ -0,0 +1,41 @@
+from backend.api import app, graph_store
+from backend.graph_builder import SourceGraph
+
+def test():
+    print("Testing graph query endpoints...")
+    g = SourceGraph()
+    for url in ["http://root.com", "http://a.gov", "http://b.edu", "http://c.org", "http://far.com"]:
+        g.add_page_node(url, {})
+    g.add_citation_edge("http://root.com", "http://a.gov", {'type': 'explicit', 'confidence': 0.9})
+    g.add_citation_edge("http://root.com", "http://b.edu", {'type': 'explicit', 'confidence': 0.3})
+    g.add_citation_edge("http://c.org", "http://a.gov", {'type': 'discovered', 'confidence': 0.7})
+    g.add_citation_edge("http://a.gov", "http://far.com", {'type': 'explicit', 'confidence': 0.8})
+    graph_store.put("g1", g)
+    client = app.test_client()
+
+    ego = client.get("/graphs/g1/ego", query_string={'node': "http://root.com", 'depth': 1, 'direction': 'out'}).json
+    assert {n['id'] for n in ego['nodes']} == {"http://root.com", "http://a.gov", "http://b.edu"}
+    assert len(ego['links']) == 2
+
+    top = client.get("/graphs/g1/top?n=1").json
+    assert top['nodes'][0]['id'] == "http://a.gov" and top['nodes'][0]['citations'] == 2
+
+    # Walk all nodes two at a time with the cursor
+    seen, cursor = [], None
+    while True:
+        page = client.get("/graphs/g1/nodes", query_string={'limit': 2, 'cursor': cursor or ''}).json
+        seen += [n['id'] for n in page['nodes']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert len(seen) == 5 and len(set(seen)) == 5
+
+    assert client.get("/graphs/g1/nodes?tier=1").json['total'] == 1
+    assert client.get("/graphs/g1/links?min_confidence=0.75").json['total'] == 2
+    assert client.get("/graphs/g1/ego?node=http://nope").status_code == 404
+    assert client.get("/graphs/g1/nodes?cursor=garbage").status_code == 400
+    assert client.get("/graphs/missing").status_code == 404
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,36 @@
+from backend import instrumentation
+from backend.api import app
+
+def test():
+    print("Testing instrumentation and /metrics...")
+    instrumentation.reset()
+
+    @instrumentation.timed('unit_stage')
+    def work(x):
+        return x * 2
+
+    assert work(2) == 4
+    with instrumentation.timer('unit_stage'):
+        pass
+    instrumentation.count('sourcetree_fetch_total', result='ok')
+    instrumentation.cache_lookup('graph_store', hit=False)
+
+    body = app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'sourcetree_stage_duration_seconds_count{stage="unit_stage"} 2' in body
+    assert 'sourcetree_stage_duration_seconds_bucket{stage="unit_stage",le="+Inf"} 2' in body
+    assert 'sourcetree_fetch_total{result="ok"} 1' in body
+    assert 'sourcetree_cache_requests_total{cache="graph_store",result="miss"} 1' in body
+    assert 'sourcetree_active_sessions 0' in body
+
+    # Disabled: hooks record nothing
+    instrumentation.set_enabled(False)
+    try:
+        work(3)
+        instrumentation.count('sourcetree_fetch_total', result='ok')
+    finally:
+        instrumentation.set_enabled(True)
+    assert instrumentation.snapshot()['stages']['unit_stage']['count'] == 2
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,101 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+from backend import api, benchmark, jobs
+from backend.api import app, job_store
+from backend.graph_queries import GraphStore
+from backend.result_cache import ResultCache
+
+def test():
+    print("Testing shared job store...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'jobs.db')
+        # Two stores on one file stand in for two gunicorn workers
+        web, worker = jobs.SQLiteJobStore(path), jobs.SQLiteJobStore(path)
+
+        job = web.create('analyze', {'url': 'http://a.com'}, dedup_key='k1')
+        # Same key from another worker: the queued job is shared, not duplicated
+        assert worker.create('analyze', {'url': 'http://a.com'}, dedup_key='k1')['id'] == job['id']
+        assert web.counts() == {jobs.QUEUED: 1}
+        assert worker.claim('w2', ['batch']) is None
+
+        def handler(params, emitter, job_id):
+            for i in range(3):
+                emitter.emit('node', {'id': f"{params['url']}/{i}"})
+            emitter.emit('complete', {'graph_id': job_id})
+
+        runner = jobs.JobRunner(worker, {'analyze': handler}, threads=2, worker='w2').start()
+        streamed = list(web.stream(job['id']))
+        assert [seq for seq, _, _ in streamed] == [1, 2, 3, 4]
+        assert streamed[-1][1:] == ('complete', {'graph_id': job['id']})
+        deadline = time.time() + 5
+        while web.get(job['id'])['status'] != jobs.DONE and time.time() < deadline:
+            time.sleep(0.05)
+        assert web.get(job['id'])['status'] == jobs.DONE
+        # Reconnect after event 2
+        assert [seq for seq, _, _ in web.stream(job['id'], after=2)] == [3, 4]
+
+        # A failing handler fails the job with an error event
+        runner.handlers['batch'] = lambda params, emitter, job_id: 1 / 0
+        failed = web.create('batch', {'urls': []})
+        assert list(web.stream(failed['id']))[-1][1] == 'error'
+        runner.stop()
+
+        # Jobs run outside the runner's threads (/quick-analyze) join its heartbeat
+        quick = web.create('quick', {'url': 'http://q.com'}, worker='w2')
+        with runner.heartbeat(quick['id']):
+            assert quick['id'] in runner.active
+        assert quick['id'] not in runner.active
+        web.finish(quick['id'], jobs.DONE)
+
+        # Jobs whose worker died stop counting as running; old ones are purged
+        lost = web.create('analyze', {'url': 'http://b.com'}, worker='dead')
+        assert web.fail_stale(stale_after=-1) == [lost['id']]
+        assert web.get(lost['id'])['status'] == jobs.FAILED
+        web.purge(ttl=-1)
+        assert web.counts() == {}
+
+    class Incomplete(jobs.JobStore):
+        def create(self, kind, params, dedup_key=None, worker=None):
+            return None
+    try:
+        Incomplete()
+        assert False, 'incomplete store constructed'
+    except TypeError:
+        pass
+
+    # API: any worker can replay a job's events, resuming via Last-Event-ID
+    job = job_store.create('analyze', {'url': 'http://c.com'}, worker='elsewhere')
+    for event in ('status', 'node', 'complete'):
+        job_store.append(job['id'], event, {})
+    job_store.finish(job['id'], jobs.DONE)
+    client = app.test_client()
+    body = client.get(f"/jobs/{job['id']}/events", headers={'Last-Event-ID': '1'}).get_data(as_text=True)
+    assert body == 'id: 2\nevent: node\ndata: {}\n\nid: 3\nevent: complete\ndata: {}\n\n'
+    assert client.get(f"/jobs/{job['id']}").json['status'] == 'done'
+    assert client.get('/jobs/missing/events').status_code == 404
+
+    # Another worker (own graph store and result cache, same job store file)
+    # can query a graph this one built and serves its result as a cache hit
+    with tempfile.TemporaryDirectory() as tmp, tempfile.TemporaryDirectory() as corpus_dir:
+        pages, scenarios = benchmark.load_corpus(corpus_dir)
+        url = scenarios['article']
+        saved = api.job_store, api.graph_store, api.result_cache
+        try:
+            api.job_store = jobs.SQLiteJobStore(os.path.join(tmp, 'jobs.db'))
+            with benchmark.patched(benchmark.FakeBackends(pages), benchmark.StageTimer()), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                built = client.post('/quick-analyze', json={'url': url}).json
+            api.graph_store, api.result_cache = GraphStore(), ResultCache()
+            assert client.get(f"/graphs/{built['graph_id']}").json['nodes'] == len(built['graph']['nodes'])
+            api.graph_store, api.result_cache = GraphStore(), ResultCache()
+            res = client.post('/quick-analyze', json={'url': url})
+            assert res.headers['X-Cache'] == 'HIT' and res.json['graph_id'] == built['graph_id']
+        finally:
+            api.job_store, api.graph_store, api.result_cache = saved
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
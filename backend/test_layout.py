@@ -0,0 +1,44 @@
+from backend.graph_builder import SourceGraph
+from backend.layout import IncrementalLayout, MIN_GAP
+
+def test():
+    print("Testing server-side layout...")
+    g = SourceGraph()
+    g.add_page_node("http://blog.com", {})
+    g.add_page_node("http://cdc.gov", {})
+    g.add_page_node("http://nytimes.com/a", {})
+    g.add_citation_edge("http://blog.com", "http://nytimes.com/a", {})
+    g.add_citation_edge("http://nytimes.com/a", "http://cdc.gov", {})
+
+    data = g.export_for_visualization(layout=True)
+    assert [b['tier'] for b in data['layout']['bands']] == [1, 3, 5]
+    y = {n['id']: n['y'] for n in data['nodes']}
+    # Tier 1 (government) on top, social at the bottom
+    assert y["http://cdc.gov"] < y["http://nytimes.com/a"] < y["http://blog.com"]
+    assert all(0 <= n['x'] <= 1 for n in data['nodes'])
+    # Layout is opt-in
+    assert 'x' not in g.export_for_visualization()['nodes'][0]
+
+    layout = IncrementalLayout()
+    x0, _ = layout.place("root", 4)
+    x1, _ = layout.place("child", 4, anchors=["root"])
+    assert abs(x1 - x0) >= MIN_GAP - 1e-9
+    # Already-placed nodes keep their position
+    assert layout.place("root", 4) == (x0, layout.band_y(4))
+
+    # A crowded band squeezes nodes closer together instead of stacking them
+    crowded = IncrementalLayout()
+    xs = [crowded.place(f"n{i}", 2, anchors=["n0"])[0] for i in range(120)]
+    assert len(set(xs)) == 120 and all(0 < x < 1 for x in xs)
+
+    # Streamed positions survive the final layout of the same graph
+    streamed = IncrementalLayout()
+    for node in g.G.nodes:
+        streamed.place(node, g.get_tier(g.G.nodes[node]['type']), anchors=list(g.G.predecessors(node)))
+    final = g.export_for_visualization(
+        layout=True, seed={n: xy[0] for n, xy in streamed.positions.items()}, bands=streamed.bands)
+    assert {n['id']: (n['x'], n['y']) for n in final['nodes']} == streamed.positions
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,40 @@
+import io
+import json
+import os
+import tempfile
+from backend import benchmark
+from backend.main import run_batch
+
+def test():
+    print("Testing batch CLI mode...")
+    with tempfile.TemporaryDirectory() as tmp:
+        pages, scenarios = benchmark.load_corpus(os.path.join(tmp, 'corpus'))
+        pages['https://private.example/robots.txt'] = (200, 'text/plain', b'User-agent: *\nDisallow: /\n')
+        urls = [scenarios['article'], scenarios['syndicated'], scenarios['cluster'], 'https://gone.example/404',
+                'https://private.example/story']
+        output = os.path.join(tmp, 'results.jsonl')
+        # A run killed mid-write: one good record and half of another
+        with open(output, 'w') as f:
+            f.write(json.dumps({'url': scenarios['article'], 'status': 'ok'}) + '\n{"note": "hand edited"}\n'
+                    + '{"url": "https://www.np')
+
+        with benchmark.patched(benchmark.FakeBackends(pages), benchmark.StageTimer()):
+            summary = run_batch(iter(urls), output, workers=3, log=io.StringIO())
+            # A root robots.txt forbids is unreachable, not a crash
+            assert summary['skipped'] == 1 and summary['ok'] == 2 and summary['unreachable'] == 2
+
+            with open(output) as f:
+                records = [json.loads(line) for line in f if 'url' in line]
+            assert len(records) == 5 and len({r['url'] for r in records}) == 5
+            private = next(r for r in records if r['url'] == 'https://private.example/story')
+            assert private['status'] == 'unreachable' and 'robots.txt' in private['error']
+            assert all(r['nodes'] > 1 and 'pagerank' in r for r in records[1:] if r['status'] == 'ok')
+
+            # Resume: nothing left to do, unless failures are retried
+            assert run_batch(iter(urls), output, workers=2, log=io.StringIO())['skipped'] == 5
+            summary = run_batch(iter(urls), output, workers=2, retry_failed=True, log=io.StringIO())
+            assert summary['skipped'] == 3 and summary['unreachable'] == 2
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,65 @@
+import contextlib
+import io
+import tempfile
+from backend import benchmark
+from backend.graph_builder import SourceGraph
+from backend.graph_queries import GraphStore
+from backend.memory import StringSpill, SpilledText, MemoryGuard, CEILING, unspill
+
+def crawl(root, pages, **options):
+    graph = SourceGraph(**options)
+    with benchmark.patched(benchmark.FakeBackends(pages), benchmark.StageTimer()), \
+            contextlib.redirect_stdout(io.StringIO()):
+        graph.build_graph(root)
+    return graph
+
+def test():
+    print("Testing bounded-memory mode...")
+    spill = StringSpill(min_chars=16)
+    short = ''.join(['cit', 'ation'])
+    assert spill.store(short) is spill.store('citation')  # short strings shared
+    long_text = 'ünïcode context ' * 20
+    parked = spill.store(long_text)
+    assert isinstance(parked, SpilledText) and unspill(parked) == long_text
+    assert spill.spilled == 1 and unspill(0.9) == 0.9
+    # Closing while a query reads the graph waits for it to finish
+    assert spill.acquire()
+    spill.close()
+    assert unspill(parked) == long_text
+    spill.release()
+    assert spill._file is None and not spill.acquire()
+
+    # Already past a 1 MB ceiling: nothing is crawled, the skip is reported
+    guard = MemoryGuard(ceiling_mb=1)
+    assert guard.check() == CEILING and guard.page_bytes() is not None
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        pages, scenarios = benchmark.load_corpus(corpus_dir)
+    root = scenarios['article']
+
+    normal = crawl(root, pages, bounded=False)
+    bounded = crawl(root, pages, bounded=True)
+    # Same graph either way; bounded exports plain strings from the spill
+    assert normal.export_for_visualization() == bounded.export_for_visualization()
+    report = bounded.analyze_structure()['memory']
+    assert report['bounded'] and report['peak_rss_mb'] >= report['start_rss_mb']
+    assert not normal.analyze_structure()['memory']['bounded']
+    # Fields nothing exports aren't kept in bounded mode
+    assert not any(key in data for _, _, data in bounded.G.edges(data=True)
+                   for key in SourceGraph.UNEXPORTED_EDGE_FIELDS)
+
+    # A graph pushed out of the store gets its spill file closed
+    closed = []
+    store = GraphStore(max_graphs=1, on_evict=lambda graph: closed.append(graph) or graph.close())
+    store.put('a', bounded)
+    store.put('b', normal)
+    assert closed == [bounded] and bounded.strings._file is None
+
+    capped = crawl(root, pages, max_rss_mb=1)
+    report = capped.memory_report()
+    assert capped.G.number_of_nodes() == 0
+    assert report['degraded'] == CEILING and report['skipped_pages'] == 1
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,72 @@
+import contextlib
+import io
+from types import SimpleNamespace
+from backend import instrumentation, source_hunter
+from backend.relevance import tokenize, similarity
+
+RESULTS = {
+    'adult obesity rate': [
+        SimpleNamespace(url='https://www.cdc.gov/obesity/data/adult.html', title='Adult Obesity Facts | CDC',
+                        description='The US adult obesity prevalence was 41.9% in 2017 - March 2020.'),
+        SimpleNamespace(url='https://www.harvard.edu/admissions', title='Admissions',
+                        description='Apply to undergraduate programs and financial aid.'),
+        SimpleNamespace(url='https://shop.example.com/obesity', title='Diet pills', description='Buy now'),
+    ],
+    'unemployment report': [
+        SimpleNamespace(url='https://www.bls.gov/news.release/empsit.nr0.htm', title='Employment Situation Summary',
+                        description='The unemployment rate was 3.9 percent, Bureau of Labor Statistics reported.'),
+        SimpleNamespace(url='https://www.cdc.gov/obesity/data/adult.html', title='Adult Obesity Facts | CDC',
+                        description='The US adult obesity prevalence was 41.9% in 2017 - March 2020.'),
+    ],
+    # Plain URLs (search without advanced results): nothing but URL words to score
+    'vaccine schedule': ['https://www.cdc.gov/vaccines/schedules/index.html'],
+}
+
+def test():
+    print("Testing claim/source relevance ranking...")
+    assert tokenize('The CDC-reported rate, in 2020!') == ['cdc', 'reported', 'rate', '2020']
+    scores = similarity([['obesity', 'adults'], ['unrelated']], [['obesity', 'rate'], ['jobs'], []])
+    assert scores.shape == (2, 3) and scores[0, 0] > 0 and not scores[1].any() and not scores[:, 2].any()
+
+    claims = [
+        {'claim': 'Over 40% of US adults have obesity', 'mentioned_source': 'CDC',
+         'has_explicit_link': False, 'search_query': 'adult obesity rate'},
+        {'claim': 'Unemployment fell to 3.9 percent', 'mentioned_source': 'Bureau of Labor Statistics',
+         'has_explicit_link': False, 'search_query': 'unemployment report'},
+        {'claim': 'Linked already', 'has_explicit_link': True, 'search_query': 'adult obesity rate'},
+        {'claim': 'No query', 'has_explicit_link': False, 'search_query': ''},
+        {'claim': 'Children should get the measles shot twice', 'has_explicit_link': False,
+         'search_query': 'vaccine schedule'},
+    ]
+    queries = []
+    original, cap = source_hunter.search, source_hunter.MAX_SOURCES_PER_CLAIM
+    source_hunter.search = lambda query, **kwargs: queries.append(query) or iter(RESULTS[query])
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            found = source_hunter.find_sources_for_claims(claims)
+            single = source_hunter.find_implicit_sources(claims[0])
+            instrumentation.reset()
+            source_hunter.MAX_SOURCES_PER_CLAIM = 0
+            source_hunter.find_implicit_sources(claims[0])
+    finally:
+        source_hunter.search, source_hunter.MAX_SOURCES_PER_CLAIM = original, cap
+
+    assert queries[:4] == ['adult obesity rate', 'unemployment report', 'vaccine schedule', 'adult obesity rate']
+    assert len(found) == 5 and found[2] == [] and found[3] == []
+    # A result without title or snippet isn't dropped for scoring low on URL words alone
+    assert [s['url'] for s in found[4]] == ['https://www.cdc.gov/vaccines/schedules/index.html']
+    # Only the page that matches the claim survives; non-authoritative hosts never compete
+    assert [s['url'] for s in found[0]] == ['https://www.cdc.gov/obesity/data/adult.html']
+    assert [s['url'] for s in found[1]] == ['https://www.bls.gov/news.release/empsit.nr0.htm']
+    assert all(s['relevance'] >= source_hunter.MIN_RELEVANCE and 0.5 < s['confidence'] <= 1.0
+               for s in found[0] + found[1])
+    assert [s['url'] for s in single] == [s['url'] for s in found[0]]
+    # Relevant candidates over the per-claim cap are counted apart from irrelevant ones
+    counters = instrumentation.snapshot()['counters']
+    assert counters['sourcetree_discovered_sources_total{reason="cap",result="rejected"}'] == 1
+    assert counters['sourcetree_discovered_sources_total{reason="relevance",result="rejected"}'] == 1
+    assert 'find_sources_for_claims' in instrumentation.snapshot()['stages']
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,61 @@
+import contextlib
+import gzip
+import io
+import zlib
+from backend import benchmark
+from backend.api import app, result_cache, result_key
+from backend.graph_builder import SourceGraph
+from backend.result_cache import canonical_url, choose_encoding, compress_stream
+
+def test():
+    print("Testing result cache, ETags and compression...")
+    assert canonical_url("HTTP://Example.COM:80/a?b=2&utm_source=x&a=1#top") == "http://example.com/a?a=1&b=2"
+    assert canonical_url("https://example.com") == "https://example.com/"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("gzip, deflate") == "gzip"
+
+    g = SourceGraph()
+    g.add_page_node("http://example.com/a", {})
+    for i in range(40):
+        g.add_citation_edge("http://example.com/a", f"http://source{i}.gov/report", {'type': 'explicit', 'confidence': 0.9})
+    payload = {'success': True, 'graph_id': 'cached-1', 'graph': g.export_for_visualization(), 'metrics': {}}
+    result_cache.clear()
+    result_cache.put(result_key("http://example.com/a", {}), payload, 'cached-1', g)
+    client = app.test_client()
+
+    # Same page, different spelling: served from the cache, gzipped
+    res = client.post('/quick-analyze', json={'url': "http://EXAMPLE.com/a?utm_campaign=z"},
+                      headers={'Accept-Encoding': 'gzip'})
+    assert res.status_code == 200 and res.headers['X-Cache'] == 'HIT'
+    assert res.headers['Content-Encoding'] == 'gzip'
+    assert b'"graph_id": "cached-1"' in gzip.decompress(res.get_data())
+    assert client.get('/graphs/cached-1').status_code == 200
+
+    res = client.post('/quick-analyze', json={'url': "http://example.com/a"},
+                      headers={'If-None-Match': res.headers['ETag']})
+    assert res.status_code == 304 and res.get_data() == b''
+
+    # Graph queries get ETags too
+    etag = client.get('/graphs/cached-1/nodes').headers['ETag']
+    assert client.get('/graphs/cached-1/nodes', headers={'If-None-Match': etag}).status_code == 304
+
+    # An unreachable root is answered but not cached; one robots.txt forbids is an error
+    robots = {'http://private.example.com/robots.txt': (200, 'text/plain', b'User-agent: *\nDisallow: /\n')}
+    with benchmark.patched(benchmark.FakeBackends(robots), benchmark.StageTimer()), \
+            contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(2):
+            res = client.post('/quick-analyze', json={'url': "http://missing.example.com/"})
+            assert res.status_code == 200 and res.headers['X-Cache'] == 'MISS'
+        res = client.post('/quick-analyze', json={'url': "http://private.example.com/story"})
+        assert res.status_code == 422 and 'robots.txt' in res.get_json()['error']
+    assert len(result_cache) == 1
+
+    # SSE compression flushes per event, so each event decodes on arrival
+    events = ["event: node\n", "data: {}\n\n", "event: edge\n", "data: {}\n\n"]
+    decoder = zlib.decompressobj(31)
+    decoded = [decoder.decompress(chunk) for chunk in compress_stream(iter(events), 'gzip')]
+    assert decoded.index(b"event: node\ndata: {}\n\n") < decoded.index(b"event: edge\ndata: {}\n\n")
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
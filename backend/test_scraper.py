@@ -0,0 +1,35 @@
+from backend.scraper import read_body, classify_content_type, extract_pdf_text
+import zlib
+
+class FakeResponse:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def iter_content(self, chunk_size=None):
+        for chunk in self.chunks:
+            yield chunk
+
+def test():
+    print("Testing streaming fetch helpers...")
+
+    # Stops at </body> even when the tag is split across chunks
+    response = FakeResponse([b'<html><body>hello</bo', b'dy></html>', b'x' * 10000])
+    body, truncated = read_body(response, 1000, stop_at_body_end=True)
+    assert body.endswith(b'</html>') and not truncated
+
+    # Enforces the byte cap
+    body, truncated = read_body(FakeResponse([b'a' * 600, b'b' * 600]), 1000)
+    assert len(body) == 1000 and truncated
+
+    assert classify_content_type('text/html') == 'html'
+    assert classify_content_type('application/pdf') == 'pdf'
+    assert classify_content_type('image/png') is None
+    assert classify_content_type('', 'http://a.com/report.pdf') == 'pdf'
+
+    stream = zlib.compress(b'BT /F1 12 Tf (Hello \\(PDF\\) world) Tj ET')
+    pdf = b'%PDF-1.4\n1 0 obj\n<< /Filter /FlateDecode >>\nstream\n' + stream + b'\nendstream\nendobj'
+    assert extract_pdf_text(pdf) == 'Hello (PDF) world'
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
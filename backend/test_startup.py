@@ -0,0 +1,36 @@
+import io
+import os
+import subprocess
+import sys
+from backend import startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test():
+    print("Testing lazy startup...")
+    # Fresh interpreter: importing the API must not pull in the crawler stack
+    script = (
+        "import sys, backend.api as api; "
+        "print(','.join(m for m in api.startup.HEAVY_MODULES if m in sys.modules)); "
+        "print(api.app.test_client().get('/health').json['warm'])"
+    )
+    out = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True,
+                         env={**os.environ, 'SOURCETREE_WARMUP': '0'}, check=True).stdout.split('\n')
+    assert out[0] == '', f'eagerly imported: {out[0]}'
+    assert out[1] == 'False'
+
+    # ready_ms counts from process start, not from when startup.py was imported
+    age = startup.process_age()
+    assert age is None or startup.PROCESS_START <= startup.time.perf_counter() - age + 0.05
+
+    log = io.StringIO()
+    startup.mark_ready(budget_ms=0.001, log=log)
+    assert 'budget' in log.getvalue()
+
+    state = startup.warm_up()
+    assert state['warm'] and set(state['warmup_ms']) == {name for name, _ in startup.WARMUP_STEPS}
+    assert 'networkx' in sys.modules
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,49 @@
+from backend import tracing
+from backend.instrumentation import timed, timer
+from backend.api import app, graph_store
+from backend.graph_builder import SourceGraph
+
+@timed('fetch')
+def fake_fetch(url):
+    tracing.annotate(url=url, bytes=100)
+    with timer('parse'):
+        sum(range(20000))
+
+def test():
+    print("Testing per-analysis tracing...")
+    # Not tracing: hooks are no-ops
+    fake_fetch("http://a.com")
+    assert tracing.current() is None
+
+    tracer = tracing.Tracer()
+    with tracing.activate(tracer, profile=True):
+        with tracing.span('crawl', depth=0):
+            fake_fetch("http://a.com")
+            fake_fetch("http://b.com")
+        # Keep the thread busy long enough for a few profiler samples
+        sum(i * i for i in range(300000))
+
+    tree = tracer.to_dict()
+    crawl = tree['children'][0]
+    assert crawl['name'] == 'crawl' and crawl['attrs'] == {'depth': 0}
+    assert [c['name'] for c in crawl['children']] == ['fetch', 'fetch']
+    assert crawl['children'][0]['children'][0]['name'] == 'parse'
+
+    summary = tracer.summary()
+    assert summary['stages']['fetch']['count'] == 2 and summary['bytes'] == 200
+    assert tracer.profile['samples'] > 0
+
+    chrome = tracer.to_chrome_trace()['traceEvents']
+    assert len(chrome) == 6 and all(e['ph'] == 'X' for e in chrome)
+
+    graph = SourceGraph()
+    graph.trace = tracer
+    graph_store.put("traced", graph)
+    client = app.test_client()
+    assert 'traceEvents' in client.get("/graphs/traced/trace?format=chrome").json
+    graph_store.put("untraced", SourceGraph())
+    assert client.get("/graphs/untraced/trace").status_code == 404
+    print("Success!")
+
+if __name__ == "__main__":
+    test()
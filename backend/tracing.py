@@ -0,0 +1,271 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Per-analysis span trees. A Tracer is activated for the thread running one
+# analysis; instrumentation timers (fetch, parse, LLM calls, search...) and
+# explicit span() blocks then record nested spans into it. With no active
+# tracer every hook is a single ContextVar lookup.
+
+MAX_SPANS = 5000           # spans recorded per analysis before dropping
+PROFILE_INTERVAL = 0.005   # seconds between profiler samples
+
+_active = contextvars.ContextVar('sourcetree_tracer', default=None)
+
+class Span:
+    __slots__ = ('name', 'start', 'end', 'attrs', 'children')
+
+    def __init__(self, name, start, attrs=None):
+        self.name = name
+        self.start = start
+        self.end = None
+        self.attrs = attrs or {}
+        self.children = []
+
+class Tracer:
+    """Span tree for one analysis run"""
+    def __init__(self, name='analysis', max_spans=MAX_SPANS):
+        self.origin = time.perf_counter()
+        self.root = Span(name, self.origin)
+        self.stack = [self.root]
+        self.max_spans = max_spans
+        self.span_count = 0
+        self.dropped = 0
+        self.profile = None
+
+    def start_span(self, name, attrs=None):
+        if self.span_count >= self.max_spans:
+            self.dropped += 1
+            return None
+        span = Span(name, time.perf_counter(), attrs)
+        self.stack[-1].children.append(span)
+        self.stack.append(span)
+        self.span_count += 1
+        return span
+
+    def end_span(self, span):
+        if span is None:
+            return
+        span.end = time.perf_counter()
+        if self.stack[-1] is span:
+            self.stack.pop()
+
+    def annotate(self, **attrs):
+        self.stack[-1].attrs.update(attrs)
+
+    def finish(self):
+        if self.root.end is None:
+            self.root.end = time.perf_counter()
+
+    def _ms(self, t):
+        return round((t - self.origin) * 1000, 3)
+
+    def to_dict(self):
+        """Compact nested span tree (times in ms relative to the start of the run)"""
+        def convert(span):
+            end = span.end if span.end is not None else time.perf_counter()
+            node = {
+                'name': span.name,
+                'start_ms': self._ms(span.start),
+                'duration_ms': round((end - span.start) * 1000, 3)
+            }
+            if span.attrs:
+                node['attrs'] = span.attrs
+            if span.children:
+                node['children'] = [convert(child) for child in span.children]
+            return node
+        tree = convert(self.root)
+        if self.dropped:
+            tree['dropped_spans'] = self.dropped
+        return tree
+
+    def summary(self):
+        """Per-span-name totals plus bytes and token counts summed over the run"""
+        stages = {}
+        totals = Counter()
+        pending = [self.root]
+        while pending:
+            span = pending.pop()
+            pending.extend(span.children)
+            if span is self.root:
+                continue
+            end = span.end if span.end is not None else time.perf_counter()
+            stage = stages.setdefault(span.name, {'count': 0, 'total_ms': 0.0})
+            stage['count'] += 1
+            stage['total_ms'] = round(stage['total_ms'] + (end - span.start) * 1000, 3)
+            for key in ('bytes', 'input_tokens', 'output_tokens'):
+                if isinstance(span.attrs.get(key), (int, float)):
+                    totals[key] += span.attrs[key]
+        end = self.root.end if self.root.end is not None else time.perf_counter()
+        return {
+            'total_ms': round((end - self.origin) * 1000, 3),
+            'spans': self.span_count,
+            'stages': stages,
+            'bytes': totals['bytes'],
+            'input_tokens': totals['input_tokens'],
+            'output_tokens': totals['output_tokens']
+        }
+
+    def to_chrome_trace(self):
+        """Chrome trace-event format (load in chrome://tracing or Perfetto)"""
+        events = []
+        pending = [self.root]
+        while pending:
+            span = pending.pop()
+            pending.extend(span.children)
+            end = span.end if span.end is not None else time.perf_counter()
+            events.append({
+                'name': span.name,
+                'cat': 'sourcetree',
+                'ph': 'X',
+                'ts': round((span.start - self.origin) * 1e6, 1),
+                'dur': round((end - span.start) * 1e6, 1),
+                'pid': os.getpid(),
+                'tid': 1,
+                'args': span.attrs
+            })
+        events.sort(key=lambda e: e['ts'])
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, fmt='compact'):
+        """Payload for API responses: compact tree + summary, or Chrome events"""
+        if fmt == 'chrome':
+            return self.to_chrome_trace()
+        payload = {'summary': self.summary(), 'spans': self.to_dict()}
+        if self.profile:
+            payload['profile'] = self.profile
+        return payload
+
+class ExportedTrace:
+    """A trace exported by another worker, read back in the one format it was recorded in"""
+    def __init__(self, payload, fmt='compact'):
+        self.payload = payload
+        self.format = fmt
+
+    def export(self, fmt='compact'):
+        if fmt != self.format:
+            raise ValueError(f"Trace was recorded as '{self.format}'")
+        return self.payload
+
+def current():
+    return _active.get()
+
+class activate:
+    """
+    Make `tracer` the active tracer for this thread / context.
+    With profile=True a SamplingProfiler watches this thread meanwhile and its
+    summary is attached to the tracer. A None tracer makes this a no-op.
+    """
+    def __init__(self, tracer, profile=False):
+        self.tracer = tracer
+        self.profiler = SamplingProfiler() if tracer and profile else None
+        self.token = None
+
+    def __enter__(self):
+        self.token = _active.set(self.tracer)
+        if self.profiler:
+            self.profiler.start()
+        return self.tracer
+
+    def __exit__(self, *exc):
+        if self.profiler:
+            self.tracer.profile = self.profiler.stop()
+        _active.reset(self.token)
+        if self.tracer:
+            self.tracer.finish()
+        return False
+
+def start(name, **attrs):
+    """Open a span on the active tracer (None if not tracing)"""
+    tracer = _active.get()
+    return tracer.start_span(name, attrs) if tracer else None
+
+def end(span):
+    if span is not None:
+        tracer = _active.get()
+        if tracer:
+            tracer.end_span(span)
+
+class span:
+    """`with span('crawl', url=...):` - a trace-only span (no metrics)"""
+    __slots__ = ('name', 'attrs', '_span')
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self._span = None
+
+    def __enter__(self):
+        self._span = start(self.name, **self.attrs)
+        return self
+
+    def __exit__(self, *exc):
+        end(self._span)
+        return False
+
+def annotate(**attrs):
+    """Attach attributes (bytes, tokens, status...) to the innermost open span"""
+    tracer = _active.get()
+    if tracer:
+        tracer.annotate(**attrs)
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a helper
+    thread and reports the hottest functions (self and inclusive samples).
+    """
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = Counter()
+        self.inclusive_counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.summary()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.self_counts[_frame_key(frame)] += 1
+            seen = set()
+            while frame is not None:
+                key = _frame_key(frame)
+                if key not in seen:  # recursion counts once per sample
+                    seen.add(key)
+                    self.inclusive_counts[key] += 1
+                frame = frame.f_back
+
+    def summary(self, top=15):
+        def rows(counts):
+            return [
+                {'function': key, 'samples': n, 'percent': round(100.0 * n / self.samples, 1)}
+                for key, n in counts.most_common(top)
+            ]
+        return {
+            'samples': self.samples,
+            'interval_ms': self.interval * 1000,
+            'top_self': rows(self.self_counts) if self.samples else [],
+            'top_inclusive': rows(self.inclusive_counts) if self.samples else []
+        }
+
+def _frame_key(frame):
+    code = frame.f_code
+    path = code.co_filename.replace('\\', '/').split('/')
+    return f"{'/'.join(path[-2:])}:{code.co_firstlineno}({code.co_name})"